@@ -1,75 +1,66 @@
 # logic/analyzer.py
 
-import re
-from datetime import datetime
-from logic.helpers import parse_size_from_string # Обрати внимание, импорт из нового места
+import json
+from logic.rules import get_rule_set, evaluate, render_problems, CATEGORY_GOOD
 
-def analyze_system(data, config):
+GOOD_STATE_TEXT = "Состояние хорошее"
+
+def format_problems(texts):
+    """Текст проблем в прежнем виде: уникальные строки по алфавиту, по одной на строку."""
+    return "\n".join(sorted(set(texts)))
+
+def format_problem_codes(codes):
+    """Коды проблем для колонки problem_codes: уникальные, по возрастанию, через запятую."""
+    return ",".join(str(code) for code in sorted(set(int(code) for code in codes)))
+
+def format_problem_findings(findings):
     """
-    Анализирует словарь с "сырыми" данными о ПК и возвращает категорию и список проблем.
+    Находки для колонки problem_findings: JSON-массив пар [код, параметр], уникальных и упорядоченных,
+    чтобы одинаковые находки всегда давали одну и ту же строку (параметр может быть словарем — см. находки SMART).
     """
-    problems = []
-    
-    # Сначала добавляем проблемы с дисками, если они есть и статус не GOOD
-    if data.get('internal_smart_status') != 'GOOD':
-        smart_problems = data.get('SMART Проблемы', [])
-        if smart_problems:
-            problems.append("Проблемы с дисками:")
-            problems.extend([f"  - {p}" for p in smart_problems])
+    unique = {json.dumps([int(code), value], ensure_ascii=False, separators=(',', ':'), sort_keys=True): int(code) for code, value in findings}
+    return '[' + ','.join(sorted(unique, key=lambda finding: (unique[finding], finding))) + ']'
 
-    # --- Анализ остальных компонентов ---
-    bios_age_limit = config.getint('Analysis', 'bios_age_limit_years', fallback=5)
-    ram_critical_gb = config.getfloat('Analysis', 'ram_critical_gb', fallback=3.8)
-    ram_upgrade_gb = config.getfloat('Analysis', 'ram_upgrade_gb', fallback=7.8)
-    os_ver, socket = data.get('ОС', ''), data.get('Сокет', '')
-    gpu_driver, bios_date_str = data.get('Видеоадаптер', ''), data.get('Дата BIOS')
-    has_ssd = any(k in (data.get('Дисковые накопители') or '').lower() for k in ['ssd', 'nvme', 'snv'])
-    ram_gb = parse_size_from_string(data.get('Объем ОЗУ', '0 MB'), 'gb')
-    
-    is_critical = data.get('internal_smart_status') == 'BAD'
-    is_upgrade_needed = data.get('internal_smart_status') == 'OK'
+def parse_problem_findings(findings_json):
+    """Колонка problem_findings -> [(код, параметр), ...]; None — находок нет (запись старше колонки) или значение испорчено."""
+    try: findings = json.loads(findings_json) if findings_json else None
+    except (TypeError, ValueError): return None
+    if not isinstance(findings, list): return None
+    return [(finding[0], finding[1]) for finding in findings if isinstance(finding, list) and len(finding) == 2 and isinstance(finding[0], int)]
 
-    if socket and any(s in socket for s in ['LGA775', 'AM2', 'LGA1156']):
-        is_critical = True
-        problems.append("Критично: Очень старая платформа")
-    if ram_gb > 0 and ram_gb < ram_critical_gb:
-        is_critical = True
-        problems.append(f"Критично: Мало ОЗУ ({ram_gb:.1f} ГБ)")
-    if 'Windows 7' in os_ver:
-        is_upgrade_needed = True
-        problems.append("Проблема: Устаревшая ОС Windows 7")
-    if ram_critical_gb <= ram_gb < ram_upgrade_gb:
-        is_upgrade_needed = True
-        problems.append(f"Проблема: Недостаточно ОЗУ ({ram_gb:.1f} ГБ)")
-    if not has_ssd:
-        is_upgrade_needed = True
-        problems.append("Проблема: Отсутствует SSD")
-    if 'Microsoft Basic Display Adapter' in gpu_driver:
-        is_upgrade_needed = True
-        problems.append("Проблема: Не установлен видеодрайвер")
-    if bios_date_str:
-        try:
-            bios_date = None
-            if date_match := re.search(r'(\d{2}/\d{2}/\d{4})', bios_date_str):
-                bios_date = datetime.strptime(date_match.group(0), '%m/%d/%Y')
-            elif date_match := re.search(r'(\d{2}/\d{2}/\d{2})', bios_date_str):
-                bios_date = datetime.strptime(date_match.group(0), '%m/%d/%y')
-            if bios_date and (datetime.now() - bios_date).days > 365 * bios_age_limit:
-                is_upgrade_needed = True
-                problems.append(f"Предупреждение: BIOS старше {bios_age_limit} лет")
-        except (ValueError, IndexError):
-            pass
-            
-    unique_problems = sorted(list(set(problems)))
-    
-    if not unique_problems:
-        return 3, "Состояние хорошее"
+def findings_text(findings):
+    """Текст проблем для показа по находкам [(код, параметр), ...]; без находок — "Состояние хорошее"."""
+    return format_problems(render_problems(findings)) if findings else GOOD_STATE_TEXT
 
-    final_problems_str = "\n".join(unique_problems)
-    
-    if is_critical or "Критично" in final_problems_str:
-        return 1, final_problems_str
-    if is_upgrade_needed or "Проблема" in final_problems_str or "Предупреждение" in final_problems_str:
-        return 2, final_problems_str
-    
-    return 3, "Состояние хорошее"
\ No newline at end of file
+def problems_text(data):
+    """Текст проблем записи для показа — по находкам; у записей, проанализированных до появления находок, — сохраненный текст."""
+    findings = parse_problem_findings(data.get('problem_findings'))
+    if findings is None: return data.get('problems') or ''
+    return findings_text(findings)
+
+def analyze_findings(data, config, rules=None, now=None):
+    """Категория и находки [(код, параметр), ...] (см. logic.rules.evaluate); у ПК в хорошем состоянии находок нет."""
+    category, findings = evaluate(data, rules or get_rule_set(config), now)
+    if category == CATEGORY_GOOD: return 3, []
+    return category, findings
+
+def analysis_fields(data, config, rules=None, now=None):
+    """
+    Результаты анализа для записи в БД: category, problem_codes и problem_findings. Текст проблем не хранится:
+    его собирает problems_text() при показе.
+    """
+    category, findings = analyze_findings(data, config, rules, now)
+    return {'category': category, 'problem_codes': format_problem_codes(code for code, _ in findings), 'problem_findings': format_problem_findings(findings)}
+
+def analyze_with_codes(data, config, rules=None, now=None):
+    """Как analyze_system, но дополнительно возвращает строку кодов проблем (см. logic.rules.ProblemCode)."""
+    category, findings = analyze_findings(data, config, rules, now)
+    return category, findings_text(findings), format_problem_codes(code for code, _ in findings)
+
+def analyze_system(data, config, rules=None, now=None):
+    """
+    Анализирует словарь с "сырыми" данными о ПК и возвращает категорию и список проблем.
+    rules — заранее собранный набор правил (см. logic.rules); без него берется набор для config.
+    """
+    category, problems, _ = analyze_with_codes(data, config, rules, now)
+    return category, problems
@@ -0,0 +1,137 @@
+# logic/batch_classifier.py
+# Пакетная переоценка всего парка по типизированным колонкам БД: поля загружаются в столбцы NumPy,
+# правила из logic.rules проверяются как маски над массивами, а в БД одной транзакцией пишутся только
+# изменившиеся записи. Результат совпадает с построчным analyze_system по снимкам отчетов.
+import json
+import logging
+import sqlite3
+from datetime import date
+
+import numpy as np
+
+from logic import database_handler
+from logic.analyzer import format_problem_codes, format_problem_findings
+from logic.rules import get_rule_set, smart_finding, ColumnFacts, ProblemCode, CATEGORY_CRITICAL, CATEGORY_UPGRADE, CATEGORY_GOOD
+
+logger = logging.getLogger(__name__)
+
+# Колонки, которые читают правила (текстовые сокет и видеоадаптер проверяются на подстроку; сводка SMART — см.
+# SmartRule.summary_key), и прежние результаты — чтобы записать обратно только изменившееся
+LOAD_KEYS = ('Имя файла', 'Сокет', 'Видеоадаптер', 'ram_gb', 'bios_date', 'has_ssd', 'is_win7', 'smart_found', 'hdd_realloc_max',
+             'hdd_unstable_max', 'ssd_spare_min', 'smart_readings', 'internal_smart_status', 'category', 'problem_codes', 'problem_findings')
+RESULT_KEYS = ('category', 'problem_codes', 'problem_findings', 'internal_smart_status')
+RAM_CODES = (ProblemCode.RAM_CRITICAL, ProblemCode.RAM_LOW)
+
+def load_fleet_columns(conn):
+    """Загружает нужные правилам колонки всего парка; возвращает {ключ: список значений}."""
+    columns = ', '.join(f'"{database_handler.sanitize_col_name(key)}"' for key in LOAD_KEYS)
+    cursor = conn.cursor(); cursor.row_factory = None  # обычные кортежи вместо sqlite3.Row заметно быстрее на всем парке
+    rows = cursor.execute(f'SELECT {columns} FROM {database_handler.TABLE_NAME}').fetchall()
+    return {key: list(values) for key, values in zip(LOAD_KEYS, zip(*rows))} if rows else {key: [] for key in LOAD_KEYS}
+
+def _float_column(values):
+    return np.array([np.nan if value is None else value for value in values], dtype=float)
+
+def _text_column(values):
+    return np.array([value or '' for value in values], dtype=str)
+
+def _bool_column(values):
+    return np.array([bool(value) for value in values], dtype=bool)
+
+def _contains(text_column, substrings):
+    return np.logical_or.reduce([np.char.find(text_column, substring) >= 0 for substring in substrings])
+
+def _smart_findings(readings_json, rule_set):
+    """Находки SMART по сохраненным значениям атрибутов — те же, что у classify_smart_drives."""
+    findings = []
+    for is_ssd, attr_id, drive_name, value in json.loads(readings_json) if readings_json else ():
+        for rule in rule_set.smart_rules_for(bool(is_ssd), attr_id):
+            if rule.is_problem(value): findings.append(smart_finding(rule, drive_name, value))
+    return findings
+
+def classify_columns(columns, rule_set, today=None):
+    """
+    Оценивает загруженные колонки набором правил: условия правил — их маски (Rule.mask), статус SMART — проверки
+    правил SMART над крайними значениями сводки. Возвращает (категории, статусы SMART, {код: маска}) — массивы
+    по записям в порядке загрузки.
+    """
+    today, count = today or date.today(), len(columns['Имя файла'])
+    bios = np.array([value or 'NaT' for value in columns['bios_date']], dtype='datetime64[D]')
+    bios_age_days = (np.datetime64(today, 'D') - bios).astype('timedelta64[D]').astype(float)
+    bios_age_days[np.isnat(bios)] = np.nan
+    facts = ColumnFacts(socket=_text_column(columns['Сокет']), gpu=_text_column(columns['Видеоадаптер']), has_ssd=_bool_column(columns['has_ssd']),
+                        ram_gb=np.nan_to_num(_float_column(columns['ram_gb'])), bios_age_days=bios_age_days, is_win7=_bool_column(columns['is_win7']),
+                        contains=_contains)
+    masks = {rule.code: rule.mask(facts) for rule in rule_set.rules}
+
+    # Проблема есть у записи, если ее есть у крайнего значения по дискам; критичность — только у значений, уже признанных проблемой
+    smart_warning, smart_critical = np.zeros(count, dtype=bool), np.zeros(count, dtype=bool)
+    for rule in rule_set.smart_rules:
+        values = _float_column(columns[rule.summary_key]); problem = rule.is_problem(values)
+        smart_warning |= problem; smart_critical |= problem & rule.is_critical(values)
+    # Без сводки SMART (отчет без раздела SMART или запись без снимка) остается сохраненный статус
+    smart_found = np.array([value == 1 for value in columns['smart_found']], dtype=bool)
+    status = np.array(columns['internal_smart_status'], dtype=object)
+    status[smart_found] = np.where(smart_critical, 'BAD', np.where(smart_warning, 'OK', 'GOOD'))[smart_found]
+
+    def any_rule(category):
+        return np.logical_or.reduce([masks[rule.code] for rule in rule_set.rules if rule.category == category] + [np.zeros(count, dtype=bool)])
+    critical, upgrade = (status == 'BAD') | any_rule(CATEGORY_CRITICAL), (status == 'OK') | any_rule(CATEGORY_UPGRADE)
+    categories = np.where(critical, CATEGORY_CRITICAL, np.where(upgrade, CATEGORY_UPGRADE, CATEGORY_GOOD))
+    return categories, status, masks
+
+def _problem_fields(rule_set, rule_indexes, ram_gb, smart_findings):
+    findings = list(smart_findings)
+    findings.extend((rule.code, rule.value(ram_gb or 0.0)) for rule in (rule_set.rules[rule_index] for rule_index in rule_indexes))
+    return format_problem_codes(code for code, _ in findings), format_problem_findings(findings)
+
+def render_results(columns, rule_set, categories, status, masks):
+    """
+    Собирает по маскам значения RESULT_KEYS для каждой записи (находки — как у analysis_fields).
+    У большинства ПК одинаковые наборы проблем, поэтому находки собираются один раз на сочетание
+    (набор сработавших правил, объем ОЗУ — если он параметр находки, значения SMART — если есть находки SMART).
+    """
+    rule_count = len(rule_set.rules)
+    codes_matrix = np.column_stack([masks[rule.code] for rule in rule_set.rules]) if len(categories) else np.zeros((0, rule_count), dtype=bool)
+    bitmasks = (codes_matrix.astype(np.int64) << np.arange(rule_count, dtype=np.int64)).sum(axis=1).tolist()
+    ram_bits = sum(1 << i for i, rule in enumerate(rule_set.rules) if rule.code in RAM_CODES)
+    smart_has_lines = ((status == 'OK') | (status == 'BAD')).tolist()
+    rendered, results = {}, []
+    # category хранится в TEXT-колонке, поэтому и результат — строкой: так его можно сравнить с прежним как есть
+    for i, category in enumerate(categories.tolist()):
+        if category == CATEGORY_GOOD: results.append((str(category), "", "[]", status[i])); continue
+        bitmask, readings = bitmasks[i], columns['smart_readings'][i] if smart_has_lines[i] else None
+        key = (bitmask, columns['ram_gb'][i] if bitmask & ram_bits else None, readings)
+        if (problems := rendered.get(key)) is None:
+            rule_indexes = [index for index in range(rule_count) if bitmask >> index & 1]
+            problems = rendered[key] = _problem_fields(rule_set, rule_indexes, key[1], _smart_findings(readings, rule_set))
+        results.append((str(category), *problems, status[i]))
+    return results
+
+def reclassify_fleet(config, today=None):
+    """
+    Переоценивает все записи БД с текущими порогами. Пишет в БД одной транзакцией только записи, у которых
+    изменились категория, проблемы или статус SMART. Возвращает (всего записей, изменено записей).
+    """
+    rule_set = get_rule_set(config)
+    try:
+        # Чтение и запись в одной транзакции: между ними никто не успеет изменить записи
+        with database_handler.transaction() as conn:
+            columns = load_fleet_columns(conn)
+            results = render_results(columns, rule_set, *classify_columns(columns, rule_set, today))
+            stored = zip(*(columns[key] for key in RESULT_KEYS))
+            changed = [(*result, smart_found, unique_id) for result, previous, smart_found, unique_id
+                       in zip(results, stored, columns['smart_found'], columns['Имя файла']) if result != previous]
+            assignments = {key: f'new."{database_handler.sanitize_col_name(key)}"' for key in RESULT_KEYS}
+            # Первая строка "SMART Статус" — сам статус, ниже — значения атрибутов, от порогов не зависящие
+            display, status = f'{database_handler.TABLE_NAME}."{database_handler.sanitize_col_name("SMART Статус")}"', 'new."internal_smart_status"'
+            assignments['SMART Статус'] = (f'CASE WHEN new."smart_found" = 1 THEN {status} || CASE WHEN instr({display}, char(10)) > 0 '
+                                           f'THEN substr({display}, instr({display}, char(10))) ELSE \'\' END ELSE {display} END')
+            # Текст проблем больше не хранится (его собирает problems_text) — старый текст у переписанных записей сбрасываем
+            assignments['problems'] = 'NULL'
+            database_handler.update_records(conn, RESULT_KEYS + ('smart_found',), changed, assignments)
+        logger.info(f"Пакетная переоценка: записей {len(results)}, изменено {len(changed)}.")
+        return len(results), len(changed)
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при пакетной переоценке: {e}", exc_info=True)
+        return 0, 0
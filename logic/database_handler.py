@@ -4,13 +4,78 @@ import sqlite3
 import logging
 import os
 import re
+import threading
+from functools import cache
+from contextlib import contextmanager
+from datetime import datetime, date
+from collections import namedtuple
 from utils.constants import HEADERS_MAIN, HEADERS_NETWORK
+from utils.helpers import natural_sort_text
+from logic.snapshot import RAW_DATA_KEY, decode_snapshot
+from logic.derived_fields import (DERIVED_FIELDS, DERIVED_SOURCE_KEYS, TYPED_COLUMNS, SMART_FIELDS, SMART_ATTRIBUTES_KEY, HDD_REALLOCATED_ATTR, HDD_UNSTABLE_ATTRS,
+                                  compute_derived_fields, compute_smart_fields, smart_attribute_readings)
 
 logger = logging.getLogger(__name__)
 
 DB_NAME = 'system_analysis.db'
 TABLE_NAME = 'computers'
+MANIFEST_TABLE_NAME = 'report_manifest'
+QUARANTINE_TABLE_NAME = 'report_quarantine'
+# Сводка по парку для дашборда и строки состояния (число ПК по категориям, сумма дат BIOS, число ПК с каждым
+# кодом проблемы). Ее ведут триггеры в той же транзакции, что и запись в основную таблицу
+STATS_TABLE_NAME = 'fleet_stats'
+PROBLEM_STATS_TABLE_NAME = 'fleet_problem_counts'
+# Находки анализа построчно (имя файла, код проблемы, параметр) — для выборок "все ПК с проблемой X" по индексу.
+# Источник — колонка problem_findings основной таблицы, таблицу ведут триггеры
+PROBLEMS_TABLE_NAME = 'problems'
+# История SMART: показания всех атрибутов каждого диска по каждому разобранному отчету. Пополняется при каждой
+# записи отчета и не чистится при замене или удалении записи ПК — по ней считается рост значений (fetch_smart_growth)
+SMART_HISTORY_TABLE_NAME = 'smart_attributes'
+# Временная таблица новых значений для массовой правки записей (update_records)
+BULK_UPDATE_TABLE_NAME = 'bulk_update'
+# Ключ фильтра fetch_page/iter_page: код проблемы или список кодов (ПК хотя бы с одним из них)
+PROBLEM_FILTER_KEY = 'problem_code'
+# Сколько разобранных отчетов копить перед записью в БД ([Settings] db_batch_size)
+DEFAULT_DB_BATCH_SIZE = 500
+# Служебная колонка с именем файла в "естественном" порядке (pc2 раньше pc10) — по ней сортирует сама БД
+SORT_KEY = 'sort_key'
+# Нормализованный MAC-адрес (как в ARP-таблице: AA-BB-CC-DD-EE-FF); индекс построен по этому же выражению
+MAC_EXPRESSION = 'upper(replace("MAC_адрес", \':\', \'-\'))'
+# Вторичные индексы: имя -> индексируемое выражение
+INDEXES = {
+    # Категория, затем естественный порядок: и фильтр по категории, и первые N приоритетных ПК (fetch_priority_pcs)
+    'idx_computers_category_rank': f'"category", "{SORT_KEY}"',
+    'idx_computers_mac': MAC_EXPRESSION,
+    'idx_computers_pc_name': '"Название_ПК"',
+    'idx_computers_last_updated': '"last_updated"',
+    'idx_computers_sort_key': f'"{SORT_KEY}"',
+}
 
+# Индексы прежних версий, которые заменены более общими
+OBSOLETE_INDEXES = ('idx_computers_category',)
+# Полнотекстовый индекс прежних версий: строка поиска фильтрует данные модели, а триггеры индекса лишь замедляли запись
+OBSOLETE_TRIGGERS = ('computers_fts_ai', 'computers_fts_ad', 'computers_fts_au')
+OBSOLETE_TABLES = ('computers_fts',)
+
+# Настройки каждого нового соединения. WAL позволяет читать из GUI, пока фоновый поток пишет;
+# synchronous=NORMAL в режиме WAL не теряет целостность, только последние транзакции при сбое питания.
+CONNECTION_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -32768),        # 32 МБ страничного кэша (отрицательное значение — в КиБ)
+    ('mmap_size', 256 * 1024 * 1024),
+    ('temp_store', 'MEMORY'),
+    # Иначе INSERT OR REPLACE удаляет старую строку без триггера DELETE и сводка с таблицей находок расходятся с таблицей
+    ('recursive_triggers', 'ON'),
+)
+
+# Одно долгоживущее соединение на поток: sqlite3 не разрешает делить соединение между потоками,
+# а открывать новое на каждый запрос дорого (IP-обновление делало это сотни раз подряд)
+_thread_state = threading.local()
+# Колонки таблицы в открытой БД (без снимков и служебных), чтобы не спрашивать PRAGMA table_info на каждый запрос
+_table_columns_cache = {}
+
+@cache
 def _get_master_key_list():
     """
     Создает ЕДИНЫЙ, УПОРЯДОЧЕННЫЙ и УНИКАЛЬНЫЙ список всех ключей.
@@ -18,23 +83,83 @@ def _get_master_key_list():
     """
     unique_original_keys = []
     # Добавляем все уникальные заголовки, сохраняя их логический порядок
-    key_pool = HEADERS_MAIN + HEADERS_NETWORK + ['category', 'problems', 'internal_smart_status', 'last_updated']
+    key_pool = HEADERS_MAIN + HEADERS_NETWORK + ['category', 'problems', 'problem_codes', 'problem_findings', 'internal_smart_status', 'last_updated', SORT_KEY] + list(TYPED_COLUMNS)
     
     for key in key_pool:
-        # Исключаем временное поле _RAW_DATA
-        if key not in unique_original_keys and key != '_RAW_DATA':
+        if key not in unique_original_keys:
             unique_original_keys.append(key)
-    return unique_original_keys
+    return tuple(unique_original_keys)
+
+@cache
+def _column_key_map():
+    """Очищенное имя колонки -> оригинальный ключ; считается один раз."""
+    return {sanitize_col_name(key): key for key in _get_master_key_list()}
+
+def _column_type(key):
+    """Тип колонки: сжатый снимок отчета хранится как BLOB, типизированные поля — своими типами, все остальное — текстом."""
+    if key == RAW_DATA_KEY: return 'BLOB'
+    return TYPED_COLUMNS.get(key, 'TEXT')
+
+def _open_connection(path):
+    # isolation_level=None: без неявных транзакций модуля sqlite3, границы задает только transaction()
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    for name, value in CONNECTION_PRAGMAS: conn.execute(f"PRAGMA {name} = {value}")
+    conn.create_function('natural_sort_text', 1, natural_sort_text, deterministic=True)
+    return conn
 
 def get_db_connection():
-    """Устанавливает соединение с БД и возвращает объект соединения."""
+    """
+    Возвращает соединение текущего потока, открывая и настраивая его при первом обращении
+    (или если с тех пор сменился DB_NAME). Закрывать его не нужно — см. close_db_connection().
+    """
+    state = getattr(_thread_state, 'connection', None)
+    if state and state[0] == DB_NAME: return state[1]
+    close_db_connection()
     try:
-        conn = sqlite3.connect(DB_NAME, timeout=10)
-        conn.row_factory = sqlite3.Row
-        return conn
+        conn = _open_connection(DB_NAME)
     except sqlite3.Error as e:
         logger.error(f"Не удалось подключиться к базе данных {DB_NAME}: {e}")
         return None
+    _thread_state.connection = (DB_NAME, conn); _thread_state.depth = 0
+    return conn
+
+def close_db_connection():
+    """Закрывает соединение текущего потока; фоновые потоки вызывают это по завершении работы."""
+    state = getattr(_thread_state, 'connection', None)
+    _thread_state.connection = None
+    if state:
+        try: state[1].close()
+        except sqlite3.Error as e: logger.warning(f"Ошибка при закрытии соединения с {state[0]}: {e}")
+
+@contextmanager
+def transaction():
+    """
+    Транзакция на соединении текущего потока: COMMIT при выходе, ROLLBACK при исключении.
+    Вложенный вызов открывает SAVEPOINT внутри внешней транзакции: при исключении откатывается только
+    то, что записано внутри него, а внешняя транзакция продолжается. BEGIN IMMEDIATE сразу берет
+    блокировку записи, поэтому два пишущих потока ждут друг друга (до timeout), а не падают посреди транзакции.
+    """
+    conn = get_db_connection()
+    if conn is None: raise sqlite3.OperationalError(f"Нет соединения с базой данных {DB_NAME}")
+    if _thread_state.depth:
+        _thread_state.depth += 1; savepoint = f"nested_{_thread_state.depth}"
+        conn.execute(f"SAVEPOINT {savepoint}")
+        try:
+            yield conn
+            conn.execute(f"RELEASE {savepoint}")
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {savepoint}"); conn.execute(f"RELEASE {savepoint}"); raise
+        finally: _thread_state.depth -= 1
+        return
+    conn.execute("BEGIN IMMEDIATE"); _thread_state.depth = 1
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK"); raise
+    finally:
+        _thread_state.depth = 0
 
 def sanitize_col_name(name):
     """Надежно очищает имя для использования в SQL, СОХРАНЯЯ РУССКИЕ БУКВЫ."""
@@ -45,16 +170,66 @@ def sanitize_col_name(name):
     return clean_name
 
 def initialize_db():
-    """Создает базу данных и таблицу с ГАРАНТИРОВАННО уникальными именами колонок."""
-    if os.path.exists(DB_NAME): return
+    """Создает базу данных при первом запуске и досоздает служебные таблицы в уже существующей."""
+    if not os.path.exists(DB_NAME) and not _create_computers_table(): return
+    _migrate_computers_table(); _create_service_tables(); _create_stats_tables(); _create_problems_table(); _create_smart_history_table()
+
+def _migrate_computers_table():
+    """Досоздает в существующей таблице колонки, появившиеся в списке ключей позже (например, _RAW_DATA)."""
+    try:
+        with transaction() as conn:
+            existing = {info['name'] for info in conn.execute(f"PRAGMA table_info({TABLE_NAME})").fetchall()}
+            if not existing: return
+            for key in _get_master_key_list():
+                sanitized_name = sanitize_col_name(key)
+                if sanitized_name and sanitized_name not in existing:
+                    conn.execute(f'ALTER TABLE {TABLE_NAME} ADD COLUMN "{sanitized_name}" {_column_type(key)}'); existing.add(sanitized_name)
+                    logger.info(f"В таблицу '{TABLE_NAME}' добавлена колонка '{sanitized_name}'.")
+            _backfill_derived_fields(conn)
+            conn.execute(f'UPDATE {TABLE_NAME} SET "{SORT_KEY}" = natural_sort_text("{sanitize_col_name("Имя файла")}") WHERE "{SORT_KEY}" IS NULL')
+            for index_name, expression in INDEXES.items(): conn.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {TABLE_NAME} ({expression})')
+            for index_name in OBSOLETE_INDEXES: conn.execute(f'DROP INDEX IF EXISTS {index_name}')
+            for trigger_name in OBSOLETE_TRIGGERS: conn.execute(f'DROP TRIGGER IF EXISTS {trigger_name}')
+            for table_name in OBSOLETE_TABLES: conn.execute(f'DROP TABLE IF EXISTS {table_name}')
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при обновлении структуры таблицы '{TABLE_NAME}': {e}", exc_info=True)
+    finally:
+        _table_columns_cache.pop(DB_NAME, None)
+
+def _backfill_derived_fields(conn):
+    """
+    Досчитывает типизированные поля для записей, сохраненных до их появления: текстовые — по колонкам
+    записи (ram_gb у таких записей пуст), сводку SMART — по снимку отчета (пуст smart_found).
+    """
+    id_field, raw_column = sanitize_col_name('Имя файла'), sanitize_col_name(RAW_DATA_KEY)
+    source_columns = ', '.join(f'"{sanitize_col_name(key)}"' for key in DERIVED_SOURCE_KEYS)
+    rows = conn.execute(f'SELECT "{id_field}", {source_columns} FROM {TABLE_NAME} WHERE "ram_gb" IS NULL').fetchall()
+    if rows:
+        conn.executemany(_derived_update_query(), [_derived_update_params(dict(zip(DERIVED_SOURCE_KEYS, tuple(row)[1:])), row[0]) for row in rows])
+        logger.info(f"Типизированные поля досчитаны для {len(rows)} записей.")
+    rows = conn.execute(f'SELECT "{id_field}", "{raw_column}" FROM {TABLE_NAME} WHERE "smart_found" IS NULL').fetchall()
+    if rows:
+        assignments = ', '.join(f'"{key}" = ?' for key in SMART_FIELDS)
+        params = []
+        for unique_id, blob in rows:
+            smart = compute_smart_fields(snapshot['smart_drives'] if (snapshot := decode_snapshot(blob)) else None)
+            params.append(tuple(smart[key] for key in SMART_FIELDS) + (unique_id,))
+        conn.executemany(f'UPDATE {TABLE_NAME} SET {assignments} WHERE "{id_field}" = ?', params)
+        logger.info(f"Сводка SMART досчитана по снимкам для {len(rows)} записей.")
 
+def _derived_update_query():
+    assignments = ', '.join(f'"{sanitize_col_name(key)}" = ?' for key in DERIVED_FIELDS)
+    return f'UPDATE {TABLE_NAME} SET {assignments} WHERE "{sanitize_col_name("Имя файла")}" = ?'
+
+def _derived_update_params(source_data, unique_id):
+    derived = compute_derived_fields(source_data)
+    return tuple(derived[key] for key in DERIVED_FIELDS) + (unique_id,)
+
+def _create_computers_table():
+    """Создает базу данных и таблицу с ГАРАНТИРОВАННО уникальными именами колонок."""
     logger.info(f"База данных {DB_NAME} не найдена. Создаю новую...")
-    conn = get_db_connection()
-    if not conn: return
-    
+    _table_columns_cache.pop(DB_NAME, None)
     try:
-        cursor = conn.cursor()
-        
         original_keys = _get_master_key_list()
         
         column_definitions = []
@@ -73,114 +248,456 @@ def initialize_db():
             if key == 'Имя файла':
                 column_definitions.append(f'"{sanitized_name}" TEXT PRIMARY KEY')
             else:
-                column_definitions.append(f'"{sanitized_name}" TEXT')
+                column_definitions.append(f'"{sanitized_name}" {_column_type(key)}')
 
         query = f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} ({', '.join(column_definitions)})"
         
-        cursor.execute(query)
-        conn.commit()
+        with transaction() as conn: conn.execute(query)
         logger.info(f"Таблица '{TABLE_NAME}' успешно создана с {len(column_definitions)} колонками.")
+        return True
     except sqlite3.Error as e:
         logger.error(f"Критическая ошибка при создании базы данных: {e}", exc_info=True)
-        if conn: conn.close()
+        close_db_connection()
         if os.path.exists(DB_NAME): os.remove(DB_NAME)
-    finally:
-        if conn: conn.close()
+        return False
+
+def _category_bucket_sql(row):
+    """Категория записи для сводки: 1 и 2 — как есть, все остальное (в том числе пустая) считается категорией 3."""
+    return f'CASE CAST({row}."category" AS INTEGER) WHEN 1 THEN 1 WHEN 2 THEN 2 ELSE 3 END'
+
+def _problem_codes_json_sql(row):
+    """Колонка problem_codes ("1,3,6") как JSON-массив для json_each; испорченное значение — пустой массив."""
+    codes = f"'[' || coalesce({row}.\"problem_codes\", '') || ']'"
+    return f"CASE WHEN json_valid({codes}) THEN {codes} ELSE '[]' END"
+
+def _stats_delta_sql(row, sign):
+    """Операторы триггера: прибавить (sign=1) или вычесть (sign=-1) запись row (new/old) из сводки."""
+    return (f"INSERT INTO {STATS_TABLE_NAME} (stat, value) VALUES ('total', {sign}), ('category_' || {_category_bucket_sql(row)}, {sign}), "
+            f"('bios_count', {sign} * (julianday({row}.\"bios_date\") IS NOT NULL)), ('bios_julian_sum', {sign} * coalesce(julianday({row}.\"bios_date\"), 0)) "
+            f"ON CONFLICT (stat) DO UPDATE SET value = value + excluded.value; "
+            f"INSERT INTO {PROBLEM_STATS_TABLE_NAME} (code, pcs) SELECT value, {sign} FROM json_each({_problem_codes_json_sql(row)}) WHERE true "
+            f"ON CONFLICT (code) DO UPDATE SET pcs = pcs + excluded.pcs;")
+
+def _create_stats_tables():
+    """
+    Создает сводку по парку и триггеры, которые обновляют ее при каждой вставке, замене, правке и удалении
+    записи; для уже заполненной базы сводка считается один раз. Без JSON1 в сборке SQLite сводки нет,
+    и fetch_fleet_stats() возвращает None.
+    """
+    try:
+        with transaction() as conn:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (STATS_TABLE_NAME,)).fetchone(): return
+            conn.execute("SELECT json_valid('[]')")
+            conn.execute(f"CREATE TABLE {STATS_TABLE_NAME} (stat TEXT PRIMARY KEY, value REAL NOT NULL)")
+            conn.execute(f"CREATE TABLE {PROBLEM_STATS_TABLE_NAME} (code INTEGER PRIMARY KEY, pcs INTEGER NOT NULL)")
+            conn.execute(f"CREATE TRIGGER {STATS_TABLE_NAME}_ai AFTER INSERT ON {TABLE_NAME} BEGIN {_stats_delta_sql('new', 1)} END")
+            conn.execute(f"CREATE TRIGGER {STATS_TABLE_NAME}_ad AFTER DELETE ON {TABLE_NAME} BEGIN {_stats_delta_sql('old', -1)} END")
+            conn.execute(f'CREATE TRIGGER {STATS_TABLE_NAME}_au AFTER UPDATE OF "category", "problem_codes", "bios_date" ON {TABLE_NAME} '
+                         f"BEGIN {_stats_delta_sql('old', -1)} {_stats_delta_sql('new', 1)} END")
+            _add_stats(conn)
+        logger.info(f"Создана сводка по парку '{STATS_TABLE_NAME}'.")
+    except sqlite3.Error as e:
+        logger.warning(f"Сводка по парку недоступна, статистика будет считаться по записям: {e}")
+
+def _add_stats(conn, sign=1, where='true'):
+    """
+    Прибавляет (sign=1) или вычитает (sign=-1) из сводки записи, подходящие под условие where, — одним запросом
+    на таблицу сводки: при создании сводки это все записи, при массовой правке (update_records) — правленые.
+    """
+    rows = f'(SELECT "category", "problem_codes", "bios_date" FROM {TABLE_NAME} WHERE {where}) AS {TABLE_NAME}'
+    conn.execute(f"""INSERT INTO {STATS_TABLE_NAME} (stat, value) SELECT stat, value FROM (
+        SELECT 'total' AS stat, {sign} * count(*) AS value FROM {rows}
+        UNION ALL SELECT 'category_' || bucket, {sign} * count(*) FROM (SELECT {_category_bucket_sql(TABLE_NAME)} AS bucket FROM {rows}) GROUP BY bucket
+        UNION ALL SELECT 'bios_count', {sign} * count(julianday("bios_date")) FROM {rows}
+        UNION ALL SELECT 'bios_julian_sum', {sign} * coalesce(sum(julianday("bios_date")), 0) FROM {rows})
+        WHERE true ON CONFLICT (stat) DO UPDATE SET value = value + excluded.value""")
+    conn.execute(f"INSERT INTO {PROBLEM_STATS_TABLE_NAME} (code, pcs) SELECT codes.value, {sign} * count(*) FROM {rows}, "
+                 f"json_each({_problem_codes_json_sql(TABLE_NAME)}) AS codes WHERE true GROUP BY codes.value "
+                 f"ON CONFLICT (code) DO UPDATE SET pcs = pcs + excluded.pcs")
+
+def _problem_findings_json_sql(row):
+    """
+    Находки записи row как JSON-массив пар [код, параметр]. У записей без problem_findings (проанализированы
+    до ее появления или сохранены без анализа) — коды из problem_codes без параметров; испорченное значение — пустой массив.
+    """
+    findings, codes = f'{row}."problem_findings"', f'{row}."problem_codes"'
+    from_codes = f"CASE WHEN coalesce({codes}, '') = '' THEN '[]' ELSE '[[' || replace({codes}, ',', ',null],[') || ',null]]' END"
+    return f"CASE WHEN json_valid({findings}) THEN {findings} WHEN json_valid({from_codes}) THEN {from_codes} ELSE '[]' END"
+
+def _problem_rows_sql(row, source=''):
+    """SELECT строк таблицы находок (имя файла, код, параметр) для записи row; source — таблица в FROM при пересчете с нуля."""
+    return (f"SELECT {row}.\"{sanitize_col_name('Имя файла')}\", json_extract(findings.value, '$[0]'), json_extract(findings.value, '$[1]') "
+            f"FROM {source}json_each({_problem_findings_json_sql(row)}) AS findings")
+
+def _create_problems_table():
+    """
+    Создает таблицу находок с индексом по коду и триггеры, которые переписывают находки записи в той же
+    транзакции, что и саму запись; для уже заполненной базы таблица заполняется один раз.
+    """
+    id_field = sanitize_col_name('Имя файла')
+    insert_new = f"INSERT INTO {PROBLEMS_TABLE_NAME} (filename, code, value) {_problem_rows_sql('new')};"
+    delete_old = f"DELETE FROM {PROBLEMS_TABLE_NAME} WHERE filename = old.\"{id_field}\";"
+    try:
+        with transaction() as conn:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (PROBLEMS_TABLE_NAME,)).fetchone(): return
+            conn.execute(f"CREATE TABLE {PROBLEMS_TABLE_NAME} (filename TEXT NOT NULL, code INTEGER NOT NULL, value)")
+            conn.execute(f"CREATE INDEX idx_problems_code ON {PROBLEMS_TABLE_NAME} (code, filename)")
+            conn.execute(f"CREATE INDEX idx_problems_filename ON {PROBLEMS_TABLE_NAME} (filename)")
+            conn.execute(f"CREATE TRIGGER {PROBLEMS_TABLE_NAME}_ai AFTER INSERT ON {TABLE_NAME} BEGIN {insert_new} END")
+            conn.execute(f"CREATE TRIGGER {PROBLEMS_TABLE_NAME}_ad AFTER DELETE ON {TABLE_NAME} BEGIN {delete_old} END")
+            conn.execute(f'CREATE TRIGGER {PROBLEMS_TABLE_NAME}_au AFTER UPDATE OF "{id_field}", "problem_codes", "problem_findings" ON {TABLE_NAME} '
+                         f"BEGIN {delete_old} {insert_new} END")
+            conn.execute(f"INSERT INTO {PROBLEMS_TABLE_NAME} (filename, code, value) {_problem_rows_sql(TABLE_NAME, f'{TABLE_NAME}, ')}")
+        logger.info(f"Создана таблица находок '{PROBLEMS_TABLE_NAME}'.")
+    except sqlite3.Error as e:
+        logger.warning(f"Таблица находок недоступна, выборки по кодам проблем будут идти по problem_codes: {e}")
+
+def _create_smart_history_table():
+    """
+    Создает историю SMART с индексами: (attr_id, raw_value) — для выборок по порогу, уникальный (attr_id, файл,
+    диск, дата отчета) — для роста значений по диску. Для уже заполненной базы история начинается с показаний
+    из снимков отчетов; дата — время изменения файла из манифеста (или время записи, если файла в манифесте нет).
+    """
+    id_field, raw_column = sanitize_col_name('Имя файла'), sanitize_col_name(RAW_DATA_KEY)
+    try:
+        with transaction() as conn:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (SMART_HISTORY_TABLE_NAME,)).fetchone(): return
+            conn.execute(f"""CREATE TABLE {SMART_HISTORY_TABLE_NAME} (
+                filename TEXT NOT NULL, drive TEXT NOT NULL, is_ssd INTEGER NOT NULL, attr_id TEXT NOT NULL,
+                raw_value NUMERIC, report_date TEXT NOT NULL)""")
+            conn.execute(f"CREATE UNIQUE INDEX idx_smart_attributes_drive ON {SMART_HISTORY_TABLE_NAME} (attr_id, filename, drive, report_date)")
+            conn.execute(f"CREATE INDEX idx_smart_attributes_value ON {SMART_HISTORY_TABLE_NAME} (attr_id, raw_value)")
+            rows = conn.execute(f'SELECT c."{id_field}", c."{raw_column}", m.mtime_ns, c."last_updated" FROM {TABLE_NAME} c '
+                                f'LEFT JOIN {MANIFEST_TABLE_NAME} m ON m.filename = c."{id_field}" WHERE c."{raw_column}" IS NOT NULL').fetchall()
+            for unique_id, blob, mtime_ns, last_updated in rows:
+                if not (snapshot := decode_snapshot(blob)) or not snapshot.get('smart_drives'): continue
+                report_date = datetime.fromtimestamp(mtime_ns / 1e9).isoformat(timespec='seconds') if mtime_ns else last_updated
+                if report_date: _append_smart_history(conn, [(unique_id, smart_attribute_readings(snapshot['smart_drives'], report_date))])
+        logger.info(f"Создана история SMART '{SMART_HISTORY_TABLE_NAME}'.")
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при создании истории SMART: {e}", exc_info=True)
+
+SmartReading = namedtuple('SmartReading', 'filename drive is_ssd attr_id raw_value report_date')
+SmartGrowth = namedtuple('SmartGrowth', 'filename drive attr_id first_date last_date first_value last_value per_day')
+
+def fetch_smart_readings_above(attr_id, threshold, is_ssd=None):
+    """
+    Последние показания атрибута attr_id, которые больше threshold, — по диску на строку, по убыванию значения.
+    is_ssd=True/False — только SSD или только HDD. Например, ('05', 0, False) — HDD с переназначенными секторами.
+    """
+    conn = get_db_connection()
+    if not conn: return []
+    drive_filter, params = ('AND s.is_ssd = ?', (attr_id, threshold, int(is_ssd))) if is_ssd is not None else ('', (attr_id, threshold))
+    try:
+        rows = conn.execute(f"""SELECT s.filename, s.drive, s.is_ssd, s.attr_id, s.raw_value, s.report_date FROM {SMART_HISTORY_TABLE_NAME} s
+            WHERE s.attr_id = ? AND s.raw_value > ? {drive_filter} AND NOT EXISTS (SELECT 1 FROM {SMART_HISTORY_TABLE_NAME} n
+                WHERE n.attr_id = s.attr_id AND n.filename = s.filename AND n.drive = s.drive AND n.report_date > s.report_date)
+            ORDER BY s.raw_value DESC, s.filename, s.drive""", params).fetchall()
+        return [SmartReading(*row) for row in rows]
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при выборке из истории SMART: {e}", exc_info=True)
+        return []
+
+def fetch_smart_growth(attr_ids=(HDD_REALLOCATED_ATTR, *HDD_UNSTABLE_ATTRS), min_per_day=0.0):
+    """
+    Рост значений атрибутов attr_ids по каждому диску между первым и последним отчетом (одним проходом по индексу
+    истории): диски, у которых значение за сутки растет больше чем на min_per_day, — по убыванию скорости роста.
+    По умолчанию — переназначенные и нестабильные сектора HDD.
+    """
+    conn = get_db_connection()
+    if not conn or not attr_ids: return []
+    attr_ids = list(attr_ids)
+    try:
+        rows = conn.execute(f"""SELECT filename, drive, attr_id, first_date, last_date, first_value, last_value,
+                (last_value - first_value) / (julianday(last_date) - julianday(first_date)) AS per_day
+            FROM (SELECT filename, drive, attr_id, report_date AS last_date, raw_value AS last_value,
+                    first_value(report_date) OVER drive_history AS first_date, first_value(raw_value) OVER drive_history AS first_value,
+                    lead(report_date) OVER drive_history AS next_date
+                FROM {SMART_HISTORY_TABLE_NAME} WHERE attr_id IN ({", ".join(["?"] * len(attr_ids))})
+                WINDOW drive_history AS (PARTITION BY attr_id, filename, drive ORDER BY report_date))
+            WHERE next_date IS NULL AND julianday(last_date) > julianday(first_date) AND per_day > ?
+            ORDER BY per_day DESC, filename, drive, attr_id""", (*attr_ids, min_per_day)).fetchall()
+        return [SmartGrowth(*row) for row in rows]
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при расчете роста SMART: {e}", exc_info=True)
+        return []
+
+FleetStats = namedtuple('FleetStats', 'total categories problem_counts average_bios_age_years')
+
+def fetch_fleet_stats(today=None):
+    """
+    Сводка по парку: всего ПК, {категория: число ПК}, {код проблемы: число ПК} (по убыванию) и средний
+    возраст BIOS в годах ('N/A' — дат нет). Читает несколько строк сводки, сколько бы записей ни было в базе.
+    None — сводки нет.
+    """
+    conn = get_db_connection()
+    if not conn: return None
+    try:
+        values = dict(conn.execute(f"SELECT stat, value FROM {STATS_TABLE_NAME}").fetchall())
+        problem_counts = dict(conn.execute(f"SELECT code, pcs FROM {PROBLEM_STATS_TABLE_NAME} WHERE pcs > 0 ORDER BY pcs DESC, code").fetchall())
+    except sqlite3.Error as e:
+        logger.warning(f"Не удалось прочитать сводку по парку: {e}")
+        return None
+    average_bios_age_years, bios_count = 'N/A', int(values.get('bios_count', 0))
+    if bios_count:
+        # Юлианский день полуночи сегодняшней даты: возраст в полных днях, как (datetime.now() - дата BIOS).days
+        today_julian = (today or date.today()).toordinal() + 1721424.5
+        average_bios_age_years = round((today_julian - values['bios_julian_sum'] / bios_count) / 365.25, 1)
+    categories = {category: int(values.get(f'category_{category}', 0)) for category in (1, 2, 3)}
+    return FleetStats(int(values.get('total', 0)), categories, problem_counts, average_bios_age_years)
+
+def filenames_with_problems(codes):
+    """
+    Имена файлов ПК, у которых есть хотя бы одна из проблем codes (см. logic.rules.ProblemCode), — по индексу
+    таблицы находок. None — таблицы нет, отбирать должен вызывающий (по problem_codes записей).
+    """
+    codes = [int(code) for code in codes]
+    conn = get_db_connection()
+    if not conn: return None
+    if not codes: return set()
+    try:
+        rows = conn.execute(f'SELECT DISTINCT filename FROM {PROBLEMS_TABLE_NAME} WHERE code IN ({", ".join(["?"] * len(codes))})', codes).fetchall()
+        return {row[0] for row in rows}
+    except sqlite3.Error as e:
+        logger.warning(f"Не удалось выбрать ПК по кодам проблем {codes}: {e}")
+        return None
+
+def _create_service_tables():
+    """Создает служебные таблицы (манифест и карантин отчетов), если их еще нет."""
+    try:
+        with transaction() as conn:
+            conn.execute(f"""CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE_NAME} (
+                filename TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL, last_scanned TEXT)""")
+            # Отчеты, которые не удалось разобрать (лимит времени/размера, ошибка); пропускаются, пока файл не изменится
+            conn.execute(f"""CREATE TABLE IF NOT EXISTS {QUARANTINE_TABLE_NAME} (
+                filename TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+                content_hash TEXT, reason TEXT NOT NULL, quarantined_at TEXT)""")
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при создании служебных таблиц: {e}", exc_info=True)
 
 def save_data_to_db(data_list):
     """Сохраняет данные в БД, используя стабильный и полный список колонок."""
     if not data_list: return
-    conn = get_db_connection()
-    if not conn: return
-    
     try:
-        cursor = conn.cursor()
-        
-        original_keys = _get_master_key_list()
-        
-        # Получаем список колонок из БД
-        cursor.execute(f"PRAGMA table_info({TABLE_NAME})")
-        db_columns_info = cursor.fetchall()
-        db_columns_set = {info['name'] for info in db_columns_info}
-
-        rows_to_insert = []
-        for data_row in data_list:
-            values_for_row = []
-            columns_for_row = []
-
-            for key in original_keys:
-                sanitized_key = sanitize_col_name(key)
-                if sanitized_key in db_columns_set:
-                    columns_for_row.append(f'"{sanitized_key}"')
-                    value = data_row.get(key)
-                    if isinstance(value, list):
-                        value = "; ".join(map(str, value))
-                    values_for_row.append(str(value) if value is not None else None)
-            
-            if values_for_row:
-                placeholders = ', '.join(['?'] * len(values_for_row))
-                query = f"INSERT OR REPLACE INTO {TABLE_NAME} ({', '.join(columns_for_row)}) VALUES ({placeholders})"
-                cursor.execute(query, tuple(values_for_row))
-
-        conn.commit()
+        with transaction() as conn:
+            _insert_rows(conn, data_list)
         logger.info(f"Успешно сохранено/обновлено {len(data_list)} записей в БД.")
     except sqlite3.Error as e:
         logger.error(f"Ошибка при массовом сохранении в БД: {e}", exc_info=True)
-    finally:
-        if conn: conn.close()
 
-def fetch_all_data_from_db():
-    """Извлекает все данные из БД и возвращает их в виде словарей с оригинальными именами ключей."""
+def _insert_statement(conn):
+    """Ключи записей, которым есть колонка в таблице, и один INSERT OR REPLACE на все эти колонки."""
+    db_columns_set = {info['name'] for info in conn.execute(f"PRAGMA table_info({TABLE_NAME})").fetchall()}
+    keys = [key for key in _get_master_key_list() if sanitize_col_name(key) in db_columns_set]
+    columns = ', '.join(f'"{sanitize_col_name(key)}"' for key in keys)
+    return keys, f"INSERT OR REPLACE INTO {TABLE_NAME} ({columns}) VALUES ({', '.join(['?'] * len(keys))})"
+
+def _row_values(data_row, keys, updated_at):
+    values = []
+    for key in keys:
+        if key == SORT_KEY: value = natural_sort_text(data_row.get('Имя файла'))
+        elif key == 'last_updated': value = updated_at
+        else: value = data_row.get(key)
+        if isinstance(value, list): value = "; ".join(map(str, value))
+        if isinstance(value, (bytes, int, float)) or value is None: values.append(value)
+        else: values.append(str(value))
+    return values
+
+def _insert_rows(conn, data_list):
+    keys, query = _insert_statement(conn)
+    updated_at = datetime.now().isoformat(timespec='seconds')
+    if keys: conn.executemany(query, (_row_values(data_row, keys, updated_at) for data_row in data_list))
+    _append_smart_history(conn, ((data_row['Имя файла'], data_row[SMART_ATTRIBUTES_KEY]) for data_row in data_list if data_row.get(SMART_ATTRIBUTES_KEY)))
+
+def _append_smart_history(conn, readings_by_file):
+    """Дописывает в историю SMART показания [(имя файла, [(диск, is_ssd, ID, значение, дата отчета), ...]), ...]; повтор того же отчета не дублируется."""
+    conn.executemany(f"INSERT OR IGNORE INTO {SMART_HISTORY_TABLE_NAME} (filename, drive, is_ssd, attr_id, raw_value, report_date) VALUES (?, ?, ?, ?, ?, ?)",
+                     ((filename, *reading) for filename, readings in readings_by_file for reading in readings))
+
+def write_report_batch(rows, manifest):
+    """Записывает пачку отчетов с их строками манифеста одной транзакцией. Возвращает число записанных записей."""
+    try:
+        with transaction() as conn:
+            _insert_rows(conn, rows); _write_manifest(conn, manifest); _delete_quarantine(conn, [entry[0] for entry in manifest])
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при записи пачки из {len(rows)} записей в БД: {e}", exc_info=True)
+        return 0
+    logger.debug(f"В БД записана пачка из {len(rows)} записей.")
+    return len(rows)
+
+class ReportBatchWriter:
+    """
+    Пишет разобранные отчеты в БД по мере поступления, пачками по batch_size записей: одна транзакция
+    и один подготовленный INSERT (executemany) на пачку. Вместе с записями пачки сохраняются их строки
+    манифеста и снимается карантин — после остановки или падения посреди разбора уже записанные пачки
+    не придется разбирать заново. Как контекстный менеджер дописывает остаток при выходе.
+    submit(func, *args) -> Future — отдать запись пачки другому потоку (см. logic.db_writer); тогда
+    в очереди держится не больше MAX_PENDING_BATCHES пачек, чтобы память не росла, если запись отстает.
+    """
+    MAX_PENDING_BATCHES = 2
+
+    def __init__(self, batch_size=DEFAULT_DB_BATCH_SIZE, submit=None):
+        self.batch_size = max(1, batch_size); self.written = 0; self._submit = submit
+        self._rows, self._manifest, self._pending = [], [], []
+
+    def add(self, data_row, manifest_entry=None):
+        """Добавляет запись (и ее строку манифеста); при заполнении пачки сбрасывает ее в БД."""
+        self._rows.append(data_row)
+        if manifest_entry: self._manifest.append(manifest_entry)
+        if len(self._rows) >= self.batch_size: self.flush()
+
+    def flush(self):
+        """Отправляет накопленное на запись одной транзакцией (без submit — записывает сразу)."""
+        if not self._rows: return
+        rows, manifest = self._rows, self._manifest; self._rows, self._manifest = [], []
+        if self._submit is None: self.written += write_report_batch(rows, manifest); return
+        self._pending.append(self._submit(write_report_batch, rows, manifest))
+        while len(self._pending) > self.MAX_PENDING_BATCHES: self.written += self._pending.pop(0).result()
+
+    def wait(self):
+        """Дожидается записи всех отправленных пачек."""
+        while self._pending: self.written += self._pending.pop(0).result()
+
+    def __enter__(self): return self
+
+    def __exit__(self, exc_type, exc_value, traceback): self.flush(); self.wait()
+
+def _table_columns(conn):
+    """Колонки основной таблицы для выборок: без снимков отчетов (таблицам и Excel не нужны, а весят больше всех
+    остальных колонок вместе) и без служебного ключа сортировки. Пустой список — таблицы нет."""
+    columns = _table_columns_cache.get(DB_NAME)
+    if columns is None:
+        hidden = {sanitize_col_name(RAW_DATA_KEY), SORT_KEY}
+        columns = _table_columns_cache[DB_NAME] = [info['name'] for info in conn.execute(f"PRAGMA table_info({TABLE_NAME})").fetchall() if info['name'] not in hidden]
+    return columns
+
+def _restore_row(row, columns, key_map):
+    """Строку БД -> словарь с оригинальными именами ключей; категория — числом."""
+    restored = {key_map.get(column, column): value for column, value in zip(columns, row)}
+    if restored.get('category') is not None:
+        try: restored['category'] = int(float(restored['category']))
+        except (ValueError, TypeError): restored['category'] = 3
+    return restored
+
+def _column_for_key(key):
+    column = sanitize_col_name(key)
+    if column not in _column_key_map(): raise ValueError(f"Неизвестное поле для выборки: '{key}'")
+    return f'"{column}"'
+
+def _iter_rows(where='', params=(), order_sql=f'"{SORT_KEY}"', offset=0, limit=None, batch_size=DEFAULT_DB_BATCH_SIZE, restore=True):
+    """Генератор записей выборки: курсор читается пачками по batch_size, в памяти одновременно только одна пачка.
+    restore=False — кортежи значений колонок в порядке table_keys() вместо словарей."""
     conn = get_db_connection()
-    if not conn: return []
+    if not conn: return
+    cursor = None
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (TABLE_NAME,))
-        if cursor.fetchone() is None:
+        columns = _table_columns(conn)
+        if not columns:
             logger.warning(f"Таблица '{TABLE_NAME}' не найдена в базе данных. Возвращаю пустой список.")
-            return []
-        
-        rows = conn.execute(f"SELECT * FROM {TABLE_NAME}").fetchall()
-        
-        original_keys = _get_master_key_list()
-        key_map = {sanitize_col_name(h): h for h in original_keys}
-        
-        restored_data = []
-        for row in rows:
-            new_row_dict = {}
-            for sanitized_key in row.keys():
-                original_key = key_map.get(sanitized_key, sanitized_key)
-                if original_key == 'category' and row[sanitized_key] is not None:
-                    try:
-                        new_row_dict[original_key] = int(float(row[sanitized_key]))
-                    except (ValueError, TypeError):
-                        new_row_dict[original_key] = 3
-                else:
-                    new_row_dict[original_key] = row[sanitized_key]
-
-            restored_data.append(new_row_dict)
-        return restored_data
+            return
+        query = f'SELECT {", ".join(f"{chr(34)}{column}{chr(34)}" for column in columns)} FROM {TABLE_NAME}'
+        if where: query += f' WHERE {where}'
+        query += f' ORDER BY {order_sql} LIMIT ? OFFSET ?'
+        cursor = conn.cursor(); cursor.row_factory = None
+        cursor.execute(query, (*params, -1 if limit is None else limit, offset))
+        key_map = _column_key_map()
+        while rows := cursor.fetchmany(batch_size):
+            if restore: yield from (_restore_row(row, columns, key_map) for row in rows)
+            else: yield from rows
     except sqlite3.Error as e:
         logger.error(f"Ошибка при чтении данных из БД: {e}", exc_info=True)
-        return []
     finally:
-        if conn: conn.close()
+        if cursor is not None: cursor.close()
+
+def _fetch_rows(where='', params=(), order_sql=f'"{SORT_KEY}"', offset=0, limit=None):
+    return list(_iter_rows(where, params, order_sql, offset, limit))
+
+def _page_query(filters, order):
+    """(условие WHERE, параметры, ORDER BY) для fetch_page/iter_page."""
+    conditions, params = [], []
+    for key, value in (filters or {}).items():
+        if key == PROBLEM_FILTER_KEY:
+            # Записи хотя бы с одной из проблем — подзапрос по индексу таблицы находок
+            codes = [int(code) for code in (value if isinstance(value, (list, tuple, set)) else [value])]
+            conditions.append(f'"{sanitize_col_name("Имя файла")}" IN (SELECT filename FROM {PROBLEMS_TABLE_NAME} WHERE code IN ({", ".join(["?"] * len(codes))}))')
+            params.extend(codes); continue
+        if isinstance(value, (list, tuple, set)):
+            value = list(value); conditions.append(f'{_column_for_key(key)} IN ({", ".join(["?"] * len(value))})'); params.extend(value)
+        else:
+            conditions.append(f'{_column_for_key(key)} = ?'); params.append(value)
+    order_sql = f'"{SORT_KEY}"'
+    if order:
+        descending = order.startswith('-')
+        order_sql = f'{_column_for_key(order.lstrip("-"))}{" DESC" if descending else ""}, "{SORT_KEY}"'
+    return ' AND '.join(conditions), params, order_sql
+
+def fetch_page(filters=None, order=None, offset=0, limit=None):
+    """
+    Возвращает страницу записей в виде словарей с оригинальными именами ключей (без снимков отчетов).
+    filters — {ключ: значение или список значений}, в том числе {PROBLEM_FILTER_KEY: коды проблем}, order — ключ
+    сортировки ('-ключ' — по убыванию; по умолчанию естественный порядок имен файлов), limit=None — все записи начиная с offset.
+    """
+    where, params, order_sql = _page_query(filters, order)
+    return _fetch_rows(where, params, order_sql, offset, limit)
+
+def iter_page(filters=None, order=None, batch_size=DEFAULT_DB_BATCH_SIZE):
+    """То же, что fetch_page() без offset/limit, но записи отдаются по одной прямо с курсора (для экспорта)."""
+    where, params, order_sql = _page_query(filters, order)
+    return _iter_rows(where, params, order_sql, batch_size=batch_size)
+
+class StreamedRows:
+    """
+    Выборка для многопроходной обработки без загрузки в память: каждый проход (for) открывает новый
+    курсор через iter_page(). Фильтры и порядок — как у fetch_page().
+    """
+    def __init__(self, filters=None, order=None, batch_size=DEFAULT_DB_BATCH_SIZE): self.filters, self.order, self.batch_size = filters, order, batch_size
+
+    def __iter__(self): return iter_page(self.filters, self.order, self.batch_size)
+
+def table_keys():
+    """Оригинальные ключи колонок, которые отдают выборки (без снимков отчетов и служебного ключа сортировки)."""
+    conn = get_db_connection(); key_map = _column_key_map()
+    return [key_map.get(column, column) for column in _table_columns(conn)]
+
+def iter_table(batch_size=DEFAULT_DB_BATCH_SIZE):
+    """Все записи в естественном порядке кортежами значений в порядке table_keys() — без сборки словарей (потоковые экспортеры)."""
+    return _iter_rows(batch_size=batch_size, restore=False)
+
+def backup_database(target_path):
+    """
+    Согласованная копия всей БД в target_path через backup API SQLite: копируется одним шагом, поэтому
+    параллельные записи в копию не попадают наполовину. Копия переводится из WAL в обычный журнал,
+    чтобы быть одним самодостаточным файлом.
+    """
+    target = sqlite3.connect(target_path)
+    try:
+        get_db_connection().backup(target)
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally: target.close()
+
+def fetch_priority_pcs(limit=5):
+    """Первые limit записей по приоритету: сначала категория 1, затем 2 и 3, внутри — естественный порядок (по индексу)."""
+    return _fetch_rows('"category" IS NOT NULL', (), f'"category", "{SORT_KEY}"', limit=limit)
+
+def fetch_one(unique_id):
+    """Одна запись по имени файла или None."""
+    rows = _fetch_rows(f'"{sanitize_col_name("Имя файла")}" = ?', (unique_id,), limit=1)
+    return rows[0] if rows else None
+
+def fetch_by_mac(mac_address):
+    """Записи с указанным MAC-адресом (в любом написании: aa:bb:... или AA-BB-...), по индексу."""
+    return _fetch_rows(f'{MAC_EXPRESSION} = ?', (mac_address.upper().replace(':', '-'),))
+
+def fetch_all_data_from_db():
+    """Извлекает все данные из БД (в естественном порядке имен файлов) с оригинальными именами ключей."""
+    return fetch_page()
 
 def update_single_field_in_db(unique_id, field_name, new_value):
     """Надежно обновляет одно поле для одной записи в БД."""
-    conn = get_db_connection()
-    if not conn: return False
     try:
-        sanitized_field = sanitize_col_name(field_name)
-        sanitized_id_field = sanitize_col_name("Имя файла")
-        
-        query = f'UPDATE {TABLE_NAME} SET "{sanitized_field}" = ? WHERE "{sanitized_id_field}" = ?'
-        
-        cursor = conn.cursor()
-        cursor.execute(query, (new_value, unique_id))
-        conn.commit()
-        
-        if cursor.rowcount > 0:
+        with transaction() as conn: updated = update_fields(conn, unique_id, {field_name: new_value})
+        if updated:
             logger.info(f"Поле '{field_name}' для записи '{unique_id}' обновлено в БД.")
             return True
         else:
@@ -189,5 +706,115 @@ def update_single_field_in_db(unique_id, field_name, new_value):
     except sqlite3.Error as e:
         logger.error(f"Ошибка при обновлении поля '{field_name}': {e}", exc_info=True)
         return False
-    finally:
-        if conn: conn.close()
\ No newline at end of file
+
+def update_fields(conn, unique_id, fields):
+    """
+    Обновляет несколько полей одной записи одним UPDATE в текущей транзакции conn; при правке текстовых полей,
+    из которых считаются типизированные, пересчитывает и их. Возвращает True, если запись нашлась.
+    """
+    sanitized_id_field = sanitize_col_name("Имя файла")
+    assignments = ', '.join(f'"{sanitize_col_name(field_name)}" = ?' for field_name in fields)
+    cursor = conn.execute(f'UPDATE {TABLE_NAME} SET {assignments}, "last_updated" = ? WHERE "{sanitized_id_field}" = ?',
+                          (*fields.values(), datetime.now().isoformat(timespec='seconds'), unique_id))
+    if cursor.rowcount > 0 and any(field_name in DERIVED_SOURCE_KEYS for field_name in fields):
+        # Правка текстового поля — пересчитываем зависящие от него типизированные колонки
+        source_columns = ', '.join(f'"{sanitize_col_name(key)}"' for key in DERIVED_SOURCE_KEYS)
+        row = conn.execute(f'SELECT {source_columns} FROM {TABLE_NAME} WHERE "{sanitized_id_field}" = ?', (unique_id,)).fetchone()
+        conn.execute(_derived_update_query(), _derived_update_params(dict(zip(DERIVED_SOURCE_KEYS, tuple(row))), unique_id))
+    return cursor.rowcount > 0
+
+def update_records(conn, keys, rows, assignments=None):
+    """
+    Массовая правка записей одним UPDATE в текущей транзакции conn: rows — кортежи (значения keys..., имя файла),
+    они сначала ложатся во временную таблицу new. assignments — {ключ колонки: SQL-выражение}, если колонку нужно
+    вычислить (новые значения — new."<колонка>", прежние — {TABLE_NAME}."<колонка>"); по умолчанию колонки keys
+    получают новые значения. Построчные триггеры UPDATE сводки и таблицы находок на время правки снимаются (откат
+    транзакции их вернет): вклад правленых записей в сводку вычитается до правки и прибавляется после, находки
+    правленых записей переписываются двумя запросами.
+    Возвращает число правленых записей.
+    """
+    if not rows: return 0
+    id_field, columns = sanitize_col_name('Имя файла'), [sanitize_col_name(key) for key in keys]
+    assignments = assignments or {key: f'new."{column}"' for key, column in zip(keys, columns)}
+    bulk_table, in_bulk = f'temp.{BULK_UPDATE_TABLE_NAME}', f'"{id_field}" IN (SELECT "{id_field}" FROM temp.{BULK_UPDATE_TABLE_NAME})'
+    conn.execute(f'DROP TABLE IF EXISTS {bulk_table}')
+    conn.execute(f'CREATE TABLE {bulk_table} ({", ".join(f"{chr(34)}{column}{chr(34)}" for column in columns)}, "{id_field}" TEXT PRIMARY KEY)')
+    conn.executemany(f'INSERT INTO {bulk_table} VALUES ({", ".join("?" * (len(columns) + 1))})', rows)
+
+    suspended = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN (?, ?)",
+                                  (f'{STATS_TABLE_NAME}_au', f'{PROBLEMS_TABLE_NAME}_au')).fetchall())
+    for trigger_name in suspended: conn.execute(f'DROP TRIGGER {trigger_name}')
+    if f'{STATS_TABLE_NAME}_au' in suspended: _add_stats(conn, -1, in_bulk)
+    targets = ', '.join(f'"{sanitize_col_name(key)}"' for key in assignments)
+    cursor = conn.execute(f'UPDATE {TABLE_NAME} SET ({targets}) = (SELECT {", ".join(assignments.values())} FROM {bulk_table} AS new '
+                          f'WHERE new."{id_field}" = {TABLE_NAME}."{id_field}") WHERE {in_bulk}')
+    if f'{PROBLEMS_TABLE_NAME}_au' in suspended:
+        conn.execute(f'DELETE FROM {PROBLEMS_TABLE_NAME} WHERE filename IN (SELECT "{id_field}" FROM {bulk_table})')
+        conn.execute(f"INSERT INTO {PROBLEMS_TABLE_NAME} (filename, code, value) {_problem_rows_sql(TABLE_NAME, f'{TABLE_NAME}, ')} WHERE {TABLE_NAME}.{in_bulk}")
+    if f'{STATS_TABLE_NAME}_au' in suspended: _add_stats(conn, 1, in_bulk)
+    for query in suspended.values(): conn.execute(query)
+    conn.execute(f'DROP TABLE {bulk_table}')
+    return cursor.rowcount
+
+def fetch_report_manifest():
+    """
+    Возвращает манифест {имя файла: (размер, mtime_ns, хеш)} только для тех отчетов,
+    чья запись со снимком есть в основной таблице, — иначе файл все равно нужно разобрать заново
+    (в том числе записи, сохраненные до появления снимков _RAW_DATA).
+    """
+    conn = get_db_connection()
+    if not conn: return {}
+    try:
+        id_field = sanitize_col_name("Имя файла")
+        rows = conn.execute(f'SELECT m.filename, m.size, m.mtime_ns, m.content_hash FROM {MANIFEST_TABLE_NAME} m '
+                            f'JOIN {TABLE_NAME} c ON c."{id_field}" = m.filename WHERE c."{sanitize_col_name(RAW_DATA_KEY)}" IS NOT NULL').fetchall()
+        return {row['filename']: (row['size'], row['mtime_ns'], row['content_hash']) for row in rows}
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при чтении манифеста отчетов: {e}", exc_info=True)
+        return {}
+
+def save_report_manifest(entries):
+    """Сохраняет записи манифеста: список кортежей (имя файла, размер, mtime_ns, хеш)."""
+    if not entries: return
+    try:
+        with transaction() as conn: _write_manifest(conn, entries)
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при сохранении манифеста отчетов: {e}", exc_info=True)
+
+def _write_manifest(conn, entries):
+    scanned_at = datetime.now().isoformat(timespec='seconds')
+    conn.executemany(f"INSERT OR REPLACE INTO {MANIFEST_TABLE_NAME} (filename, size, mtime_ns, content_hash, last_scanned) VALUES (?, ?, ?, ?, ?)",
+                     [(*entry, scanned_at) for entry in entries])
+
+def fetch_quarantine():
+    """Возвращает карантин {имя файла: (размер, mtime_ns, хеш или None, причина)}."""
+    conn = get_db_connection()
+    if not conn: return {}
+    try:
+        rows = conn.execute(f'SELECT filename, size, mtime_ns, content_hash, reason FROM {QUARANTINE_TABLE_NAME}').fetchall()
+        return {row['filename']: (row['size'], row['mtime_ns'], row['content_hash'], row['reason']) for row in rows}
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при чтении карантина отчетов: {e}", exc_info=True)
+        return {}
+
+def save_quarantine(entries):
+    """Помещает отчеты в карантин: список кортежей (имя файла, размер, mtime_ns, хеш или None, причина)."""
+    if not entries: return
+    try:
+        quarantined_at = datetime.now().isoformat(timespec='seconds')
+        with transaction() as conn:
+            conn.executemany(f"INSERT OR REPLACE INTO {QUARANTINE_TABLE_NAME} (filename, size, mtime_ns, content_hash, reason, quarantined_at) VALUES (?, ?, ?, ?, ?, ?)",
+                             [(*entry, quarantined_at) for entry in entries])
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при сохранении карантина отчетов: {e}", exc_info=True)
+
+def release_from_quarantine(filenames):
+    """Убирает из карантина отчеты, которые теперь разобрались успешно."""
+    if not filenames: return
+    try:
+        with transaction() as conn: _delete_quarantine(conn, filenames)
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при очистке карантина отчетов: {e}", exc_info=True)
+
+def _delete_quarantine(conn, filenames):
+    conn.executemany(f"DELETE FROM {QUARANTINE_TABLE_NAME} WHERE filename = ?", [(filename,) for filename in filenames])
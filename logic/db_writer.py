@@ -0,0 +1,136 @@
+# logic/db_writer.py
+# Единственный пишущий в БД поток. Правки ячеек, обновление IP, сохранение разобранных отчетов и переоценка
+# отправляют команды в его очередь из любого потока; он выполняет накопившиеся команды одной транзакцией,
+# поэтому потоки больше не ждут друг друга на блокировке записи SQLite.
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+from PySide6.QtCore import QObject, Signal
+
+from logic.database_handler import transaction, close_db_connection, update_fields
+
+logger = logging.getLogger(__name__)
+
+# Сколько команд из очереди выполнять одной транзакцией
+DEFAULT_MAX_GROUP = 256
+_STOP = object()
+
+class _Call:
+    """Команда общего вида: функция, выполняемая в пишущем потоке внутри групповой транзакции."""
+    __slots__ = ('func', 'args', 'kwargs', 'futures')
+    def __init__(self, func, args, kwargs): self.func, self.args, self.kwargs, self.futures = func, args, kwargs, [Future()]
+    def run(self, conn): return self.func(*self.args, **self.kwargs)
+
+class _FieldUpdate:
+    """Правка полей одной записи; правки одной записи, пришедшие подряд, сливаются в один UPDATE."""
+    __slots__ = ('unique_id', 'fields', 'futures')
+    def __init__(self, unique_id, fields): self.unique_id, self.fields, self.futures = unique_id, dict(fields), [Future()]
+    def run(self, conn): return update_fields(conn, self.unique_id, self.fields)
+
+class DbWriter(QObject):
+    """
+    Фоновый поток, через который идут все записи в БД. Каждый метод возвращает Future с результатом,
+    который завершается после COMMIT. Готовые правки полей сообщаются сигналом fields_updated
+    со списком (имя файла, поле, значение, успех).
+    """
+    log_message = Signal(str, str); fields_updated = Signal(list)
+
+    def __init__(self, max_group=DEFAULT_MAX_GROUP):
+        super().__init__(); self.max_group = max(1, max_group)
+        self._queue = queue.SimpleQueue(); self._thread = None; self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='DbWriter', daemon=True); self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Дописывает все, что уже в очереди, и останавливает поток."""
+        with self._lock:
+            if self._thread is None: return
+            self._queue.put(_STOP); self._thread.join(timeout); self._thread = None
+
+    def call(self, func, *args, **kwargs):
+        """Выполняет func(*args, **kwargs) в пишущем потоке (внутри его транзакции). Возвращает Future."""
+        return self._put(_Call(func, args, kwargs))
+
+    def update_field(self, unique_id, field_name, new_value):
+        """Правка одного поля записи; Future с True, если запись нашлась."""
+        return self._put(_FieldUpdate(unique_id, {field_name: new_value}))
+
+    def flush(self, timeout=None):
+        """Дожидается выполнения всех команд, отправленных до этого вызова."""
+        self.call(lambda: None).result(timeout)
+
+    def _put(self, command):
+        if self._thread is None: self.start()
+        self._queue.put(command); return command.futures[0]
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            group = [self._queue.get()]
+            # Все, что успело накопиться, пока шла предыдущая транзакция, идет одной группой: задержки нет,
+            # а под нагрузкой группы растут сами собой
+            while len(group) < self.max_group:
+                try: group.append(self._queue.get_nowait())
+                except queue.Empty: break
+            if _STOP in group: stopping = True; group = [command for command in group if command is not _STOP]
+            if group: self._execute(self._coalesce(group))
+        close_db_connection()
+
+    @staticmethod
+    def _coalesce(group):
+        """Сливает подряд идущие правки одной записи; другая команда между ними слияние прерывает."""
+        commands, pending_rows = [], {}
+        for command in group:
+            if not isinstance(command, _FieldUpdate): pending_rows.clear(); commands.append(command); continue
+            if (target := pending_rows.get(command.unique_id)) is not None:
+                target.fields.update(command.fields); target.futures.extend(command.futures)
+            else:
+                pending_rows[command.unique_id] = command; commands.append(command)
+        return commands
+
+    def _run_command(self, command):
+        # Каждая команда — в своей вложенной транзакции (SAVEPOINT): ошибка откатывает только ее записи
+        try:
+            with transaction() as conn: return command.run(conn)
+        except Exception as error:
+            logger.error(f"Ошибка записи в БД: {error}", exc_info=True); self.log_message.emit(f"Ошибка записи в БД: {error}", "error")
+            return error
+
+    def _execute(self, commands):
+        try:
+            with transaction(): results = [self._run_command(command) for command in commands]
+        except Exception as e:
+            # Не удалось начать или зафиксировать группу — повторяем команды по одной, каждую своей транзакцией
+            logger.warning(f"Групповая запись в БД не удалась ({e}), команды выполняются по одной.")
+            results = [self._run_command(command) for command in commands]
+        updated = []
+        for command, result in zip(commands, results):
+            for future in command.futures:
+                if isinstance(result, Exception): future.set_exception(result)
+                else: future.set_result(result)
+            if isinstance(command, _FieldUpdate):
+                ok = result is True
+                updated.extend((command.unique_id, field_name, value, ok) for field_name, value in command.fields.items())
+        if updated: self.fields_updated.emit(updated)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_db_writer():
+    """Общий для всего приложения пишущий поток (запускается при первом обращении)."""
+    global _writer
+    with _writer_lock:
+        if _writer is None: _writer = DbWriter()
+        return _writer.start()
+
+def shutdown_db_writer():
+    """Дописывает очередь и останавливает общий пишущий поток (при закрытии приложения)."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None: _writer.stop(); _writer = None
@@ -0,0 +1,98 @@
+# logic/derived_fields.py
+# Типизированные поля, вычисляемые из текстовых полей отчета один раз — при разборе (или при ручной
+# правке ячейки). Анализатор, статистика Excel и фильтры таблицы читают их вместо повторного разбора строк.
+import re
+import json
+from datetime import datetime
+
+from logic.helpers import parse_size_from_string
+
+SSD_KEYWORDS = ('ssd', 'nvme', 'snv')
+BIOS_DATE_FORMATS = ((re.compile(r'(\d{2}/\d{2}/\d{4})'), '%m/%d/%Y'), (re.compile(r'(\d{2}/\d{2}/\d{2})'), '%m/%d/%y'))
+
+LEADING_NUMBER_RE = re.compile(r'\d+')
+# ID атрибута SMART (шестнадцатеричный у SATA, десятичный у NVMe); строка заголовка таблицы ("ID") под него не подходит
+SMART_ATTR_ID_RE = re.compile(r'[0-9A-Fa-f]{1,3}')
+# SMART-атрибуты, по которым работают правила (logic.rules): у HDD — переназначенные и нестабильные сектора,
+# у SSD — запас резервных блоков
+HDD_REALLOCATED_ATTR, HDD_UNSTABLE_ATTRS, SSD_SPARE_ATTR = '05', ('C5', 'C6'), '3'
+# "Всего записано" у SSD: сырое значение с единицей ("12.5 TB"), в историю идет в ТБ
+SSD_WRITTEN_ATTR = '48'
+
+# Ключ -> тип колонки в БД
+DERIVED_FIELDS = {'ram_gb': 'REAL', 'bios_date': 'DATE', 'has_ssd': 'INTEGER', 'is_win7': 'INTEGER', 'free_slots': 'INTEGER'}
+# Текстовые поля, из которых вычисляются типизированные; правка любого из них требует пересчета
+DERIVED_SOURCE_KEYS = ('Объем ОЗУ', 'Дата BIOS', 'Дисковые накопители', 'ОС', 'Свободно слотов ОЗУ')
+# Сводка SMART по всем дискам ПК (не зависит от порогов) для пакетной переоценки; smart_readings —
+# JSON со значениями тех же атрибутов по каждому диску, [[is_ssd, ID, диск, значение], ...], для текста проблем
+SMART_FIELDS = {'smart_found': 'INTEGER', 'hdd_realloc_max': 'INTEGER', 'hdd_unstable_max': 'INTEGER', 'ssd_spare_min': 'INTEGER', 'smart_readings': 'TEXT'}
+TYPED_COLUMNS = {**DERIVED_FIELDS, **SMART_FIELDS}
+# Показания всех SMART-атрибутов отчета для истории (таблица smart_attributes, см. logic.database_handler):
+# [(диск, is_ssd, ID, значение, дата отчета), ...]. В колонки основной таблицы не попадает
+SMART_ATTRIBUTES_KEY = '_smart_attributes'
+
+def parse_bios_date(bios_date_str):
+    """Дата BIOS из строки отчета (ММ/ДД/ГГГГ или ММ/ДД/ГГ) или None."""
+    if not bios_date_str: return None
+    for pattern, date_format in BIOS_DATE_FORMATS:
+        if date_match := pattern.search(bios_date_str):
+            try: return datetime.strptime(date_match.group(0), date_format)
+            except ValueError: return None
+    return None
+
+def compute_derived_fields(data):
+    """Возвращает словарь типизированных полей по текстовым полям записи."""
+    bios_date = parse_bios_date(data.get('Дата BIOS'))
+    try: free_slots = int(data.get('Свободно слотов ОЗУ'))
+    except (TypeError, ValueError): free_slots = None
+    return {
+        'ram_gb': parse_size_from_string(data.get('Объем ОЗУ') or '0 MB', 'gb'),
+        'bios_date': bios_date.date().isoformat() if bios_date else None,
+        'has_ssd': int(any(k in (data.get('Дисковые накопители') or '').lower() for k in SSD_KEYWORDS)),
+        'is_win7': int('Windows 7' in (data.get('ОС') or '')),
+        'free_slots': free_slots,
+    }
+
+def bios_datetime(data):
+    """Дата BIOS записи как datetime (из колонки bios_date) или None."""
+    return datetime.fromisoformat(data['bios_date']) if data.get('bios_date') else None
+
+def smart_raw_number(raw_data_str):
+    """Число в начале сырого значения SMART-атрибута (0, если числа нет) — так его сравнивают правила."""
+    return int(match.group()) if (match := LEADING_NUMBER_RE.match(raw_data_str)) else 0
+
+def is_ssd_drive(drive_name):
+    return any(k in drive_name.lower() for k in SSD_KEYWORDS)
+
+def compute_smart_fields(drives):
+    """
+    Сводка SMART по списку дисков парсера (имя, [(ID, сырое значение), ...]); drives=None — раздела SMART
+    в отчете не было. Максимумы/минимумы достаточны для статуса: диск проблемный, если хоть одно значение
+    переходит порог, а значит, и крайнее из них.
+    """
+    if drives is None: return {'smart_found': 0, 'hdd_realloc_max': None, 'hdd_unstable_max': None, 'ssd_spare_min': None, 'smart_readings': None}
+    readings, realloc, unstable, spare = [], [], [], []
+    for drive_name, attributes in drives:
+        is_ssd = is_ssd_drive(drive_name)
+        for attr_id, raw_data_str in attributes:
+            if is_ssd and attr_id == SSD_SPARE_ATTR: target = spare
+            elif not is_ssd and attr_id == HDD_REALLOCATED_ATTR: target = realloc
+            elif not is_ssd and attr_id in HDD_UNSTABLE_ATTRS: target = unstable
+            else: continue
+            value = smart_raw_number(raw_data_str); target.append(value); readings.append([int(is_ssd), attr_id, drive_name, value])
+    return {'smart_found': 1, 'hdd_realloc_max': max(realloc, default=None), 'hdd_unstable_max': max(unstable, default=None),
+            'ssd_spare_min': min(spare, default=None), 'smart_readings': json.dumps(readings, ensure_ascii=False) if readings else None}
+
+def smart_attribute_value(is_ssd, attr_id, raw_data_str):
+    """Значение атрибута для истории: "Всего записано" у SSD — в ТБ, остальные — число в начале сырого значения, как у правил."""
+    if is_ssd and attr_id == SSD_WRITTEN_ATTR: return round(parse_size_from_string(raw_data_str, 'tb'), 3)
+    return smart_raw_number(raw_data_str)
+
+def smart_attribute_readings(drives, report_date):
+    """Показания всех атрибутов всех дисков (см. SMART_ATTRIBUTES_KEY); report_date — когда снят отчет (ISO)."""
+    readings = []
+    for drive_name, attributes in drives or ():
+        is_ssd = is_ssd_drive(drive_name)
+        readings.extend((drive_name.strip(), int(is_ssd), attr_id, smart_attribute_value(is_ssd, attr_id, raw_data_str), report_date)
+                        for attr_id, raw_data_str in attributes if SMART_ATTR_ID_RE.fullmatch(attr_id))
+    return readings
@@ -1,82 +1,216 @@
 # logic/excel_handler.py
+import os
+import heapq
 import logging
+import tempfile
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
-from openpyxl.cell import MergedCell
+from openpyxl.utils.cell import coordinate_to_tuple
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.worksheet.cell_range import CellRange
 from openpyxl.chart import PieChart, BarChart, Reference
 from openpyxl.chart.series import DataPoint
 from collections import Counter
 from datetime import datetime
-import re
 
 from utils.constants import HEADERS_MAIN, HEADERS_NETWORK, HEADERS_ANALYSIS
+from logic.derived_fields import bios_datetime
+from logic.rules import problem_label, ProblemCode
+from logic.analyzer import problems_text
 
 logger = logging.getLogger(__name__)
 
-def _calculate_statistics(data_list):
-    stats = {'total_pcs': len(data_list), 'cat1_critical': 0, 'cat2_upgrade': 0, 'cat3_ok': 0,
-             'problem_counts': Counter(), 'bios_dates': [], 'average_bios_age_years': 'N/A', 'top_5_critical': []}
-    if not data_list: return stats
+# Книга пишется в режиме write_only: строки уходят во временный файл сразу после append, поэтому
+# память не растет с размером парка. Платой за это служит порядок: ширины колонок и закрепление строк
+# задаются до первой строки листа, а ячейки пишутся строго сверху вниз.
+FINAL_HEADERS = [h for h in HEADERS_MAIN if h != '_RAW_DATA']; FINAL_HEADERS += [h for h in dict.fromkeys(HEADERS_NETWORK) if h not in FINAL_HEADERS]
+ANALYSIS_CATEGORIES = [(1, 'Полная замена'), (2, 'Частичный апгрейд')]
+MAX_COLUMN_WIDTH = 60
+
+HEADER_FONT = Font(bold=True, color="FFFFFF", name='Calibri', size=11); HEADER_FILL = PatternFill(start_color="4F81BD", fill_type="solid")
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='center', wrap_text=True); THIN_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+CATEGORY_FILLS = {1: PatternFill(start_color="FFC7CE", fill_type="solid"), 2: PatternFill(start_color="FFEB9C", fill_type="solid"), 3: PatternFill(start_color="C6EFCE", fill_type="solid")}
+DATA_FONT = Font(name='Calibri', size=11); SMART_BAD_FONT = Font(bold=True, color="9C0006"); DATA_ALIGNMENT = Alignment(vertical='top', wrap_text=True, horizontal='left')
+CATEGORY_FONTS = {1: Font(color="9C0006"), 2: Font(color="9C6500"), 3: DATA_FONT}
+# Рекомендации листа анализа для ПК на частичный апгрейд — по кодам проблем, а не по словам в тексте
+PROBLEM_RECOMMENDATIONS = {
+    ProblemCode.OUTDATED_OS: "Обновить ОС", ProblemCode.NO_SSD: "Установить SSD", ProblemCode.RAM_CRITICAL: "Добавить ОЗУ",
+    ProblemCode.RAM_LOW: "Добавить ОЗУ", ProblemCode.NO_VIDEO_DRIVER: "Установить видеодрайвер", ProblemCode.OLD_BIOS: "Обновить BIOS (опционально)",
+}
+
+def _register_styles(wb):
+    """
+    Регистрирует именованные стили книги один раз: заголовок и строка каждой категории (обычная и с
+    выделенным SMART). Ячейки ссылаются на стиль по имени вместо создания своих Font/Fill/Border.
+    """
+    wb.add_named_style(NamedStyle('header', font=HEADER_FONT, fill=HEADER_FILL, alignment=HEADER_ALIGNMENT, border=THIN_BORDER))
+    for category in (1, 2, 3, None):
+        fill = CATEGORY_FILLS.get(category, PatternFill()); font = CATEGORY_FONTS.get(category, DATA_FONT)
+        wb.add_named_style(NamedStyle(_row_style(category), font=font, fill=fill, alignment=DATA_ALIGNMENT, border=THIN_BORDER))
+        wb.add_named_style(NamedStyle(_row_style(category, smart_bad=True), font=SMART_BAD_FONT, fill=fill, alignment=DATA_ALIGNMENT, border=THIN_BORDER))
+
+def _row_style(category, smart_bad=False):
+    name = f'row_cat{category}' if category in CATEGORY_FILLS else 'row'
+    return f'{name}_smart_bad' if smart_bad else name
+
+def _styled(ws, value, style):
+    cell = WriteOnlyCell(ws, value); cell.style = style
+    return cell
+
+class _SheetBuffer:
+    """
+    Произвольный доступ к ячейкам небольшого листа (дашборд) поверх write_only-листа: ячейки копятся
+    в словаре и уходят в лист построчно в flush(). Ширины колонок, высоты строк, диаграммы — у самого листа.
+    """
+    def __init__(self, ws): self.ws = ws; self._cells = {}
+
+    def cell(self, row, column, value=None):
+        cell = self._cells.get((row, column))
+        if cell is None: cell = self._cells[(row, column)] = WriteOnlyCell(self.ws)
+        if value is not None: cell.value = value
+        return cell
+
+    def __getitem__(self, coordinate): return self.cell(*coordinate_to_tuple(coordinate))
+
+    def __setitem__(self, coordinate, value): self[coordinate].value = value
+
+    def merge_cells(self, range_string=None, start_row=None, start_column=None, end_row=None, end_column=None):
+        self.ws.merged_cells.add(CellRange(range_string, min_row=start_row, min_col=start_column, max_row=end_row, max_col=end_column))
+
+    def flush(self):
+        max_row = max(row for row, _ in self._cells); max_column = max(column for _, column in self._cells)
+        for row in range(1, max_row + 1):
+            cells = [self._cells.get((row, column)) for column in range(1, max_column + 1)]
+            for cell in cells:
+                # Пустые ячейки write_only-лист пропускает; рамки и заливка под объединениями нужны
+                if cell is not None and cell.value is None and cell.has_style: cell.value = ''
+            self.ws.append(cells)
+        self._cells.clear()
+
+def _main_values(data_row):
+    return [str(data_row.get(h, '')).replace('\n', '; ') for h in FINAL_HEADERS]
+
+def _analysis_values(data, cat_num):
+    rec_list = set()
+    if data.get('internal_smart_status') == "BAD": rec_list.add("ЗАМЕНА ДИСКА!")
+    elif cat_num == 1: rec_list.add("Полная замена")
+    else: rec_list.update(PROBLEM_RECOMMENDATIONS[code] for code in parse_problem_codes(data.get('problem_codes')) if code in PROBLEM_RECOMMENDATIONS)
+    return [(data.get(h) or '').replace('\n', '; ') for h in ['Имя файла', 'Название ПК']] + [problems_text(data).replace('\n', '; '), ", ".join(sorted(rec_list)) or "Частичный апгрейд"]
+
+def _update_maxima(maxima, values):
+    for index, value in enumerate(values):
+        if len(value) > maxima[index]: maxima[index] = len(value)
+
+def parse_problem_codes(codes_str):
+    """Колонка problem_codes ("1,3,6") -> список кодов; нечисловые части пропускаются."""
+    return [int(code) for code in (codes_str or '').split(',') if code.strip().isdigit()]
+
+def fleet_summary(fleet_stats, priority_pcs):
+    """
+    Показатели дашборда из готовой сводки по парку (database_handler.fetch_fleet_stats) и первых по
+    приоритету записей (fetch_priority_pcs) — без прохода по всем записям.
+    """
+    return {'total_pcs': fleet_stats.total, 'cat1_critical': fleet_stats.categories[1], 'cat2_upgrade': fleet_stats.categories[2], 'cat3_ok': fleet_stats.categories[3],
+            'problem_counts': Counter({problem_label(code): count for code, count in fleet_stats.problem_counts.items()}),
+            'average_bios_age_years': fleet_stats.average_bios_age_years, 'top_5_critical': list(priority_pcs)[:5]}
+
+def _calculate_statistics(data_list, summary=None):
+    """
+    Один проход по записям: текущие максимумы длины значений для ширин колонок листов "Все данные" и
+    "Рекомендации" (write_only-лист принимает ширины только до первой строки) и, если готовой сводки
+    summary (см. fleet_summary) нет, показатели дашборда по самим записям.
+    """
+    stats = {'total_pcs': 0, 'cat1_critical': 0, 'cat2_upgrade': 0, 'cat3_ok': 0,
+             'problem_counts': Counter(), 'average_bios_age_years': 'N/A', 'top_5_critical': []}
+    stats.update(summary or {})
+    stats['main_widths'] = [len(h) for h in FINAL_HEADERS]; stats['analysis_widths'] = [len(h) for h in HEADERS_ANALYSIS]
+    for cat_num, cat_name in ANALYSIS_CATEGORIES: _update_maxima(stats['analysis_widths'], [f'Категория {cat_num}: {cat_name}'])
+    bios_days, bios_count, now, row_count = 0, 0, datetime.now(), 0
+    top_5 = []  # (категория, порядковый номер, запись): порядок как у sorted(...)[:5]
     for data in data_list:
+        row_count += 1
+        _update_maxima(stats['main_widths'], _main_values(data))
+        if data.get('category') in dict(ANALYSIS_CATEGORIES): _update_maxima(stats['analysis_widths'], _analysis_values(data, data['category']))
+        if summary is not None: continue
         category = data.get('category', 3)
         if category == 1: stats['cat1_critical'] += 1
         elif category == 2: stats['cat2_upgrade'] += 1
         else: stats['cat3_ok'] += 1
-        if problems_str := data.get('problems', ''):
-            problem_list = [p.strip() for p in problems_str.split('\n') if "состояние хорошее" not in p.lower() and p.strip()]
-            stats['problem_counts'].update(problem_list)
-        if bios_date_str := data.get('Дата BIOS'):
-            if date_match := re.search(r'(\d{2}/\d{2}/\d{2,4})', bios_date_str):
-                try:
-                    p = re.split(r'[/.-]', date_match.group(1)); y = int(p[2]) if int(p[2]) > 1900 else int(p[2]) + 2000
-                    stats['bios_dates'].append(datetime(y, int(p[0]), int(p[1])))
-                except: pass
-    if stats['bios_dates']:
-        total_days = sum([(datetime.now() - d).days for d in stats['bios_dates']])
-        stats['average_bios_age_years'] = round(total_days / len(stats['bios_dates']) / 365.25, 1)
-    stats['top_5_critical'] = sorted(data_list, key=lambda x: x.get('category', 3))[:5]
+        stats['problem_counts'].update(problem_label(code) for code in parse_problem_codes(data.get('problem_codes')))
+        if bios_date := bios_datetime(data): bios_days += (now - bios_date).days; bios_count += 1
+        top_5 = heapq.nsmallest(5, top_5 + [(category, row_count, data)], key=lambda item: item[:2])
+    if summary is None:
+        stats['total_pcs'] = row_count; stats['top_5_critical'] = [data for _, _, data in top_5]
+        if bios_count: stats['average_bios_age_years'] = round(bios_days / bios_count / 365.25, 1)
     return stats
 
-def write_to_excel(data_list, filename, log_emitter):
-    if not data_list: log_emitter("Нет данных для экспорта в Excel.", "warning"); return
-    wb = Workbook()
-    log_emitter("Расчет статистики для дашборда...", "info"); stats = _calculate_statistics(data_list)
-    
-    header_font = Font(bold=True, color="FFFFFF", name='Calibri', size=11); header_fill = PatternFill(start_color="4F81BD", fill_type="solid")
-    header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True); thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+def _save_atomically(wb, filename):
+    """Сохраняет книгу во временный файл рядом с целевым и подменяет его одним rename: открывший файл
+    никогда не увидит наполовину записанную книгу, а при ошибке прежний файл остается целым."""
+    fd, temp_path = tempfile.mkstemp(prefix='~export-', suffix='.xlsx', dir=os.path.dirname(os.path.abspath(filename))); os.close(fd)
+    try:
+        wb.save(temp_path); os.replace(temp_path, filename)
+    finally:
+        if os.path.exists(temp_path): os.remove(temp_path)
+
+def _discard_unsaved(wb):
+    """Закрывает листы несохраненной книги и удаляет их временные файлы (экспорт прерван)."""
+    for ws in wb.worksheets:
+        if ws.closed: continue
+        ws.close(); ws._writer.cleanup()
+
+def write_to_excel(data_list, filename, log_emitter, should_continue=None, summary=None):
+    """
+    Строит книгу (дашборд, все данные, рекомендации) и сохраняет ее атомарно. data_list — любая повторно
+    итерируемая выборка (список или database_handler.StreamedRows): она проходится несколько раз, но
+    целиком в памяти не держится. summary — готовые показатели дашборда (fleet_summary); без них они
+    считаются по data_list. should_continue() проверяется по ходу построения: False — экспорт
+    устарел и прерывается, прежний файл не трогается. Возвращает True, если файл записан.
+    """
+    should_continue = should_continue or (lambda: True)
+    log_emitter("Расчет статистики для дашборда...", "info"); stats = _calculate_statistics(data_list, summary)
+    if not stats['total_pcs']: log_emitter("Нет данных для экспорта в Excel.", "warning"); return False
+    wb = Workbook(write_only=True); _register_styles(wb)
+    try:
+        if not _write_sheets(wb, data_list, stats, should_continue): log_emitter("Экспорт в Excel отменен: данные изменились.", "debug"); return False
+        try: _save_atomically(wb, filename); log_emitter(f"Файл Excel '{filename}' с дашбордом успешно сохранен.", "info"); return True
+        except IOError as e: log_emitter(f"Ошибка: Не удалось записать в файл {filename}. Возможно, он открыт. Ошибка: {e}", "error"); return False
+    finally: _discard_unsaved(wb)
+
+def _write_sheets(wb, data_list, stats, should_continue):
     kpi_title_font = Font(name='Calibri', size=11, bold=True, color="595959"); kpi_alignment = Alignment(horizontal='center', vertical='center')
     section_title_font = Font(name='Calibri', size=14, bold=True)
 
-    ws_dash = wb.active; ws_dash.title = "Дашборд"
+    dash_sheet = wb.create_sheet("Дашборд"); ws_dash = _SheetBuffer(dash_sheet)
     ws_dash['B2'] = "Ключевые показатели 'Здоровья' Компьютерного Парка"; ws_dash['B2'].font = Font(name='Calibri', size=18, bold=True)
-    ws_dash.merge_cells('B2:K2'); ws_dash.row_dimensions[2].height = 30
+    ws_dash.merge_cells('B2:K2'); dash_sheet.row_dimensions[2].height = 30
 
     kpi_data = [("B4", "Всего ПК на учете", stats['total_pcs'], "000000"), ("E4", "Требуют ЗАМЕНЫ", stats['cat1_critical'], "9C0006"),
                 ("H4", "Требуют АПГРЕЙДА", stats['cat2_upgrade'], "9C6500")]
     for cell_ref, title, value, color in kpi_data:
-        start_cell = ws_dash[cell_ref]; min_row, min_col = start_cell.row, start_cell.column
+        min_row, min_col = coordinate_to_tuple(cell_ref)
         title_cell = ws_dash.cell(row=min_row, column=min_col, value=title); ws_dash.merge_cells(start_row=min_row, start_column=min_col, end_row=min_row, end_column=min_col + 1)
         title_cell.font = kpi_title_font; title_cell.alignment = kpi_alignment
         value_cell = ws_dash.cell(row=min_row + 1, column=min_col, value=value); ws_dash.merge_cells(start_row=min_row + 1, start_column=min_col, end_row=min_row + 2, end_column=min_col + 1)
         value_cell.font = Font(name='Calibri', size=24, bold=True, color=color); value_cell.alignment = kpi_alignment
         for r in range(min_row, min_row + 3):
-            for c in range(min_col, min_col + 2): ws_dash.cell(row=r, column=c).border = thin_border
-    
+            for c in range(min_col, min_col + 2): ws_dash.cell(row=r, column=c).border = THIN_BORDER
+
     ws_dash['B8'] = 'Графический анализ'; ws_dash['B8'].font = section_title_font; ws_dash.merge_cells('B8:K8')
 
     pie = PieChart(); pie.title = "Состояние парка"; pie.height = 10; pie.width = 13
     chart_data_rows = [['Категория', 'Количество'], ['В порядке', stats['cat3_ok']], ['Нужен апгрейд', stats['cat2_upgrade']], ['Критическое состояние', stats['cat1_critical']]]
     for r_idx, row_data in enumerate(chart_data_rows, 1):
         for c_idx, cell_data in enumerate(row_data, 20): ws_dash.cell(row=r_idx, column=c_idx, value=cell_data)
-    labels = Reference(ws_dash, min_col=20, min_row=2, max_row=4); data = Reference(ws_dash, min_col=21, min_row=1, max_row=4)
+    labels = Reference(dash_sheet, min_col=20, min_row=2, max_row=4); data = Reference(dash_sheet, min_col=21, min_row=1, max_row=4)
     pie.add_data(data, titles_from_data=True); pie.set_categories(labels)
     series = pie.series[0]; pts = [DataPoint(idx=i) for i in range(len(chart_data_rows) - 1)]
     slice_colors = ["C6EFCE", "FFEB9C", "FFC7CE"]
     for i, pt in enumerate(pts): pt.graphicalProperties.solidFill = slice_colors[i]
     series.dps = pts
-    ws_dash.add_chart(pie, "B10")
-    
+    dash_sheet.add_chart(pie, "B10")
+
     bar_chart = BarChart(); bar_chart.type = "col"; bar_chart.style = 10; bar_chart.title = "Основные точки отказа"; bar_chart.height = 10; bar_chart.width = 17
     bar_chart.y_axis.title = 'Количество ПК'
     problem_data = stats['problem_counts'].most_common(5)
@@ -84,64 +218,49 @@ def write_to_excel(data_list, filename, log_emitter):
         problem_chart_rows = [['Проблема', 'Кол-во']] + problem_data
         for r_idx, row_data in enumerate(problem_chart_rows, 1):
             for c_idx, cell_data in enumerate(row_data, 23): ws_dash.cell(row=r_idx, column=c_idx, value=cell_data)
-        data = Reference(ws_dash, min_col=24, min_row=1, max_row=len(problem_chart_rows)); cats = Reference(ws_dash, min_col=23, min_row=2, max_row=len(problem_chart_rows))
+        data = Reference(dash_sheet, min_col=24, min_row=1, max_row=len(problem_chart_rows)); cats = Reference(dash_sheet, min_col=23, min_row=2, max_row=len(problem_chart_rows))
         bar_chart.add_data(data, titles_from_data=True); bar_chart.set_categories(cats)
-        ws_dash.add_chart(bar_chart, "H10")
+        dash_sheet.add_chart(bar_chart, "H10")
 
     ws_dash['B30'] = 'Приоритетные компьютеры'; ws_dash['B30'].font = section_title_font; ws_dash.merge_cells('B30:K30')
-    ws_dash['B31'] = 'Имя ПК'; ws_dash['B31'].font = header_font; ws_dash['B31'].fill = header_fill
-    ws_dash.merge_cells('C31:K31'); ws_dash['C31'] = 'Основные проблемы'; ws_dash['C31'].font = header_font; ws_dash['C31'].fill = header_fill
-    cat1_fill = PatternFill(start_color="FFC7CE", fill_type="solid"); cat2_fill = PatternFill(start_color="FFEB9C", fill_type="solid"); cat3_fill = PatternFill(start_color="C6EFCE", fill_type="solid")
+    ws_dash['B31'] = 'Имя ПК'; ws_dash['B31'].font = HEADER_FONT; ws_dash['B31'].fill = HEADER_FILL
+    ws_dash.merge_cells('C31:K31'); ws_dash['C31'] = 'Основные проблемы'; ws_dash['C31'].font = HEADER_FONT; ws_dash['C31'].fill = HEADER_FILL
     for i, pc_data in enumerate(stats['top_5_critical'], 32):
         ws_dash.cell(row=i, column=2, value=pc_data.get('Название ПК', 'N/A'))
         ws_dash.merge_cells(start_row=i, start_column=3, end_row=i, end_column=11)
-        ws_dash.cell(row=i, column=3, value=pc_data.get('problems', 'Нет данных').replace('\n', '; '))
-        cat_fill = {1: cat1_fill, 2: cat2_fill, 3: cat3_fill}.get(pc_data.get('category', 3))
+        ws_dash.cell(row=i, column=3, value=(problems_text(pc_data) or 'Нет данных').replace('\n', '; '))
+        cat_fill = CATEGORY_FILLS.get(pc_data.get('category', 3))
         for cell_col in range(2, 12):
             cell = ws_dash.cell(row=i, column=cell_col)
             if cat_fill: cell.fill = cat_fill
-            cell.border = thin_border
-    
+            cell.border = THIN_BORDER
+
     for col_letter, width in [('A', 2), ('B', 22), ('C', 15), ('D', 15), ('E', 15), ('F', 15), ('G', 15), ('H', 15), ('I', 15), ('J', 15), ('K', 15)]:
-        ws_dash.column_dimensions[col_letter].width = width
-
-    ws_main = wb.create_sheet("Все данные"); data_font = Font(name='Calibri', size=11); smart_bad_font = Font(bold=True, color="9C0006"); data_alignment = Alignment(vertical='top', wrap_text=True, horizontal='left')
-    final_headers = [h for h in HEADERS_MAIN if h != '_RAW_DATA']; [final_headers.append(h) for h in HEADERS_NETWORK if h not in final_headers]
-    ws_main.append(final_headers)
-    for cell in ws_main[1]: cell.font = header_font; cell.fill = header_fill; cell.alignment = header_alignment; cell.border = thin_border
-    for data_row in data_list:
-        ws_main.append([str(data_row.get(h, '')).replace('\n', '; ') for h in final_headers]); row_idx = ws_main.max_row
-        category = data_row.get('category', 3); row_fill, row_font = {1: (cat1_fill, Font(color="9C0006")), 2: (cat2_fill, Font(color="9C6500")), 3: (cat3_fill, data_font)}.get(category, (None, data_font))
-        for cell in ws_main[row_idx]: cell.font = row_font; cell.alignment = data_alignment; cell.border = thin_border
-        if row_fill:
-            for cell in ws_main[row_idx]: cell.fill = row_fill
-        try:
-            if data_row.get('internal_smart_status') == 'BAD': ws_main.cell(row=row_idx, column=final_headers.index('SMART Статус') + 1).font = smart_bad_font
-        except (ValueError, IndexError): pass
-    for i, header_text in enumerate(final_headers, 1):
-        column_letter = get_column_letter(i); max_length = max([len(str(c.value)) for c in ws_main[column_letter] if c.value] or [0])
-        ws_main.column_dimensions[column_letter].width = min(max(max_length, len(header_text)) + 2, 60)
-    ws_main.freeze_panes = 'A2'; ws_analysis = wb.create_sheet("Рекомендации"); cat_font = Font(bold=True, name='Calibri', size=12)
-    for cat_num, cat_name, cat_fill in [(1, 'Полная замена', cat1_fill), (2, 'Частичный апгрейд', cat2_fill)]:
-        ws_analysis.append([f'Категория {cat_num}: {cat_name}']); merged_cell_header = ws_analysis.cell(row=ws_analysis.max_row, column=1)
-        merged_cell_header.font = cat_font; merged_cell_header.fill = cat_fill; ws_analysis.merge_cells(f'A{ws_analysis.max_row}:{get_column_letter(len(HEADERS_ANALYSIS))}{ws_analysis.max_row}')
-        ws_analysis.append(HEADERS_ANALYSIS)
-        for cell in ws_analysis[ws_analysis.max_row]: cell.font = header_font; cell.fill = header_fill; cell.alignment = header_alignment; cell.border = thin_border
-        for data in data_list:
-            if data.get('category') == cat_num:
-                rec_list = set()
-                if data.get('internal_smart_status') == "BAD": rec_list.add("ЗАМЕНА ДИСКА!")
-                elif cat_num == 1: rec_list.add("Полная замена")
-                else:
-                    for p in str(data.get('problems', '')).lower().split('\n'):
-                        if 'ос' in p or 'windows 7' in p: rec_list.add("Обновить ОС")
-                        elif 'ssd' in p: rec_list.add("Установить SSD")
-                        elif 'озу' in p: rec_list.add("Добавить ОЗУ")
-                        elif 'видеодрайвер' in p: rec_list.add("Установить видеодрайвер")
-                        elif 'bios' in p: rec_list.add("Обновить BIOS (опционально)")
-                ws_analysis.append([data.get(h, '').replace('\n', '; ') for h in ['Имя файла', 'Название ПК', 'problems']] + [", ".join(sorted(list(rec_list))) or "Частичный апгрейд"])
-        ws_analysis.append([])
-    for col_idx in range(1, ws_analysis.max_column + 1):
-        col_letter = get_column_letter(col_idx); ws_analysis.column_dimensions[col_letter].width = max((len(str(c.value)) for c in ws_analysis[col_letter] if c.value and not isinstance(c, MergedCell)), default=20) + 2
-    try: wb.save(filename); log_emitter(f"Файл Excel '{filename}' с дашбордом успешно сохранен.", "info")
-    except IOError as e: log_emitter(f"Ошибка: Не удалось записать в файл {filename}. Возможно, он открыт. Ошибка: {e}", "error")
\ No newline at end of file
+        dash_sheet.column_dimensions[col_letter].width = width
+    ws_dash.flush()
+
+    if not should_continue(): return False
+    ws_main = wb.create_sheet("Все данные")
+    for i, max_length in enumerate(stats['main_widths'], 1): ws_main.column_dimensions[get_column_letter(i)].width = min(max_length + 2, MAX_COLUMN_WIDTH)
+    ws_main.freeze_panes = 'A2'
+    ws_main.append([_styled(ws_main, h, 'header') for h in FINAL_HEADERS])
+    smart_index = FINAL_HEADERS.index('SMART Статус') if 'SMART Статус' in FINAL_HEADERS else None
+    for row_number, data_row in enumerate(data_list, 1):
+        if row_number % 500 == 0 and not should_continue(): return False
+        category = data_row.get('category', 3); row_style = _row_style(category)
+        smart_style = _row_style(category, smart_bad=True) if data_row.get('internal_smart_status') == 'BAD' else row_style
+        ws_main.append([_styled(ws_main, value, smart_style if index == smart_index else row_style) for index, value in enumerate(_main_values(data_row))])
+
+    ws_analysis = wb.create_sheet("Рекомендации"); cat_font = Font(bold=True, name='Calibri', size=12)
+    for i, max_length in enumerate(stats['analysis_widths'], 1): ws_analysis.column_dimensions[get_column_letter(i)].width = max_length + 2
+    analysis_row = 0
+    for cat_num, cat_name in ANALYSIS_CATEGORIES:
+        title_cell = WriteOnlyCell(ws_analysis, f'Категория {cat_num}: {cat_name}'); title_cell.font = cat_font; title_cell.fill = CATEGORY_FILLS[cat_num]
+        ws_analysis.append([title_cell]); analysis_row += 1
+        ws_analysis.merged_cells.add(f'A{analysis_row}:{get_column_letter(len(HEADERS_ANALYSIS))}{analysis_row}')
+        ws_analysis.append([_styled(ws_analysis, h, 'header') for h in HEADERS_ANALYSIS]); analysis_row += 1
+        for row_number, data in enumerate(data_list, 1):
+            if row_number % 500 == 0 and not should_continue(): return False
+            if data.get('category') == cat_num: ws_analysis.append(_analysis_values(data, cat_num)); analysis_row += 1
+        ws_analysis.append([]); analysis_row += 1
+    return should_continue()
@@ -0,0 +1,59 @@
+# logic/export_scheduler.py
+# Отложенный экспорт (Excel и другие форматы из [Settings] export_formats). Правки ячеек, обновление IP, анализ
+# и переоценка только помечают экспорт устаревшим; файлы пересобираются один раз, когда изменения затихнут
+# на quiet_ms миллисекунд.
+from threading import Event
+
+from PySide6.QtCore import QObject, QThread, QTimer, Signal
+
+from logic.workers import ExportWorker
+
+# Пауза без изменений перед экспортом ([Settings] export_quiet_ms)
+DEFAULT_EXPORT_QUIET_MS = 1500
+
+def get_export_quiet_ms(config):
+    return max(0, config.getint('Settings', 'export_quiet_ms', fallback=DEFAULT_EXPORT_QUIET_MS))
+
+class ExportScheduler(QObject):
+    """
+    Копит пометки "книга устарела" и запускает один экспорт после паузы. Экспорт, который идет, когда
+    приходят новые изменения, уже устарел: он прерывается (файл не трогается), а новый начнется после
+    следующей паузы. Сигнал exported — путь к записанному файлу.
+    """
+    log_message = Signal(str, str); exported = Signal(str)
+
+    def __init__(self, config, quiet_ms=None, parent=None):
+        super().__init__(parent); self.config = config
+        self._timer = QTimer(self); self._timer.setSingleShot(True); self._timer.timeout.connect(self._start_export)
+        self._timer.setInterval(get_export_quiet_ms(config) if quiet_ms is None else quiet_ms)
+        self._thread = None; self._worker = None; self._cancel = None; self.dirty = False
+
+    @property
+    def is_exporting(self): return self._thread is not None
+
+    def mark_dirty(self):
+        """Данные изменились: откладывает экспорт до паузы и прерывает уже идущий (он собран по старым данным)."""
+        self.dirty = True; self._timer.start()
+        if self._cancel is not None: self._cancel.set()
+
+    def _start_export(self):
+        # Прерванный экспорт еще сворачивается — новый запустится по его завершении
+        if self._thread is not None: return
+        self.dirty = False; self._cancel = Event()
+        self._thread = QThread(); self._worker = ExportWorker(self.config, self._cancel); self._worker.moveToThread(self._thread)
+        self._thread.started.connect(self._worker.run); self._worker.log_message.connect(self.log_message)
+        self._worker.finished.connect(self._export_finished); self._worker.finished.connect(self._thread.quit)
+        self._thread.finished.connect(self._worker.deleteLater); self._thread.finished.connect(self._thread.deleteLater); self._thread.start()
+
+    def _export_finished(self, output_filepath):
+        if self._thread is None: return  # экспорт дождались в shutdown()
+        self._thread.quit(); self._thread.wait(); self._thread = None; self._worker = None; self._cancel = None
+        if output_filepath: self.exported.emit(output_filepath)
+        if self.dirty and not self._timer.isActive(): self._start_export()
+
+    def shutdown(self):
+        """При закрытии: дожидается идущего экспорта и, если остались неэкспортированные изменения, выгружает их сразу."""
+        self._timer.stop()
+        if self._thread is not None: self._thread.quit(); self._thread.wait(); self._thread = None
+        if self.dirty:
+            self.dirty = False; worker = ExportWorker(self.config); worker.log_message.connect(self.log_message); worker.run()
@@ -0,0 +1,96 @@
+# logic/exporters.py
+# Экспорт данных парка из БД в файлы. Каждый формат — функция экспортера с общей сигнатурой
+# (filename, log_emitter, should_continue) -> bool: пишет файл прямо с курсора БД, не собирая список записей,
+# проверяет should_continue() по ходу (False — экспорт устарел, прежний файл не трогается) и подменяет
+# файл атомарно. Форматы для каждого запуска задает [Settings] export_formats, например "csv, jsonl, xlsx".
+import os
+import csv
+import json
+import logging
+import tempfile
+from contextlib import contextmanager
+
+from logic.database_handler import StreamedRows, table_keys, iter_table, backup_database, fetch_fleet_stats, fetch_priority_pcs
+from logic.excel_handler import write_to_excel, fleet_summary
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXPORT_FORMATS = ('xlsx',)
+# Как часто (в записях) потоковые экспортеры проверяют, не устарел ли экспорт
+CANCEL_CHECK_ROWS = 500
+# Разделитель CSV: русская локаль Excel разбивает по ";" — с запятой весь файл попал бы в одну колонку
+CSV_DELIMITER = ';'
+
+@contextmanager
+def _atomic_output(filename):
+    """Путь временного файла рядом с filename; после успешного выхода он подменяет filename одним rename, иначе удаляется."""
+    root, extension = os.path.splitext(os.path.abspath(filename))
+    fd, temp_path = tempfile.mkstemp(prefix='~export-', suffix=extension, dir=os.path.dirname(root)); os.close(fd)
+    try:
+        yield temp_path
+        os.replace(temp_path, filename)
+    finally:
+        if os.path.exists(temp_path): os.remove(temp_path)
+
+class _Cancelled(Exception):
+    """Экспорт устарел: выход из _atomic_output без подмены файла."""
+
+def _checked(rows, should_continue):
+    for row_number, row in enumerate(rows, 1):
+        if row_number % CANCEL_CHECK_ROWS == 0 and not should_continue(): raise _Cancelled
+        yield row
+
+def _run_export(filename, label, log_emitter, should_continue, write):
+    """Общая обвязка: write(temp_path) во временный файл, атомарная подмена, сообщения в лог. True — файл записан."""
+    try:
+        with _atomic_output(filename) as temp_path:
+            write(temp_path)
+            if not should_continue(): raise _Cancelled
+    except _Cancelled:
+        log_emitter(f"Экспорт {label} отменен: данные изменились.", "debug"); return False
+    except OSError as e:
+        log_emitter(f"Ошибка: Не удалось записать в файл {filename}. Возможно, он открыт. Ошибка: {e}", "error"); return False
+    log_emitter(f"Файл {label} '{filename}' успешно сохранен.", "info"); return True
+
+def export_xlsx(filename, log_emitter, should_continue):
+    """Книга Excel с дашбордом (см. excel_handler.write_to_excel) — самый медленный формат. Показатели дашборда берутся из сводки в БД."""
+    fleet_stats = fetch_fleet_stats()
+    summary = fleet_summary(fleet_stats, fetch_priority_pcs()) if fleet_stats is not None else None
+    return write_to_excel(StreamedRows(), filename, log_emitter, should_continue, summary)
+
+def export_csv(filename, log_emitter, should_continue):
+    """Все записи одной таблицей: UTF-8 с BOM (Excel иначе читает кириллицу как cp1251), разделитель ";"."""
+    def write(temp_path):
+        with open(temp_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f, delimiter=CSV_DELIMITER); writer.writerow(table_keys())
+            writer.writerows(_checked(iter_table(), should_continue))
+    return _run_export(filename, 'CSV', log_emitter, should_continue, write)
+
+def export_jsonl(filename, log_emitter, should_continue):
+    """JSON Lines: по объекту на запись с оригинальными ключами, категория — числом."""
+    def write(temp_path):
+        with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+            for row in _checked(StreamedRows(), should_continue): f.write(json.dumps(row, ensure_ascii=False)); f.write('\n')
+    return _run_export(filename, 'JSON Lines', log_emitter, should_continue, write)
+
+def export_sqlite(filename, log_emitter, should_continue):
+    """Согласованный снимок всей БД одним файлом (backup API) — открывать только на чтение, приложение его не меняет."""
+    return _run_export(filename, 'SQLite', log_emitter, should_continue, backup_database)
+
+EXPORTERS = {'xlsx': export_xlsx, 'csv': export_csv, 'jsonl': export_jsonl, 'sqlite': export_sqlite}
+
+def get_export_formats(config):
+    """Форматы экспорта из [Settings] export_formats в порядке перечисления; неизвестные пропускаются с предупреждением."""
+    formats = []
+    for name in config.get('Settings', 'export_formats', fallback=','.join(DEFAULT_EXPORT_FORMATS)).split(','):
+        name = name.strip().lower().lstrip('.')
+        if not name or name in formats: continue
+        if name in EXPORTERS: formats.append(name)
+        else: logger.warning(f"Неизвестный формат экспорта '{name}' в [Settings] export_formats, пропущен. Доступны: {', '.join(EXPORTERS)}.")
+    return formats or list(DEFAULT_EXPORT_FORMATS)
+
+def get_export_path(config, export_format):
+    """Файл формата: output_filename для xlsx, для остальных — то же имя с расширением формата."""
+    output_file = config.get('Settings', 'output_filename', fallback='system_analysis.xlsx')
+    if export_format == 'xlsx': return output_file
+    return f'{os.path.splitext(output_file)[0]}.{export_format}'
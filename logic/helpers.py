@@ -1,5 +1,6 @@
 # logic/helpers.py
 import re
+import hashlib
 
 def parse_size_from_string(text, target_unit='gb'):
     """Извлекает число и единицу измерения (ТБ, ГБ, МБ) из строки и конвертирует в нужную единицу."""
@@ -14,4 +15,15 @@ def parse_size_from_string(text, target_unit='gb'):
     elif 'м' in unit or 'm' in unit: val_gb = val / 1024
     
     if target_unit == 'tb': return val_gb / 1024.0
-    return val_gb
\ No newline at end of file
+    return val_gb
+
+def content_hash(buffer):
+    """Хеш содержимого отчета (BLAKE2b, 128 бит) для bytes/mmap, уже находящихся в памяти."""
+    return hashlib.blake2b(buffer, digest_size=16).hexdigest()
+
+def file_content_hash(file_path, chunk_size=1024 * 1024):
+    """Считает тот же хеш, что content_hash, не загружая файл в память целиком."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(chunk_size): digest.update(chunk)
+    return digest.hexdigest()
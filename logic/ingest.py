@@ -0,0 +1,101 @@
+# logic/ingest.py
+import os
+import configparser
+from stat import S_ISREG
+from collections import namedtuple
+from datetime import datetime
+
+from logic.parser import parse_aida_report
+from logic.analyzer import analysis_fields
+from logic.snapshot import encode_snapshot, RAW_DATA_KEY, SMART_DRIVES_KEY
+from logic.helpers import file_content_hash
+from logic.derived_fields import compute_derived_fields, compute_smart_fields, smart_attribute_readings, SMART_ATTRIBUTES_KEY
+from logic.database_handler import DEFAULT_DB_BATCH_SIZE
+
+def get_parse_workers(config):
+    """
+    Возвращает число процессов для параллельного парсинга (0 в конфиге = по числу ядер, но не меньше двух).
+    1 — только если так указано в конфиге явно: последовательный разбор в потоке анализа, без дочерних
+    процессов и без лимита времени на отчет.
+    """
+    workers = config.getint('Settings', 'parse_workers', fallback=0)
+    # На одноядерной машине "по числу ядер" не должно молча выключать лимит времени и немедленный "Стоп"
+    if workers <= 0: workers = max(2, os.cpu_count() or 1)
+    return workers
+
+def get_db_batch_size(config):
+    """Возвращает, по сколько разобранных отчетов писать в БД одной транзакцией."""
+    return max(1, config.getint('Settings', 'db_batch_size', fallback=DEFAULT_DB_BATCH_SIZE))
+
+def config_to_dict(config):
+    """Превращает ConfigParser в обычный словарь, который можно передать в дочерний процесс."""
+    return {section: dict(config.items(section, raw=True)) for section in config.sections()}
+
+def get_parse_budget(config):
+    """Возвращает лимиты на один отчет: (секунд на разбор, максимальный размер в байтах; 0 — без лимита)."""
+    timeout = config.getfloat('Settings', 'parse_timeout_seconds', fallback=60.0)
+    max_size_mb = config.getfloat('Settings', 'max_report_size_mb', fallback=50.0)
+    return timeout, int(max_size_mb * 1024 * 1024)
+
+ScanPlan = namedtuple('ScanPlan', 'to_parse refreshed skipped held oversized')
+
+def plan_incremental_scan(file_paths, manifest, force_full_rescan=False, quarantine=None, max_size_bytes=0):
+    """
+    Делит отчеты на новые/измененные и неизменившиеся по манифесту {имя файла: (размер, mtime_ns, хеш)}.
+    Отчеты из карантина {имя файла: (размер, mtime_ns, хеш)} пропускаются, пока не изменятся; отчеты
+    больше max_size_bytes не разбираются вовсе. Возвращает ScanPlan: к разбору {путь: запись манифеста},
+    записи для обновления без разбора, число пропущенных, число оставленных в карантине и записи
+    (имя, размер, mtime_ns, None) слишком больших отчетов.
+    """
+    to_parse, refreshed, skipped, held, oversized = {}, [], 0, 0, []
+    if force_full_rescan or quarantine is None: quarantine = {}
+    for file_path in file_paths:
+        filename = os.path.basename(file_path); stat = os.stat(file_path); known = manifest.get(filename)
+        if not S_ISREG(stat.st_mode): continue  # каталог или канал с "отчетным" именем — читать нечего
+        quarantined = quarantine.get(filename)
+        if quarantined and quarantined[:2] == (stat.st_size, stat.st_mtime_ns): held += 1; continue
+        # Огромный файл не хешируем: размер известен и так, а чтение целиком — ровно то, чего избегаем
+        if max_size_bytes and stat.st_size > max_size_bytes: oversized.append((filename, stat.st_size, stat.st_mtime_ns, None)); continue
+
+        same_size = not force_full_rescan and known is not None and known[0] == stat.st_size
+        if same_size and known[1] == stat.st_mtime_ns: skipped += 1; continue
+
+        entry = (filename, stat.st_size, stat.st_mtime_ns, file_content_hash(file_path))
+        if quarantined and quarantined[2] == entry[3]: held += 1; continue
+        if same_size and known[2] == entry[3]:
+            # Файл "потрогали" (скопировали, распаковали), но содержимое то же — обновляем только mtime
+            refreshed.append(entry); skipped += 1; continue
+        to_parse[file_path] = entry
+    return ScanPlan(to_parse, refreshed, skipped, held, oversized)
+
+def analyze_report(file_path, config, log_emitter):
+    """Парсит один отчет и дополняет его результатами анализа. Возвращает словарь или None."""
+    # Шаг 1: Получаем только "сырые" данные из парсера
+    raw_data = parse_aida_report(file_path, config, log_emitter)
+    if not raw_data: return None
+    # Снимок сырых данных (до анализа) сохраняется в БД для переоценки без повторного парсинга
+    raw_data[RAW_DATA_KEY] = encode_snapshot(raw_data)
+    # Типизированные поля (объем ОЗУ в ГБ, дата BIOS, признаки SSD/Windows 7, сводка SMART) считаются один раз здесь
+    smart_drives = raw_data.pop(SMART_DRIVES_KEY, None)
+    raw_data.update(compute_derived_fields(raw_data)); raw_data.update(compute_smart_fields(smart_drives))
+    # Показания всех SMART-атрибутов уходят в историю (smart_attributes) с датой отчета — временем изменения файла
+    raw_data[SMART_ATTRIBUTES_KEY] = smart_attribute_readings(smart_drives, datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat(timespec='seconds'))
+
+    # Шаг 2: Передаем сырые данные в анализатор и дополняем словарь результатами
+    raw_data.update(analysis_fields(raw_data, config))
+    return raw_data
+
+def config_from_dict(config_sections):
+    """Обратное к config_to_dict: собирает ConfigParser в дочернем процессе."""
+    config = configparser.ConfigParser()
+    config.read_dict(config_sections)
+    return config
+
+def process_report(file_path, config):
+    """
+    Точка входа для пула процессов. Сигналы Qt из дочернего процесса недоступны,
+    поэтому сообщения лога копятся в списке и возвращаются вместе с результатом.
+    """
+    logs = []
+    data = analyze_report(file_path, config, lambda message, level: logs.append((message, level)))
+    return data, logs
@@ -0,0 +1,185 @@
+# logic/lxml_parser.py
+# Второй бэкенд парсинга: работает напрямую с деревом lxml через заранее скомпилированные XPath,
+# без построения дерева BeautifulSoup. Возвращает ровно тот же словарь, что и parse_aida_report.
+import os
+import re
+import logging
+import functools
+from lxml import etree
+from lxml import html as lxml_html
+
+from logic.parser import (LabelIndex, apply_smart_classification, fill_ram_fields, format_ram_module,
+                          is_ignored_drive, RAM_HEADER_RE)
+from logic.report_normalizer import load_report_html
+
+logger = logging.getLogger(__name__)
+
+_HAS_DT_CLASS = "contains(concat(' ', normalize-space(@class), ' '), ' dt ')"
+
+XP_ANCHOR = etree.XPath("(//a[@name = $name])[1]")
+XP_NEXT_TABLE = etree.XPath("(descendant::table | following::table)[1]")
+XP_TEXT = etree.XPath(".//text()", smart_strings=False)
+XP_TDS = etree.XPath(".//td")
+XP_LEAF_TDS = etree.XPath(".//td[not(.//td)]")
+XP_NEXT_SIBLING_TD = etree.XPath("following-sibling::td[1]")
+XP_NEXT_TD = etree.XPath("following::td[1]")
+XP_FIRST_LINK = etree.XPath("(.//a)[1]")
+XP_ROWS = etree.XPath(".//tr")
+XP_DT_CELLS = etree.XPath(f"//td[{_HAS_DT_CLASS}]")
+XP_ROW_FIRST_DT = etree.XPath(f"(.//td[{_HAS_DT_CLASS}])[1]")
+XP_PARENT_TR = etree.XPath("ancestor::tr[1]")
+
+DISK_LABEL_RE = re.compile('Дисковый накопитель')
+DIMM_LABEL_RE = re.compile(r'^\s*DIMM\d:')
+
+def get_text(element):
+    """Аналог Tag.get_text(strip=True) из BeautifulSoup."""
+    return ''.join(text.strip() for text in XP_TEXT(element))
+
+def tag_string(element):
+    """Аналог Tag.string из BeautifulSoup: текст единственного дочернего узла (с рекурсией), иначе None."""
+    if element.text is not None: return element.text if len(element) == 0 else None
+    if len(element) != 1 or element[0].tail is not None: return None
+    child = element[0]
+    return tag_string(child) if isinstance(child.tag, str) else child.text
+
+def find_tds_by_string(area, pattern):
+    """Аналог find_all('td', string=pattern) из BeautifulSoup."""
+    return [td for td in XP_TDS(area) if (string := tag_string(td)) is not None and pattern.search(string)]
+
+def find_section_table(root, anchor_name):
+    """Первая таблица после якоря <a name="...">, как soup.find('a', ...).find_next('table')."""
+    anchors = XP_ANCHOR(root, name=anchor_name)
+    if not anchors: return None, None
+    tables = XP_NEXT_TABLE(anchors[0])
+    return anchors[0], tables[0] if tables else None
+
+def _value_text(value_td):
+    links = XP_FIRST_LINK(value_td)
+    return get_text(links[0]) if links else get_text(value_td)
+
+def build_label_index(search_area):
+    """Строит LabelIndex по таблице lxml за один обход (см. logic.parser.LabelIndex)."""
+    cells = XP_LEAF_TDS(search_area)
+
+    def resolve_value(position):
+        label_td = cells[position]
+        value_tds = XP_NEXT_SIBLING_TD(label_td) or XP_NEXT_TD(label_td)
+        return _value_text(value_tds[0]) if value_tds else None
+
+    return LabelIndex([get_text(td) for td in cells], resolve_value)
+
+def find_value_by_label(search_area, label_text):
+    """Ищет значение по метке; search_area — элемент lxml или уже построенный LabelIndex."""
+    if search_area is None: return None
+    try:
+        index = search_area if isinstance(search_area, LabelIndex) else build_label_index(search_area)
+        return index.find(label_text)
+    except Exception as e:
+        logger.error(f"Ошибка в find_value_by_label для '{label_text}': {e}", exc_info=True)
+        return None
+
+def build_rows_label_index(rows):
+    """Строит LabelIndex по набору строк <tr> (детальная секция одного модуля ОЗУ), см. logic.parser.build_rows_label_index."""
+    cells = [td for row in rows for td in XP_LEAF_TDS(row)]
+
+    def resolve_value(position):
+        value_tds = XP_NEXT_SIBLING_TD(cells[position])
+        if value_tds: return _value_text(value_tds[0])
+        return _value_text(cells[position + 1]) if position + 1 < len(cells) else None
+
+    return LabelIndex([get_text(td) for td in cells], resolve_value)
+
+def _extract_smart_drives(smart_table):
+    drives, current_drive = [], None
+    for row in XP_ROWS(smart_table):
+        header_cells = XP_ROW_FIRST_DT(row)
+        if header_cells:
+            drive_name = get_text(header_cells[0]).strip('[]')
+            current_drive = None if is_ignored_drive(drive_name) else (drive_name, [])
+            if current_drive: drives.append(current_drive)
+            continue
+
+        if not current_drive: continue
+
+        cells_with_text = [text for text in (get_text(c) for c in XP_TDS(row)) if text]
+        if len(cells_with_text) < 4: continue
+        current_drive[1].append((cells_with_text[0].strip(), cells_with_text[-2].strip()))
+    return drives
+
+def _row_has_header_cell(row):
+    return any('dt' in (td.get('class') or '').split() for td in row.iter('td'))
+
+def _find_ram_headers(root):
+    return [td for td in XP_DT_CELLS(root) if (string := tag_string(td)) is not None and RAM_HEADER_RE.search(string)]
+
+def parse_aida_report_lxml(file_path, config, log_emitter):
+    log_emitter(f"Парсинг: {os.path.basename(file_path)}", "info")
+    try:
+        html_content = load_report_html(file_path, config)
+
+        root = lxml_html.document_fromstring(html_content)
+        data = {'Имя файла': os.path.basename(file_path)}
+
+        _, summary_table = find_section_table(root, 'summary')
+        if summary_table is None:
+            logger.error(f"[{data['Имя файла']}] Не найдена основная сводная таблица.")
+            return None
+
+        summary_index = build_label_index(summary_table)
+        data['Название ПК'] = find_value_by_label(summary_index, 'Имя компьютера') or ''
+        data['ОС'] = find_value_by_label(summary_index, 'Операционная система') or ''
+        data['Процессор'] = find_value_by_label(summary_index, 'Тип ЦП') or ''
+        data['Материнская плата'] = find_value_by_label(summary_index, 'Системная плата') or ''
+        data['Видеоадаптер'] = find_value_by_label(summary_index, 'Видеоадаптер') or ''
+        data['Монитор'] = find_value_by_label(summary_index, 'Монитор') or ''
+        data['Объем ОЗУ'] = find_value_by_label(summary_index, 'Системная память') or ''
+        data['Локальный IP'] = find_value_by_label(summary_index, 'Первичный адрес IP') or ''
+        data['MAC-адрес'] = find_value_by_label(summary_index, 'Первичный адрес MAC') or ''
+
+        disk_list = [get_text(XP_NEXT_SIBLING_TD(d)[0]) for d in find_tds_by_string(summary_table, DISK_LABEL_RE)]
+        data['Дисковые накопители'] = "\n".join(disk for disk in disk_list if not is_ignored_drive(disk)) or 'Не найдено'
+
+        _, mobo_table = find_section_table(root, 'motherboard')
+        data['Сокет'] = find_value_by_label(mobo_table, 'Разъёмы для ЦП') or ''
+
+        ram_models = []
+        for label in find_tds_by_string(summary_table, DIMM_LABEL_RE):
+            if model_text := get_text(XP_NEXT_SIBLING_TD(label)[0]):
+                if 'empty' not in model_text.lower() and 'пусто' not in model_text.lower(): ram_models.append(model_text)
+
+        ram_headers = functools.cache(lambda: _find_ram_headers(root))
+        if not ram_models:
+            for header in ram_headers():
+                parent_rows = XP_PARENT_TR(header); module_rows = []
+                if not parent_rows: continue
+                # Соседние строки перебираются лениво: секция модуля заканчивается на следующем заголовке
+                for sibling_tr in parent_rows[0].itersiblings('tr'):
+                    if _row_has_header_cell(sibling_tr): break
+                    module_rows.append(sibling_tr)
+                if not module_rows: continue
+                module_index = build_rows_label_index(module_rows)
+                module_size = find_value_by_label(module_index, 'Размер')
+                if module_size and module_size.strip():
+                    manufacturer = find_value_by_label(module_index, 'Производитель') or ''
+                    speed = find_value_by_label(module_index, 'Макс. частота') or find_value_by_label(module_index, 'Скорость памяти') or ''
+                    ram_models.append(format_ram_module(module_size, manufacturer, speed))
+
+        fill_ram_fields(data, ram_models, lambda: len(ram_headers()))
+
+        smart_section, smart_table = find_section_table(root, 'smart')
+        if smart_section is not None:
+            if smart_table is not None: apply_smart_classification(data, _extract_smart_drives(smart_table), config)
+            else: data['internal_smart_status'], data['SMART Проблемы'], data['SMART Статус'] = "NOT_FOUND", [], "NOT_FOUND"
+        else:
+            data['internal_smart_status'] = 'NOT_FOUND'
+            data['SMART Проблемы'] = []
+            data['SMART Статус'] = find_value_by_label(summary_index, 'SMART-статус жёстких дисков') or "Не найден"
+
+        bios_section, bios_table = find_section_table(root, 'bios')
+        if bios_section is not None and bios_table is not None: data['Дата BIOS'] = find_value_by_label(bios_table, 'Дата BIOS системы') or ''
+
+        return data
+    except Exception as e:
+        logger.critical(f"КРИТИЧЕСКАЯ ОШИБКА ПАРСИНГА {os.path.basename(file_path)}: {e}", exc_info=True)
+        return None
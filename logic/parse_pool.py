@@ -0,0 +1,119 @@
+# logic/parse_pool.py
+# Пул процессов для парсинга отчетов с жестким лимитом времени на файл. В отличие от ProcessPoolExecutor
+# здесь каждый процесс можно убить отдельно: зависший на битом отчете процесс завершается и заменяется
+# новым, а при остановке анализа все процессы убиваются сразу, не дожидаясь конца текущих файлов.
+# С одним рабочим (parse_workers = 1) отчеты разбираются прямо в потоке анализа, без дочерних процессов.
+import os
+import time
+import logging
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+
+from logic.ingest import process_report, config_from_dict
+from logic.rules import get_rule_set
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_SECONDS = 0.2
+
+def _worker_main(conn, config_sections):
+    """Цикл дочернего процесса: получает путь к отчету, возвращает (данные, логи, текст ошибки)."""
+    # Конфиг и набор правил собираются один раз на процесс, а не на каждый отчет
+    config = config_from_dict(config_sections); get_rule_set(config)
+    while True:
+        try: file_path = conn.recv()
+        except (EOFError, KeyboardInterrupt): break
+        if file_path is None: break
+        try: data, logs = process_report(file_path, config); error = None
+        except Exception as e: data, logs, error = None, [], f"{type(e).__name__}: {e}"
+        conn.send((data, logs, error))
+
+def _result(file_path, data, logs, error):
+    """Кортеж (путь, данные, логи, причина сбоя) из ответа разбора."""
+    if error: return file_path, None, logs, f"Ошибка разбора: {error}"
+    if data is None: return file_path, None, logs, "Отчет не удалось разобрать (нет сводной таблицы или он поврежден)"
+    return file_path, data, logs, None
+
+class _Slot:
+    """Один дочерний процесс и отчет, который он сейчас разбирает."""
+    __slots__ = ('process', 'conn', 'file_path', 'started')
+
+    def __init__(self, context, config_sections):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, config_sections), daemon=True)
+        self.process.start(); child_conn.close()
+        self.file_path = None; self.started = 0.0
+
+    def submit(self, file_path):
+        self.conn.send(file_path); self.file_path = file_path; self.started = time.monotonic()
+
+    def kill(self):
+        if self.process.is_alive(): self.process.kill()
+        self.process.join(); self.conn.close()
+
+    def stop(self):
+        try: self.conn.send(None)
+        except OSError: pass
+        self.process.join(timeout=1)
+        if self.process.is_alive(): self.process.kill(); self.process.join()
+        self.conn.close()
+
+class ReportParsePool:
+    """
+    Разбирает отчеты в дочерних процессах (spawn — так же, как под Windows) не более чем по одному
+    файлу на процесс. Отчет, который разбирается дольше timeout_seconds, прерывается убийством процесса.
+    С workers = 1 отчеты разбираются последовательно в вызывающем потоке: так проще отлаживать и не нужны
+    процессы, но лимит времени не действует — поток нельзя прервать посреди разбора.
+    """
+    def __init__(self, workers, config_sections, timeout_seconds):
+        self.workers = max(1, workers); self.config_sections = config_sections; self.timeout_seconds = timeout_seconds
+        self._context = multiprocessing.get_context('spawn')
+
+    def imap(self, file_paths, is_running):
+        """
+        Отдает кортежи (путь, данные, логи, причина сбоя) в порядке готовности. Причина сбоя — None при
+        успехе, иначе текст для карантина. Когда is_running() вернет False, все процессы убиваются.
+        """
+        if self.workers == 1: yield from self._imap_in_thread(file_paths, is_running); return
+        queue = deque(file_paths); slots = []
+        try:
+            slots = [_Slot(self._context, self.config_sections) for _ in range(min(self.workers, len(queue)))]
+            while is_running():
+                for slot in slots:
+                    if slot.file_path is None and queue: slot.submit(queue.popleft())
+                busy = {slot.conn: slot for slot in slots if slot.file_path is not None}
+                if not busy: break
+
+                for conn in wait(list(busy), timeout=POLL_INTERVAL_SECONDS):
+                    slot = busy[conn]; file_path = slot.file_path; slot.file_path = None
+                    try: data, logs, error = conn.recv()
+                    except (EOFError, OSError):
+                        # Процесс умер сам (нехватка памяти, падение в C-коде) — заменяем его новым
+                        slots[slots.index(slot)] = self._replace(slot)
+                        yield file_path, None, [], "Процесс парсинга аварийно завершился"; continue
+                    yield _result(file_path, data, logs, error)
+
+                now = time.monotonic()
+                for i, slot in enumerate(slots):
+                    if slot.file_path is None or now - slot.started < self.timeout_seconds: continue
+                    file_path = slot.file_path
+                    logger.warning(f"Парсинг {os.path.basename(file_path)} превысил лимит {self.timeout_seconds} с, процесс прерван.")
+                    slots[i] = self._replace(slot)
+                    yield file_path, None, [], f"Превышен лимит времени разбора ({self.timeout_seconds} с)"
+        finally:
+            for slot in slots:
+                if slot.file_path is None: slot.stop()
+                else: slot.kill()
+
+    def _imap_in_thread(self, file_paths, is_running):
+        config = config_from_dict(self.config_sections)
+        for file_path in file_paths:
+            if not is_running(): return
+            try: data, logs = process_report(file_path, config); error = None
+            except Exception as e: data, logs, error = None, [], f"{type(e).__name__}: {e}"
+            yield _result(file_path, data, logs, error)
+
+    def _replace(self, slot):
+        slot.kill()
+        return _Slot(self._context, self.config_sections)
@@ -1,105 +1,206 @@
 import os
 import re
 import logging
-from bs4 import BeautifulSoup
+import functools
+from bs4 import BeautifulSoup, Tag
 from logic.helpers import parse_size_from_string
+from logic.report_normalizer import load_report_html
+from logic.rules import get_rule_set, smart_finding
+from logic.derived_fields import is_ssd_drive, smart_raw_number
 
 logger = logging.getLogger(__name__)
 
+class LabelIndex:
+    """
+    Индекс "метка -> значение" для одной таблицы отчета. Все ячейки <td> без вложенных <td>
+    обходятся один раз при построении, их текст запоминается; дальнейшие поиски идут по готовому
+    списку строк без обхода дерева. Семантика прежнего find_value_by_label сохранена: метка ищется
+    как подстрока, а при нескольких совпадениях побеждает последняя ячейка.
+    """
+    __slots__ = ('_texts', '_resolve_value', '_cache')
+
+    def __init__(self, texts, resolve_value):
+        # resolve_value(позиция) -> текст ячейки-значения для ячейки-метки на этой позиции
+        self._texts = texts; self._resolve_value = resolve_value; self._cache = {}
+
+    def find(self, label_text):
+        if label_text in self._cache: return self._cache[label_text]
+        value = None
+        for position in range(len(self._texts) - 1, -1, -1):
+            if label_text in self._texts[position]: value = self._resolve_value(position); break
+        self._cache[label_text] = value
+        return value
+
+def _cell_value_text(value_td):
+    link = value_td.find('a')
+    return link.get_text(strip=True) if link else value_td.get_text(strip=True)
+
+def _is_leaf_cell(td):
+    # То же, что not td.find('td'), но без построения фильтра BeautifulSoup на каждую ячейку
+    return not any(node.name == 'td' for node in td.descendants if isinstance(node, Tag))
+
+def _row_has_header_cell(row):
+    """Есть ли в строке заголовок группы (<td class="dt">), как row.find('td', class_='dt')."""
+    return any(node.name == 'td' and 'dt' in node.get('class', ()) for node in row.descendants if isinstance(node, Tag))
+
+def build_label_index(search_area):
+    """Строит LabelIndex по таблице BeautifulSoup за один обход."""
+    cells = [td for td in search_area.find_all('td') if _is_leaf_cell(td)]
+
+    def resolve_value(position):
+        label_td = cells[position]
+        value_td = label_td.find_next_sibling('td') or label_td.find_next('td')
+        return _cell_value_text(value_td) if value_td else None
+
+    return LabelIndex([td.get_text(strip=True) for td in cells], resolve_value)
+
+def build_rows_label_index(rows):
+    """
+    Строит LabelIndex по набору строк <tr> (детальная секция одного модуля ОЗУ) прямо по узлам
+    исходного дерева, без сериализации и повторного разбора. Если у метки нет соседней ячейки,
+    значением считается следующая ячейка в пределах этих же строк.
+    """
+    cells = [td for row in rows for td in row.find_all('td') if _is_leaf_cell(td)]
+
+    def resolve_value(position):
+        value_td = cells[position].find_next_sibling('td') or (cells[position + 1] if position + 1 < len(cells) else None)
+        return _cell_value_text(value_td) if value_td else None
+
+    return LabelIndex([td.get_text(strip=True) for td in cells], resolve_value)
+
 def find_value_by_label(search_area, label_text):
+    """Ищет значение по метке; search_area — таблица BeautifulSoup или уже построенный LabelIndex."""
     if not search_area: return None
     try:
-        candidates = search_area.find_all(lambda tag: tag.name == 'td' and label_text in tag.get_text(strip=True) and not tag.find('td'))
-        if not candidates: return None
-        label_td = candidates[-1]
-        value_td = label_td.find_next_sibling('td')
-        if not value_td: value_td = label_td.find_next('td')
-        if value_td:
-            link = value_td.find('a')
-            return link.get_text(strip=True) if link else value_td.get_text(strip=True)
-        return None
+        index = search_area if isinstance(search_area, LabelIndex) else build_label_index(search_area)
+        return index.find(label_text)
     except Exception as e:
         logger.error(f"Ошибка в find_value_by_label для '{label_text}': {e}", exc_info=True)
         return None
 
-def parse_smart_data_full(smart_section, config):
+HDD_ATTR_MAP = {'01': 'Ошибки чтения (Raw)', '05': 'Переназначенные сектора', '09': 'Наработка (часы)', 'C5': 'Сектора-кандидаты', 'C6': 'Неисправимые сектора'}
+SSD_ATTR_MAP = {'3': 'Доступный резерв (%)', '5': 'Использованный ресурс (%)', '48': 'Всего записано (ТБ)', '128': 'Наработка (часы)', '144': 'Небезопасные отключения'}
+RAM_HEADER_RE = re.compile(r'\[\s*(Устройства памяти|SPD)\s*/')
+
+def is_ignored_drive(drive_name):
+    """Диск ADATA SC750 намеренно исключается из отчета (и из списка дисков, и из SMART)."""
+    return "ADATA SC750" in drive_name.upper()
+
+def classify_smart_drives(drives, config, rule_set=None):
+    """
+    Оценивает SMART по уже извлеченным из таблицы данным, независимо от HTML-бэкенда.
+    drives — список (имя диска, [(ID атрибута, сырое значение), ...]); пороги берутся из
+    скомпилированного набора правил (logic.rules), а не из config на каждой строке.
+    Возвращает (статус, строки для отображения, находки [(код правила, {"drive": диск, "value": значение}), ...]).
+    """
+    rule_set = rule_set or get_rule_set(config)
     has_critical, has_warning = False, False
     all_drives_display_details = []
     all_drives_problem_details = []
 
-    HDD_ATTR_MAP = {'01': 'Ошибки чтения (Raw)', '05': 'Переназначенные сектора', '09': 'Наработка (часы)', 'C5': 'Сектора-кандидаты', 'C6': 'Неисправимые сектора'}
-    SSD_ATTR_MAP = {'3': 'Доступный резерв (%)', '5': 'Использованный ресурс (%)', '48': 'Всего записано (ТБ)', '128': 'Наработка (часы)', '144': 'Небезопасные отключения'}
+    for current_drive_name, attributes in drives:
+        current_is_ssd = is_ssd_drive(current_drive_name)
+        KEY_ATTRS_MAP = SSD_ATTR_MAP if current_is_ssd else HDD_ATTR_MAP
+        current_drive_display = {name: "N/A" for name in KEY_ATTRS_MAP.values()}
 
-    smart_table = smart_section.find_next('table')
-    if not smart_table: return "NOT_FOUND", [], []
-
-    current_drive_name, current_is_ssd, KEY_ATTRS_MAP, current_drive_display = None, False, {}, {}
+        for attr_id, raw_data_str in attributes:
+            if attr_id in KEY_ATTRS_MAP:
+                display_name = KEY_ATTRS_MAP[attr_id]
+                display_value = raw_data_str.split(' ')[0]
+                if attr_id == '48' and current_is_ssd: 
+                    display_value = f"{parse_size_from_string(raw_data_str, 'tb'):.2f}"
+                current_drive_display[display_name] = display_value
+            
+            if not (smart_rules := rule_set.smart_rules_for(current_is_ssd, attr_id)): continue
+            numeric_val = smart_raw_number(raw_data_str)
+            for rule in smart_rules:
+                if not rule.is_problem(numeric_val): continue
+                has_warning = True; all_drives_problem_details.append(smart_finding(rule, current_drive_name, numeric_val))
+                if rule.is_critical(numeric_val): has_critical = True
 
-    def process_previous_drive():
-        if current_drive_name:
-            all_drives_display_details.append(f"--- {current_drive_name.split('(')[0].strip()} ---")
-            for name, value in current_drive_display.items():
-                all_drives_display_details.append(f"{name}: {value}")
+        all_drives_display_details.append(f"--- {current_drive_name.split('(')[0].strip()} ---")
+        for name, value in current_drive_display.items():
+            all_drives_display_details.append(f"{name}: {value}")
+    
+    final_status = "GOOD"
+    if has_warning: final_status = "OK"
+    if has_critical: final_status = "BAD"
+    
+    return final_status, all_drives_display_details, all_drives_problem_details
 
+def _extract_smart_drives(smart_table):
+    """Собирает из таблицы SMART список (имя диска, [(ID атрибута, сырое значение), ...])."""
+    drives, current_drive = [], None
     for row in smart_table.find_all('tr'):
         header_cell = row.find('td', class_='dt')
         
         if header_cell:
-            process_previous_drive()
-            
             drive_name = header_cell.get_text(strip=True).strip('[]')
-            if "ADATA SC750" in drive_name.upper():
-                current_drive_name = None 
-                continue
-
-            current_drive_name = drive_name
-            current_is_ssd = any(k in drive_name.lower() for k in ['ssd', 'nvme', 'snv'])
-            KEY_ATTRS_MAP = SSD_ATTR_MAP if current_is_ssd else HDD_ATTR_MAP
-            current_drive_display = {name: "N/A" for name in KEY_ATTRS_MAP.values()}
+            current_drive = None if is_ignored_drive(drive_name) else (drive_name, [])
+            if current_drive: drives.append(current_drive)
             continue
 
-        if not current_drive_name: continue
+        if not current_drive: continue
 
-        cells_with_text = [c.get_text(strip=True) for c in row.find_all('td') if c.get_text(strip=True)]
+        cells_with_text = [text for text in (c.get_text(strip=True) for c in row.find_all('td')) if text]
         if len(cells_with_text) < 4: continue
+        current_drive[1].append((cells_with_text[0].strip(), cells_with_text[-2].strip()))
+    return drives
 
-        attr_id = cells_with_text[0].strip()
-        raw_data_str = cells_with_text[-2].strip()
-        
-        if attr_id in KEY_ATTRS_MAP:
-            display_name = KEY_ATTRS_MAP[attr_id]
-            display_value = raw_data_str.split(' ')[0]
-            if attr_id == '48' and current_is_ssd: 
-                display_value = f"{parse_size_from_string(raw_data_str, 'tb'):.2f}"
-            current_drive_display[display_name] = display_value
-        
-        try: numeric_val = int(re.match(r'\d+', raw_data_str).group()) if re.match(r'\d+', raw_data_str) else 0
-        except (ValueError, IndexError, AttributeError): continue
-
-        if not current_is_ssd:
-            if attr_id == '05' and numeric_val > 0:
-                has_warning = True; all_drives_problem_details.append(f"HDD '{current_drive_name}': Переназначенные сектора: {numeric_val}")
-                if numeric_val > config.getint('SMART', 'hdd_crc_error_warn_count', fallback=10): has_critical = True
-            if attr_id in ['C5', 'C6'] and numeric_val > 0:
-                has_critical = True; all_drives_problem_details.append(f"HDD '{current_drive_name}': Проблемные сектора: {numeric_val}")
-        else:
-            if attr_id == '3' and numeric_val < config.getint('SMART', 'ssd_available_spare_warn_percent'):
-                has_warning = True; all_drives_problem_details.append(f"SSD '{current_drive_name}': Мало запасных блоков: {numeric_val}%")
-                if numeric_val < config.getint('SMART', 'ssd_available_spare_critical_percent'): has_critical = True
+def apply_smart_classification(data, drives, config, rule_set=None):
+    """
+    Заполняет SMART-поля отчета по извлеченным дискам. Сами диски с сырыми значениями атрибутов
+    остаются в data['_smart_drives'] — они попадают в снимок отчета для переоценки без HTML.
+    """
+    smart_status, display_details, problem_details = classify_smart_drives(drives, config, rule_set)
+    data['internal_smart_status'] = smart_status
+    data['SMART Проблемы'] = problem_details
+    data['SMART Статус'] = "\n".join([smart_status] + display_details)
+    data['_smart_drives'] = drives
 
-    process_previous_drive()
-    
-    final_status = "GOOD"
-    if has_warning: final_status = "OK"
-    if has_critical: final_status = "BAD"
-    
-    return final_status, all_drives_display_details, all_drives_problem_details
+def parse_smart_data_full(smart_section, config):
+    smart_table = smart_section.find_next('table')
+    if not smart_table: return "NOT_FOUND", [], []
+    return classify_smart_drives(_extract_smart_drives(smart_table), config)
+
+def format_ram_module(module_size, manufacturer, speed):
+    """Собирает строку описания модуля ОЗУ из детальной секции (Устройства памяти / SPD)."""
+    if 'mt/s' in speed.lower(): speed = speed.lower().replace('mt/s', 'MHz').strip()
+    display_text = f"{module_size.strip()} {manufacturer} DDR3 {speed}".strip()
+    return re.sub(r'\s+', ' ', display_text)
+
+def fill_ram_fields(data, ram_models, count_ram_headers):
+    """
+    Заполняет модели плашек, их количество, объем ОЗУ (если не найден) и свободные слоты.
+    count_ram_headers — функция без аргументов, считающая заголовки детальных секций ОЗУ;
+    вызывается, только если число слотов не удалось взять из описания платы.
+    """
+    final_cleaned_models = [" ".join(text.split('(')[0].strip().split()) for text in ram_models if text]
+    data['Модели плашек ОЗУ'] = "\n".join(final_cleaned_models) if final_cleaned_models else 'Не найдено'
+    data['Кол-во плашек ОЗУ'] = len(final_cleaned_models)
+
+    total_physical_ram_gb = parse_size_from_string(data.get('Объем ОЗУ'))
+    if total_physical_ram_gb == 0 and final_cleaned_models:
+        total_physical_ram_gb = sum(parse_size_from_string(s, 'gb') for s in final_cleaned_models)
+        if total_physical_ram_gb > 0: data['Объем ОЗУ'] = f"{int(total_physical_ram_gb * 1024)} МБ"
+
+    total_ram_slots = 0
+    if mobo_string := data.get('Материнская плата', ''):
+        if match := re.search(r'(\d+)\s+DDR\d\s+DIMM', mobo_string, re.I): total_ram_slots = int(match.group(1))
+    if total_ram_slots == 0:
+        if ram_headers_count := count_ram_headers(): total_ram_slots = ram_headers_count
+        else: total_ram_slots = 4 if 'so-dimm' not in str(ram_models).lower() else 2
+    data['Свободно слотов ОЗУ'] = max(0, total_ram_slots - data['Кол-во плашек ОЗУ'])
 
 def parse_aida_report(file_path, config, log_emitter):
+    if config.get('Settings', 'parser_backend', fallback='lxml').strip().lower() == 'lxml':
+        # Импорт здесь, чтобы не было циклической зависимости: lxml-бэкенд использует общие функции этого модуля
+        from logic.lxml_parser import parse_aida_report_lxml
+        return parse_aida_report_lxml(file_path, config, log_emitter)
+
     log_emitter(f"Парсинг: {os.path.basename(file_path)}", "info")
     try:
-        with open(file_path, 'r', encoding='windows-1251', errors='ignore') as f:
-            html_content = f.read()
+        html_content = load_report_html(file_path, config)
 
         soup = BeautifulSoup(html_content, 'lxml')
         data = {'Имя файла': os.path.basename(file_path)}
@@ -111,19 +212,21 @@ def parse_aida_report(file_path, config, log_emitter):
             logger.error(f"[{data['Имя файла']}] Не найдена основная сводная таблица.")
             return None
 
-        data['Название ПК'] = find_value_by_label(summary_table, 'Имя компьютера') or ''
-        data['ОС'] = find_value_by_label(summary_table, 'Операционная система') or ''
-        data['Процессор'] = find_value_by_label(summary_table, 'Тип ЦП') or ''
-        data['Материнская плата'] = find_value_by_label(summary_table, 'Системная плата') or ''
-        data['Видеоадаптер'] = find_value_by_label(summary_table, 'Видеоадаптер') or ''
-        data['Монитор'] = find_value_by_label(summary_table, 'Монитор') or ''
-        data['Объем ОЗУ'] = find_value_by_label(summary_table, 'Системная память') or ''
-        data['Локальный IP'] = find_value_by_label(summary_table, 'Первичный адрес IP') or ''
-        data['MAC-адрес'] = find_value_by_label(summary_table, 'Первичный адрес MAC') or ''
+        # Сводная таблица обходится один раз, дальше все метки ищутся по индексу
+        summary_index = build_label_index(summary_table)
+        data['Название ПК'] = find_value_by_label(summary_index, 'Имя компьютера') or ''
+        data['ОС'] = find_value_by_label(summary_index, 'Операционная система') or ''
+        data['Процессор'] = find_value_by_label(summary_index, 'Тип ЦП') or ''
+        data['Материнская плата'] = find_value_by_label(summary_index, 'Системная плата') or ''
+        data['Видеоадаптер'] = find_value_by_label(summary_index, 'Видеоадаптер') or ''
+        data['Монитор'] = find_value_by_label(summary_index, 'Монитор') or ''
+        data['Объем ОЗУ'] = find_value_by_label(summary_index, 'Системная память') or ''
+        data['Локальный IP'] = find_value_by_label(summary_index, 'Первичный адрес IP') or ''
+        data['MAC-адрес'] = find_value_by_label(summary_index, 'Первичный адрес MAC') or ''
         
-        disk_candidates = summary_table.find_all('td', text=re.compile('Дисковый накопитель'))
+        disk_candidates = summary_table.find_all('td', string=re.compile('Дисковый накопитель'))
         # --- ИСПРАВЛЕНИЕ: Фильтруем диск ADATA прямо здесь ---
-        disk_list = [d.find_next_sibling('td').get_text(strip=True) for d in disk_candidates if "ADATA SC750" not in d.find_next_sibling('td').get_text(strip=True).upper()]
+        disk_list = [d.find_next_sibling('td').get_text(strip=True) for d in disk_candidates if not is_ignored_drive(d.find_next_sibling('td').get_text(strip=True))]
         data['Дисковые накопители'] = "\n".join(disk_list) or 'Не найдено'
         
         # --- ВОССТАНОВЛЕННЫЙ И УЛУЧШЕННЫЙ ПАРСИНГ ОЗУ ---
@@ -131,59 +234,39 @@ def parse_aida_report(file_path, config, log_emitter):
         data['Сокет'] = find_value_by_label(mobo_table, 'Разъёмы для ЦП') or ''
         
         ram_models, is_ram_found = [], False
-        if ram_labels := summary_table.find_all('td', text=re.compile(r'^\s*DIMM\d:')):
+        ram_headers = functools.cache(lambda: soup.find_all('td', class_='dt', string=RAM_HEADER_RE))
+        if ram_labels := summary_table.find_all('td', string=re.compile(r'^\s*DIMM\d:')):
             for label in ram_labels:
                 if model_text := label.find_next_sibling('td').get_text(strip=True):
                     if 'empty' not in model_text.lower() and 'пусто' not in model_text.lower(): ram_models.append(model_text)
             if ram_models: is_ram_found = True
 
         if not is_ram_found:
-            ram_headers = soup.find_all('td', class_='dt', text=re.compile(r'\[\s*(Устройства памяти|SPD)\s*/'))
-            for header in ram_headers:
-                parent_tr = header.find_parent('tr'); module_rows_html = []
+            for header in ram_headers():
+                parent_tr = header.find_parent('tr'); module_rows = []
                 if not parent_tr: continue
-                for sibling_tr in parent_tr.find_next_siblings('tr'):
-                    if sibling_tr.find('td', class_='dt'): break
-                    module_rows_html.append(str(sibling_tr))
-                if not module_rows_html: continue
-                module_soup = BeautifulSoup(f"<table>{''.join(module_rows_html)}</table>", 'lxml')
-                module_size = find_value_by_label(module_soup, 'Размер')
+                for sibling_tr in parent_tr.next_siblings:
+                    if not isinstance(sibling_tr, Tag) or sibling_tr.name != 'tr': continue
+                    if _row_has_header_cell(sibling_tr): break
+                    module_rows.append(sibling_tr)
+                if not module_rows: continue
+                module_index = build_rows_label_index(module_rows)
+                module_size = find_value_by_label(module_index, 'Размер')
                 if module_size and module_size.strip():
-                    manufacturer = find_value_by_label(module_soup, 'Производитель') or ''
-                    speed = find_value_by_label(module_soup, 'Макс. частота') or find_value_by_label(module_soup, 'Скорость памяти') or ''
-                    if 'mt/s' in speed.lower(): speed = speed.lower().replace('mt/s', 'MHz').strip()
-                    display_text = f"{module_size.strip()} {manufacturer} DDR3 {speed}".strip()
-                    ram_models.append(re.sub(r'\s+', ' ', display_text))
+                    manufacturer = find_value_by_label(module_index, 'Производитель') or ''
+                    speed = find_value_by_label(module_index, 'Макс. частота') or find_value_by_label(module_index, 'Скорость памяти') or ''
+                    ram_models.append(format_ram_module(module_size, manufacturer, speed))
         
-        final_cleaned_models = [" ".join(text.split('(')[0].strip().split()) for text in ram_models if text]
-        data['Модели плашек ОЗУ'] = "\n".join(final_cleaned_models) if final_cleaned_models else 'Не найдено'
-        data['Кол-во плашек ОЗУ'] = len(final_cleaned_models)
-
-        total_physical_ram_gb = parse_size_from_string(data.get('Объем ОЗУ'))
-        if total_physical_ram_gb == 0 and final_cleaned_models:
-            total_physical_ram_gb = sum(parse_size_from_string(s, 'gb') for s in final_cleaned_models)
-            if total_physical_ram_gb > 0: data['Объем ОЗУ'] = f"{int(total_physical_ram_gb * 1024)} МБ"
-
-        total_ram_slots = 0
-        if mobo_string := data.get('Материнская плата', ''):
-            if match := re.search(r'(\d+)\s+DDR\d\s+DIMM', mobo_string, re.I): total_ram_slots = int(match.group(1))
-        if total_ram_slots == 0:
-            if ram_headers := soup.find_all('td', class_='dt', text=re.compile(r'\[\s*(Устройства памяти|SPD)\s*/')): total_ram_slots = len(ram_headers)
-            else: total_ram_slots = 4 if 'so-dimm' not in str(ram_models).lower() else 2
-        data['Свободно слотов ОЗУ'] = max(0, total_ram_slots - data['Кол-во плашек ОЗУ'])
+        fill_ram_fields(data, ram_models, lambda: len(ram_headers()))
         
         # --- ПАРСИНГ SMART ---
         if smart_section := soup.find('a', attrs={'name': 'smart'}):
-            smart_status, display_details, problem_details = parse_smart_data_full(smart_section, config)
-            data['internal_smart_status'] = smart_status 
-            data['SMART Проблемы'] = problem_details
-            final_smart_output = [smart_status]
-            if display_details: final_smart_output.extend(display_details)
-            data['SMART Статус'] = "\n".join(final_smart_output)
+            if smart_table := smart_section.find_next('table'): apply_smart_classification(data, _extract_smart_drives(smart_table), config)
+            else: data['internal_smart_status'], data['SMART Проблемы'], data['SMART Статус'] = "NOT_FOUND", [], "NOT_FOUND"
         else:
             data['internal_smart_status'] = 'NOT_FOUND'
             data['SMART Проблемы'] = []
-            data['SMART Статус'] = find_value_by_label(summary_table, 'SMART-статус жёстких дисков') or "Не найден"
+            data['SMART Статус'] = find_value_by_label(summary_index, 'SMART-статус жёстких дисков') or "Не найден"
 
         if bios_section := soup.find('a', attrs={'name': 'bios'}):
             if bios_table := bios_section.find_next('table'): data['Дата BIOS'] = find_value_by_label(bios_table, 'Дата BIOS системы') or ''
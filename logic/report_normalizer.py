@@ -1,12 +1,116 @@
 # logic/report_normalizer.py
-import logging
+# Предварительный проход перед парсером: из многомегабайтного отчета AIDA64 вырезаются только
+# те таблицы, которые парсер реально читает, и результат кэшируется на диске по хешу содержимого.
+import os
 import re
-from bs4 import BeautifulSoup
+import mmap
+import bisect
+import logging
+
+from logic.helpers import content_hash
 
 logger = logging.getLogger(__name__)
 
-def normalize_html_report(html_content: str, filename: str) -> str:
-    """Простая функция, которая ничего не делает, но нужна для импорта."""
-    # Мы пока отключаем нормализацию, чтобы убедиться, что проблема не в ней.
-    # logger.info(f"Нормализация отключена для: {filename}")
-    return html_content
\ No newline at end of file
+NORMALIZER_VERSION = 1
+SECTION_ANCHORS = ('summary', 'motherboard', 'smart', 'bios')
+REPORT_ENCODING = 'windows-1251'
+
+ANCHOR_RE = re.compile(rb'<a\s[^>]*?name\s*=\s*["\']?(' + b'|'.join(a.encode() for a in SECTION_ANCHORS) + rb')(?=["\'\s>])', re.I)
+TABLE_TAG_RE = re.compile(rb'<(/?)table\b', re.I)
+# Заголовки детальных секций ОЗУ (тот же шаблон, что RAM_HEADER_RE в парсере, но по байтам windows-1251)
+_SPACE = rb'(?:\s|\xa0|&nbsp;)*'
+RAM_HEADER_BYTES_RE = re.compile(rb'\[' + _SPACE + rb'(?:' + 'Устройства памяти'.encode(REPORT_ENCODING) + rb'|SPD)' + _SPACE + rb'/')
+
+def _table_spans(buffer):
+    """Возвращает список (начало, конец) всех таблиц с учетом вложенности, в порядке открывающих тегов."""
+    spans, stack = [], []
+    for match in TABLE_TAG_RE.finditer(buffer):
+        if not match.group(1): stack.append(len(spans)); spans.append([match.start(), None]); continue
+        if not stack: continue
+        tag_end = buffer.find(b'>', match.end())
+        spans[stack.pop()][1] = len(buffer) if tag_end == -1 else tag_end + 1
+    # Незакрытые таблицы (обрезанный отчет) тянутся до конца файла, как их достроил бы HTML-парсер
+    return [(start, end if end is not None else len(buffer)) for start, end in spans]
+
+def slice_report_sections(buffer):
+    """
+    Вырезает из байтов отчета таблицы разделов summary/motherboard/smart/bios (первая таблица после якоря,
+    как find_next('table') в парсере) и таблицы с детальными секциями ОЗУ для запасного разбора плашек.
+    Возвращает строку с компактным HTML или None, если в отчете нет сводного раздела.
+    """
+    anchors = {}
+    for match in ANCHOR_RE.finditer(buffer):
+        anchors.setdefault(match.group(1).lower().decode(), match.start())
+    if 'summary' not in anchors: return None
+
+    spans = _table_spans(buffer); starts = [start for start, _ in spans]
+    kept = {}  # span -> имена якорей, которые должны стоять прямо перед ним
+    trailing_anchors = []
+    for name, position in sorted(anchors.items(), key=lambda item: item[1]):
+        next_table = bisect.bisect_right(starts, position)
+        if next_table == len(spans): trailing_anchors.append(name)
+        else: kept.setdefault(spans[next_table], []).append(name)
+
+    for match in RAM_HEADER_BYTES_RE.finditer(buffer):
+        containing = [span for span in spans if span[0] < match.start() < span[1]]
+        if containing: kept.setdefault(max(containing, key=lambda span: span[0]), [])
+
+    parts = [f'<html><head><meta charset="utf-8"><!-- normalized v{NORMALIZER_VERSION} --></head><body>\n']
+    last_end = -1
+    for span in sorted(kept):
+        if span[0] < last_end: continue  # таблица вложена в уже вырезанную (вместе со своим якорем)
+        for name in kept[span]: parts.append(f'<a name="{name}"></a>\n')
+        parts.append(buffer[span[0]:span[1]].decode(REPORT_ENCODING, errors='ignore')); parts.append('\n')
+        last_end = span[1]
+    parts += [f'<a name="{name}"></a>\n' for name in trailing_anchors]
+    parts.append('</body></html>\n')
+    return ''.join(parts)
+
+def _read_full_report(file_path):
+    with open(file_path, 'r', encoding=REPORT_ENCODING, errors='ignore') as f:
+        return f.read()
+
+def normalize_html_report(file_path, cache_dir):
+    """
+    Возвращает нормализованный HTML отчета из кэша или строит его заново (mmap + поиск по байтам).
+    Кэш — файл <хеш содержимого>.v<версия>.htm в cache_dir. None — если нормализовать не удалось.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0: return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            cache_path = os.path.join(cache_dir, f"{content_hash(buffer)}.v{NORMALIZER_VERSION}.htm") if cache_dir else None
+            if cache_path and os.path.exists(cache_path):
+                with open(cache_path, 'r', encoding='utf-8') as cached: return cached.read()
+            normalized = slice_report_sections(buffer)
+
+    if normalized is None or not cache_path: return normalized
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Пишем через временный файл: один и тот же отчет могут одновременно нормализовать несколько процессов
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f: f.write(normalized)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Не удалось записать нормализованный отчет в кэш {cache_path}: {e}")
+    return normalized
+
+def load_report_html(file_path, config):
+    """Возвращает HTML для парсера: нормализованные разделы (если включено в конфиге) или весь файл целиком."""
+    if config.getboolean('Settings', 'normalize_reports', fallback=True):
+        try:
+            if (normalized := normalize_html_report(file_path, config.get('Settings', 'normalized_cache_dir', fallback='report_cache'))) is not None:
+                return normalized
+            logger.debug(f"Отчет {os.path.basename(file_path)} не нормализован (нет сводного раздела), читаю целиком.")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ошибка нормализации {os.path.basename(file_path)}, читаю целиком: {e}")
+    return _read_full_report(file_path)
+
+def prune_normalized_cache(cache_dir, keep_hashes):
+    """Удаляет из кэша нормализованные отчеты, хешей которых больше нет среди актуальных отчетов."""
+    if not cache_dir or not os.path.isdir(cache_dir): return 0
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name.split('.', 1)[0] in keep_hashes and name.endswith(f".v{NORMALIZER_VERSION}.htm"): continue
+        try: os.remove(os.path.join(cache_dir, name)); removed += 1
+        except OSError: pass
+    return removed
@@ -0,0 +1,203 @@
+# logic/rules.py
+# Правила анализа, скомпилированные из разделов [Analysis] и [SMART] config.ini. Пороги читаются
+# один раз при сборке набора правил; готовый RuleSet неизменяем и кэшируется по содержимому этих
+# разделов, так что пересобирается только после правки config.ini.
+import functools
+import configparser
+from enum import IntEnum
+from types import MappingProxyType
+from collections import namedtuple
+from datetime import datetime
+
+from logic.derived_fields import compute_derived_fields, bios_datetime, HDD_REALLOCATED_ATTR, HDD_UNSTABLE_ATTRS, SSD_SPARE_ATTR
+
+RULE_SECTIONS = ('Analysis', 'SMART')
+
+CATEGORY_CRITICAL, CATEGORY_UPGRADE, CATEGORY_GOOD = 1, 2, 3
+
+class ProblemCode(IntEnum):
+    """
+    Коды проблем. Значения хранятся вне программы — не перенумеровывать, только добавлять новые.
+    SMART_DISKS (параметр — готовая строка о диске) остался от прежних записей; новые находки SMART — коды 101–103.
+    """
+    SMART_DISKS = 1
+    OLD_PLATFORM = 2
+    RAM_CRITICAL = 3
+    OUTDATED_OS = 4
+    RAM_LOW = 5
+    NO_SSD = 6
+    NO_VIDEO_DRIVER = 7
+    OLD_BIOS = 8
+    HDD_REALLOCATED_SECTORS = 101
+    HDD_UNSTABLE_SECTORS = 102
+    SSD_LOW_SPARE = 103
+
+# Подписи кодов для сводок по парку (диаграмма дашборда): одна на код, без значений конкретного ПК
+PROBLEM_LABELS = {
+    ProblemCode.SMART_DISKS: "Проблемы с дисками (SMART)",
+    ProblemCode.OLD_PLATFORM: "Очень старая платформа",
+    ProblemCode.RAM_CRITICAL: "Критически мало ОЗУ",
+    ProblemCode.OUTDATED_OS: "Устаревшая ОС Windows 7",
+    ProblemCode.RAM_LOW: "Недостаточно ОЗУ",
+    ProblemCode.NO_SSD: "Отсутствует SSD",
+    ProblemCode.NO_VIDEO_DRIVER: "Не установлен видеодрайвер",
+    ProblemCode.OLD_BIOS: "Устаревший BIOS",
+    ProblemCode.HDD_REALLOCATED_SECTORS: "HDD: переназначенные сектора",
+    ProblemCode.HDD_UNSTABLE_SECTORS: "HDD: проблемные сектора",
+    ProblemCode.SSD_LOW_SPARE: "SSD: мало запасных блоков",
+}
+
+def problem_label(code):
+    return PROBLEM_LABELS.get(code, f"Код проблемы {code}")
+
+# Тексты проблем для показа: находка хранится кодом и параметром (value), текст собирается только при выводе.
+# У находок SMART параметр — {"drive": диск, "value": значение атрибута}, по одной находке на диск и атрибут
+PROBLEM_TEMPLATES = {
+    ProblemCode.SMART_DISKS: "  - {value}",
+    ProblemCode.OLD_PLATFORM: "Критично: Очень старая платформа",
+    ProblemCode.RAM_CRITICAL: "Критично: Мало ОЗУ ({value:.1f} ГБ)",
+    ProblemCode.OUTDATED_OS: "Проблема: Устаревшая ОС Windows 7",
+    ProblemCode.RAM_LOW: "Проблема: Недостаточно ОЗУ ({value:.1f} ГБ)",
+    ProblemCode.NO_SSD: "Проблема: Отсутствует SSD",
+    ProblemCode.NO_VIDEO_DRIVER: "Проблема: Не установлен видеодрайвер",
+    ProblemCode.OLD_BIOS: "Предупреждение: BIOS старше {value} лет",
+    ProblemCode.HDD_REALLOCATED_SECTORS: "  - HDD '{drive}': Переназначенные сектора: {value}",
+    ProblemCode.HDD_UNSTABLE_SECTORS: "  - HDD '{drive}': Проблемные сектора: {value}",
+    ProblemCode.SSD_LOW_SPARE: "  - SSD '{drive}': Мало запасных блоков: {value}%",
+}
+# Коды, строки которых показываются под общим заголовком о дисках
+SMART_PROBLEM_CODES = frozenset({ProblemCode.SMART_DISKS, ProblemCode.HDD_REALLOCATED_SECTORS, ProblemCode.HDD_UNSTABLE_SECTORS, ProblemCode.SSD_LOW_SPARE})
+SMART_DISKS_HEADER = "Проблемы с дисками:"
+
+def render_problem(code, value=None):
+    """Текст одной находки (код, параметр); неизвестный код показывается подписью с параметром."""
+    template = PROBLEM_TEMPLATES.get(code)
+    if template is None: return problem_label(code) if value is None else f"{problem_label(code)}: {value}"
+    return template.format(**value) if isinstance(value, dict) else template.format(value=value)
+
+def render_problems(findings):
+    """Строки текста для находок [(код, параметр), ...]: строки о дисках — под общим заголовком."""
+    lines = [render_problem(code, value) for code, value in findings]
+    if any(code in SMART_PROBLEM_CODES for code, _ in findings): lines.append(SMART_DISKS_HEADER)
+    return lines
+
+OLD_SOCKETS = ('LGA775', 'AM2', 'LGA1156')
+BASIC_DISPLAY_ADAPTER = 'Microsoft Basic Display Adapter'
+
+# Факты о ПК, из которых исходят правила; считаются один раз на запись
+Facts = namedtuple('Facts', 'os socket gpu has_ssd ram_gb bios_date is_win7')
+# Те же факты по всему парку — массивами для пакетной оценки (logic.batch_classifier); возраст BIOS уже в днях
+# (NaN — даты нет), contains(колонка, подстроки) -> маска записей, где есть хоть одна из подстрок
+ColumnFacts = namedtuple('ColumnFacts', 'socket gpu has_ssd ram_gb bios_age_days is_win7 contains')
+# check(facts, now) -> bool; mask(column_facts) -> то же условие маской по парку;
+# value(ram_gb) -> параметр находки для текста (PROBLEM_TEMPLATES) или None
+Rule = namedtuple('Rule', 'code category check mask value')
+# Правило SMART для одного типа диска (SSD или HDD) и набора ID атрибутов: is_problem(значение) / is_critical(значение) -> bool
+# (проверки годятся и для массивов); summary_key — колонка сводки SMART с крайним значением этих атрибутов по дискам
+# записи (см. logic.derived_fields.compute_smart_fields); текст находки — PROBLEM_TEMPLATES[code]
+SmartRule = namedtuple('SmartRule', 'code is_ssd attr_ids summary_key is_problem is_critical')
+
+def smart_finding(rule, drive, value):
+    """Находка правила SMART для диска: (код, {"drive": диск, "value": значение}); имя диска — без пробелов по краям, как в истории SMART."""
+    return rule.code, {'drive': drive.strip(), 'value': value}
+
+class RuleSet:
+    """
+    Неизменяемый набор правил: правила для записи целиком, правила SMART по атрибутам и сами
+    пороги (thresholds) — для пакетной оценки, которая проверяет те же условия над массивами.
+    """
+    __slots__ = ('rules', 'smart_rules', 'thresholds', '_smart_index')
+
+    def __init__(self, rules, smart_rules, thresholds):
+        index = {}
+        for rule in smart_rules:
+            for attr_id in rule.attr_ids: index.setdefault((rule.is_ssd, attr_id), []).append(rule)
+        object.__setattr__(self, 'rules', tuple(rules))
+        object.__setattr__(self, 'smart_rules', tuple(smart_rules))
+        object.__setattr__(self, 'thresholds', MappingProxyType(dict(thresholds)))
+        object.__setattr__(self, '_smart_index', {key: tuple(value) for key, value in index.items()})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RuleSet неизменяем")
+
+    def smart_rules_for(self, is_ssd, attr_id):
+        return self._smart_index.get((is_ssd, attr_id), ())
+
+    def rule(self, code):
+        return next(rule for rule in self.rules if rule.code == code)
+
+def extract_facts(data):
+    """Факты для правил; типизированные поля берутся из записи, если уже посчитаны при разборе."""
+    derived = data if 'ram_gb' in data else compute_derived_fields(data)
+    return Facts(os=data.get('ОС', ''), socket=data.get('Сокет', ''), gpu=data.get('Видеоадаптер', ''), has_ssd=bool(derived['has_ssd']),
+                 ram_gb=derived['ram_gb'] or 0.0, bios_date=bios_datetime(derived), is_win7=bool(derived['is_win7']))
+
+def _compile(config):
+    thresholds = {
+        'bios_age_limit_years': config.getint('Analysis', 'bios_age_limit_years', fallback=5),
+        'ram_critical_gb': config.getfloat('Analysis', 'ram_critical_gb', fallback=3.8),
+        'ram_upgrade_gb': config.getfloat('Analysis', 'ram_upgrade_gb', fallback=7.8),
+        'hdd_crc_error_warn_count': config.getint('SMART', 'hdd_crc_error_warn_count', fallback=10),
+        'ssd_available_spare_warn_percent': config.getint('SMART', 'ssd_available_spare_warn_percent', fallback=10),
+        'ssd_available_spare_critical_percent': config.getint('SMART', 'ssd_available_spare_critical_percent', fallback=3),
+    }
+    bios_age_limit, ram_critical_gb, ram_upgrade_gb = thresholds['bios_age_limit_years'], thresholds['ram_critical_gb'], thresholds['ram_upgrade_gb']
+    hdd_realloc_limit = thresholds['hdd_crc_error_warn_count']
+    ssd_spare_warn, ssd_spare_critical = thresholds['ssd_available_spare_warn_percent'], thresholds['ssd_available_spare_critical_percent']
+    bios_age_days = 365 * bios_age_limit
+    no_value = lambda ram_gb: None
+
+    rules = [
+        Rule(ProblemCode.OLD_PLATFORM, CATEGORY_CRITICAL, lambda f, now: bool(f.socket) and any(s in f.socket for s in OLD_SOCKETS),
+             lambda c: c.contains(c.socket, OLD_SOCKETS), no_value),
+        Rule(ProblemCode.RAM_CRITICAL, CATEGORY_CRITICAL, lambda f, now: 0 < f.ram_gb < ram_critical_gb,
+             lambda c: (c.ram_gb > 0) & (c.ram_gb < ram_critical_gb), lambda ram_gb: ram_gb),
+        Rule(ProblemCode.OUTDATED_OS, CATEGORY_UPGRADE, lambda f, now: f.is_win7, lambda c: c.is_win7, no_value),
+        Rule(ProblemCode.RAM_LOW, CATEGORY_UPGRADE, lambda f, now: ram_critical_gb <= f.ram_gb < ram_upgrade_gb,
+             lambda c: (c.ram_gb >= ram_critical_gb) & (c.ram_gb < ram_upgrade_gb), lambda ram_gb: ram_gb),
+        Rule(ProblemCode.NO_SSD, CATEGORY_UPGRADE, lambda f, now: not f.has_ssd, lambda c: ~c.has_ssd, no_value),
+        Rule(ProblemCode.NO_VIDEO_DRIVER, CATEGORY_UPGRADE, lambda f, now: BASIC_DISPLAY_ADAPTER in f.gpu,
+             lambda c: c.contains(c.gpu, (BASIC_DISPLAY_ADAPTER,)), no_value),
+        Rule(ProblemCode.OLD_BIOS, CATEGORY_UPGRADE, lambda f, now: bool(f.bios_date) and (now - f.bios_date).days > bios_age_days,
+             lambda c: c.bios_age_days > bios_age_days, lambda ram_gb: bios_age_limit),
+    ]
+    smart_rules = [
+        SmartRule(ProblemCode.HDD_REALLOCATED_SECTORS, False, (HDD_REALLOCATED_ATTR,), 'hdd_realloc_max', lambda value: value > 0, lambda value: value > hdd_realloc_limit),
+        SmartRule(ProblemCode.HDD_UNSTABLE_SECTORS, False, HDD_UNSTABLE_ATTRS, 'hdd_unstable_max', lambda value: value > 0, lambda value: True),
+        SmartRule(ProblemCode.SSD_LOW_SPARE, True, (SSD_SPARE_ATTR,), 'ssd_spare_min', lambda value: value < ssd_spare_warn, lambda value: value < ssd_spare_critical),
+    ]
+    return RuleSet(rules, smart_rules, thresholds)
+
+def config_fingerprint(config):
+    """Содержимое разделов с порогами в виде хешируемого кортежа — ключ кэша наборов правил."""
+    return tuple((section, tuple(sorted(config.items(section, raw=True)))) for section in RULE_SECTIONS if config.has_section(section))
+
+@functools.lru_cache(maxsize=8)
+def _compile_cached(fingerprint):
+    config = configparser.ConfigParser()
+    config.read_dict({section: dict(items) for section, items in fingerprint})
+    return _compile(config)
+
+def get_rule_set(config):
+    """Возвращает набор правил для config; собирается заново, только если пороги изменились."""
+    return _compile_cached(config_fingerprint(config))
+
+def evaluate(data, rule_set, now=None):
+    """
+    Применяет правила к одной записи. Возвращает (категория, [(код проблемы, параметр), ...]); текст
+    находок собирает render_problems(). Находки SMART берутся готовыми из data['SMART Проблемы'] (см.
+    logic.parser.classify_smart_drives): по одной на диск и атрибут, с кодом своего правила.
+    """
+    findings, category = [], CATEGORY_GOOD
+    smart_status = data.get('internal_smart_status')
+    if smart_status != 'GOOD' and (smart_problems := data.get('SMART Проблемы', [])):
+        findings.extend((code, value) for code, value in smart_problems)
+    if smart_status == 'BAD': category = CATEGORY_CRITICAL
+    elif smart_status == 'OK': category = CATEGORY_UPGRADE
+
+    facts, now = extract_facts(data), now or datetime.now()
+    for rule in rule_set.rules:
+        if rule.check(facts, now):
+            findings.append((rule.code, rule.value(facts.ram_gb))); category = min(category, rule.category)
+    if not findings: category = CATEGORY_GOOD
+    return category, findings
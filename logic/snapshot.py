@@ -0,0 +1,52 @@
+# logic/snapshot.py
+# Снимок разобранного отчета для колонки _RAW_DATA: все поля, извлеченные парсером, плюс сырые
+# значения SMART-атрибутов по каждому диску. По снимку анализ повторяется без чтения HTML.
+import json
+import zlib
+import logging
+
+from logic.analyzer import analysis_fields
+from logic.parser import apply_smart_classification
+from logic.rules import get_rule_set
+from logic.derived_fields import compute_derived_fields
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+RAW_DATA_KEY = '_RAW_DATA'
+SMART_DRIVES_KEY = '_smart_drives'
+# Результаты анализа в снимок не входят: они пересчитываются при каждой переоценке
+ANALYSIS_KEYS = ('category', 'problems', 'problem_codes', 'problem_findings')
+# Поля, которые пересчитываются по SMART-атрибутам (если раздел SMART был в отчете)
+SMART_RESULT_KEYS = ('internal_smart_status', 'SMART Проблемы', 'SMART Статус')
+
+def encode_snapshot(raw_data):
+    """Упаковывает словарь парсера в сжатый JSON (bytes для BLOB-колонки)."""
+    fields = {key: value for key, value in raw_data.items() if key not in ANALYSIS_KEYS and key not in (RAW_DATA_KEY, SMART_DRIVES_KEY)}
+    payload = {'version': SNAPSHOT_VERSION, 'fields': fields, 'smart_drives': raw_data.get(SMART_DRIVES_KEY)}
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 6)
+
+def decode_snapshot(blob):
+    """Распаковывает снимок; None — если снимка нет, он поврежден или записан несовместимой версией."""
+    if not blob: return None
+    try:
+        payload = json.loads(zlib.decompress(blob).decode('utf-8'))
+    except (zlib.error, ValueError, TypeError) as e:
+        logger.warning(f"Не удалось распаковать снимок отчета: {e}")
+        return None
+    return payload if payload.get('version') == SNAPSHOT_VERSION else None
+
+def reanalyze_snapshot(snapshot, config, overrides=None, rule_set=None, now=None):
+    """
+    Повторяет анализ по снимку с текущими порогами из config. overrides — текущие значения из БД
+    (например, поправленные вручную ячейки), они важнее значений из снимка; SMART-поля всегда
+    берутся из снимка. rule_set и now передаются при переоценке пачкой, чтобы не собирать их на
+    каждую запись. Возвращает словарь с пересчитанными SMART-полями, category, problem_codes и problem_findings.
+    """
+    rule_set = rule_set or get_rule_set(config)
+    data = dict(snapshot['fields'])
+    if overrides: data.update({key: value for key, value in overrides.items() if key in data and key not in SMART_RESULT_KEYS and value is not None})
+    data.update(compute_derived_fields(data))
+    if snapshot.get('smart_drives') is not None: apply_smart_classification(data, snapshot['smart_drives'], config, rule_set); data.pop(SMART_DRIVES_KEY)
+    data.update(analysis_fields(data, config, rule_set, now))
+    return data
@@ -4,86 +4,114 @@ import platform
 import re
 import socket
 import subprocess
-from threading import Thread
+from threading import Thread, Event
 
 import psutil
 from PySide6.QtCore import QObject, Signal
 
 # --- НОВЫЕ ИМПОРТЫ ---
-from logic.parser import parse_aida_report
-from logic.analyzer import analyze_system # Импортируем анализатор
-from logic.excel_handler import write_to_excel
-from logic.database_handler import save_data_to_db, fetch_all_data_from_db, update_single_field_in_db
-from utils.helpers import natural_sort_key
+from logic.ingest import config_to_dict, get_parse_workers, get_parse_budget, get_db_batch_size, plan_incremental_scan
+from logic.parse_pool import ReportParsePool
+from logic.exporters import EXPORTERS, get_export_formats, get_export_path
+from logic.report_normalizer import prune_normalized_cache
+from logic.database_handler import ReportBatchWriter, fetch_page, fetch_by_mac, fetch_report_manifest, save_report_manifest, fetch_quarantine, save_quarantine, close_db_connection
+from logic.db_writer import get_db_writer
+from logic.batch_classifier import reclassify_fleet
 
 logger = logging.getLogger(__name__)
 
 class AidaWorker(QObject):
-    log_message = Signal(str, str); progress_update = Signal(int, int); status_update = Signal(str, bool); result_ready = Signal(dict); finished = Signal(str) 
-    def __init__(self, reports_dir, config): super().__init__(); self.reports_dir = reports_dir; self.config = config; self.is_running = True
+    log_message = Signal(str, str); progress_update = Signal(int, int); scan_counts = Signal(int, int); status_update = Signal(str, bool); result_ready = Signal(dict); finished = Signal(str) 
+    def __init__(self, reports_dir, config, force_full_rescan=False): super().__init__(); self.reports_dir = reports_dir; self.config = config; self.force_full_rescan = force_full_rescan; self.is_running = True
+    def _iter_results(self, file_paths):
+        """Отдает (путь, данные, причина сбоя) в порядке готовности; каждый отчет разбирается в отдельном процессе под лимитом времени (при parse_workers = 1 — в этом потоке)."""
+        workers = get_parse_workers(self.config); timeout, _ = get_parse_budget(self.config)
+        if workers == 1: self.log_message.emit("Парсинг последовательно в потоке анализа (parse_workers = 1), без лимита времени на отчет.", "info")
+        else: self.log_message.emit(f"Парсинг: процессов {workers}, лимит на отчет {timeout:g} с.", "info")
+        pool = ReportParsePool(workers, config_to_dict(self.config), timeout)
+        # "Стоп" проверяется каждые доли секунды и сразу убивает процессы вместе с текущими файлами
+        for file_path, data, logs, failure in pool.imap(file_paths, lambda: self.is_running):
+            for message, level in logs: self.log_message.emit(message, level)
+            yield file_path, data, failure
     def run(self):
         try:
             output_file = self.config.get('Settings', 'output_filename', fallback='system_analysis.xlsx'); report_files = [f for f in os.listdir(self.reports_dir) if f.lower().endswith(('.htm', '.html'))]
             if not report_files: self.log_message.emit("В указанной папке не найдено файлов отчетов .htm/.html.", "warning"); self.finished.emit(""); return
-            self.log_message.emit(f"Найдено отчетов: {len(report_files)}", "info"); all_reports_data = []; total_files = len(report_files)
+            self.log_message.emit(f"Найдено отчетов: {len(report_files)}", "info"); total_files = len(report_files)
             
-            for i, filename in enumerate(report_files):
-                if not self.is_running: break
-                self.progress_update.emit(i + 1, total_files)
-                file_path = os.path.join(self.reports_dir, filename)
-                
-                # --- ИЗМЕНЕННАЯ ЛОГИКА ---
-                # Шаг 1: Получаем только "сырые" данные из парсера
-                raw_data = parse_aida_report(file_path, self.config, self.log_message.emit)
-                
-                if raw_data:
-                    # Шаг 2: Передаем сырые данные в анализатор
-                    category, problems_text = analyze_system(raw_data, self.config)
-                    
-                    # Шаг 3: Дополняем словарь результатами анализа
-                    raw_data['category'] = category
-                    raw_data['problems'] = problems_text
-                    
-                    self.result_ready.emit(raw_data)
-                    all_reports_data.append(raw_data)
+            file_paths = [os.path.join(self.reports_dir, filename) for filename in report_files]
+            if self.force_full_rescan: self.log_message.emit("Полный перескан: манифест игнорируется, разбираются все отчеты.", "info")
+            manifest = {} if self.force_full_rescan else fetch_report_manifest(); _, max_size_bytes = get_parse_budget(self.config)
+            plan = plan_incremental_scan(file_paths, manifest, self.force_full_rescan, fetch_quarantine(), max_size_bytes); db_writer = get_db_writer(); db_writer.call(save_report_manifest, plan.refreshed); to_parse = plan.to_parse
+            quarantined = [(*entry, f"Размер {entry[1] / 1048576:.1f} МБ превышает лимит {max_size_bytes / 1048576:g} МБ") for entry in plan.oversized]
+            for entry in quarantined: self.log_message.emit(f"Отчет {entry[0]} отправлен в карантин: {entry[4]}", "warning")
+            skipped = plan.skipped + plan.held + len(plan.oversized)
+            self.log_message.emit(f"Без изменений (пропущено): {plan.skipped}, в карантине: {plan.held + len(plan.oversized)}, к разбору: {len(to_parse)}", "info")
+            self.scan_counts.emit(0, skipped); self.progress_update.emit(skipped, total_files)
             
-            if not self.is_running: self.log_message.emit("Процесс анализа был прерван пользователем.", "warning"); self.finished.emit(""); return
+            # Записи уходят в БД пачками по мере разбора (вместе с манифестом): память не растет с числом отчетов,
+            # а при остановке или сбое уже разобранное остается в базе
+            with ReportBatchWriter(get_db_batch_size(self.config), db_writer.call) as writer:
+                for i, (file_path, raw_data, failure) in enumerate(self._iter_results(list(to_parse)), 1):
+                    self.progress_update.emit(skipped + i, total_files); self.scan_counts.emit(i, skipped)
+                    if raw_data:
+                        self.result_ready.emit(raw_data); writer.add(raw_data, to_parse[file_path])
+                    else:
+                        quarantined.append((*to_parse[file_path], failure)); self.log_message.emit(f"Отчет {os.path.basename(file_path)} отправлен в карантин: {failure}", "warning")
             
-            self.status_update.emit("Сохранение данных в базу...", True); save_data_to_db(all_reports_data); self.status_update.emit("Экспорт в Excel...", True)
-            
-            all_data_from_db = fetch_all_data_from_db(); all_data_from_db.sort(key=lambda item: natural_sort_key(item.get('Имя файла')))
+            db_writer.call(save_quarantine, quarantined).result(); self.log_message.emit(f"Сохранено в базу записей: {writer.written}", "info")
+            if not self.is_running: self.log_message.emit("Процесс анализа был прерван пользователем.", "warning"); self.finished.emit(""); return
             
-            write_to_excel(all_data_from_db, output_file, self.log_message.emit); self.finished.emit(output_file)
+            if self.config.getboolean('Settings', 'normalize_reports', fallback=True):
+                # Кэш нормализованных отчетов держим только для тех, что есть в манифесте
+                removed = prune_normalized_cache(self.config.get('Settings', 'normalized_cache_dir', fallback='report_cache'), {entry[2] for entry in fetch_report_manifest().values()})
+                if removed: self.log_message.emit(f"Удалено устаревших файлов из кэша нормализованных отчетов: {removed}", "debug")
+            # Книгу Excel пересоберет планировщик экспорта (logic.export_scheduler) — один раз на серию изменений
+            self.finished.emit(output_file)
         except Exception as e:
             self.log_message.emit(f"КРИТИЧЕСКАЯ ОШИБКА в потоке анализа: {e}", "error"); logger.error(f"Критическая ошибка в потоке AidaWorker: {e}", exc_info=True); self.finished.emit("")
-class DatabaseUpdateWorker(QObject):
-    log_message = Signal(str, str); finished = Signal()
-    def __init__(self, config, unique_id, header_to_update, new_value): super().__init__(); self.config = config; self.unique_id = unique_id; self.header = header_to_update; self.new_value = new_value
+        finally: close_db_connection()
+class ReanalyzeWorker(QObject):
+    """Переоценка всего парка по типизированным колонкам БД с текущими порогами [Analysis]/[SMART], без чтения HTML."""
+    log_message = Signal(str, str); finished = Signal(str)
+    def __init__(self, config): super().__init__(); self.config = config
     def run(self):
         try:
-            if update_single_field_in_db(self.unique_id, self.header, self.new_value):
-                self.log_message.emit(f"Ячейка '{self.header}' для '{self.unique_id}' обновлена в БД.", "info"); output_file = self.config.get('Settings', 'output_filename', fallback='system_analysis.xlsx')
-                all_data = fetch_all_data_from_db(); all_data.sort(key=lambda item: natural_sort_key(item.get('Имя файла', '')))
-                write_to_excel(all_data, output_file, self.log_message.emit); self.log_message.emit("Файл Excel обновлен.", "info")
-            else: self.log_message.emit(f"Не удалось обновить ячейку '{self.header}' для '{self.unique_id}'.", "error")
-        except Exception as e: self.log_message.emit(f"Ошибка при обновлении БД: {e}", "error"); logger.error(f"Ошибка обновления БД: {e}", exc_info=True)
-        finally: self.finished.emit()
+            total, changed = get_db_writer().call(reclassify_fleet, self.config).result()
+            if not total: self.log_message.emit("В базе нет записей для переоценки — сначала запустите анализ.", "warning"); self.finished.emit(""); return
+            self.log_message.emit(f"Переоценено записей: {total}, изменилась оценка у {changed}", "info")
+            self.finished.emit(self.config.get('Settings', 'output_filename', fallback='system_analysis.xlsx'))
+        except Exception as e:
+            self.log_message.emit(f"Ошибка при переоценке: {e}", "error"); logger.error(f"Ошибка при переоценке: {e}", exc_info=True); self.finished.emit("")
+        finally: close_db_connection()
 
-class FullExcelExportWorker(QObject):
+class ExportWorker(QObject):
+    """
+    Экспорт данных во все форматы из [Settings] export_formats по очереди; ошибка записи одного формата
+    (файл открыт в другой программе) не мешает остальным. cancel_event — выставить, чтобы прервать устаревший
+    экспорт (недописанный файл тогда не меняется, следующие форматы не пишутся). finished — путь к первому
+    записанному файлу ("" — ничего не записано или экспорт прерван).
+    """
     log_message = Signal(str, str); finished = Signal(str)
-    def __init__(self, config): super().__init__(); self.config = config
+    def __init__(self, config, cancel_event=None): super().__init__(); self.config = config; self.cancel_event = cancel_event or Event()
     def run(self):
+        written = []
         try:
-            self.log_message.emit("Экспорт всех данных в Excel запущен...", "info"); output_file = self.config.get('Settings', 'output_filename', fallback='system_analysis.xlsx')
-            all_data = fetch_all_data_from_db(); all_data.sort(key=lambda item: natural_sort_key(item.get('Имя файла', '')))
-            write_to_excel(all_data, output_file, self.log_message.emit); self.finished.emit(output_file)
+            formats = get_export_formats(self.config); should_continue = lambda: not self.cancel_event.is_set()
+            self.log_message.emit(f"Экспорт данных запущен ({', '.join(formats)})...", "info")
+            for export_format in formats:
+                if not should_continue(): break
+                output_file = get_export_path(self.config, export_format)
+                if EXPORTERS[export_format](output_file, self.log_message.emit, should_continue): written.append(output_file)
+            self.finished.emit(written[0] if written and should_continue() else "")
         except Exception as e:
-            self.log_message.emit(f"Ошибка при экспорте в Excel: {e}", "error"); logger.error(f"Ошибка при экспорте в Excel: {e}", exc_info=True); self.finished.emit("")
+            self.log_message.emit(f"Ошибка при экспорте: {e}", "error"); logger.error(f"Ошибка при экспорте: {e}", exc_info=True); self.finished.emit("")
+        finally: close_db_connection()
 
 
 class IPUpdateWorker(QObject):
     log_message = Signal(str, str)
-    finished = Signal()
+    finished = Signal(int)  # число обновленных IP-адресов
 
     IGNORE_KEYWORDS = ['loopback', 'teredo', 'isatap', 'virtual', 'vmware', 'vbox', 'radmin', 'hamachi', 'tap-windows', 'hyper-v', 'wsl', 'vethernet']
     PHYSICAL_KEYWORDS = ['ethernet', 'wi-fi', 'беспроводная', 'локальной сети']
@@ -155,7 +183,7 @@ class IPUpdateWorker(QObject):
         except Exception as e: self.log_message.emit(f"Не удалось получить ARP-таблицу: {e}", "error"); return {}
 
     def run(self):
-        self.log_message.emit("--- НАЧАЛО ОБНОВЛЕНИЯ IP ---", "info"); logger.info("IPUpdateWorker: Запуск.")
+        self.log_message.emit("--- НАЧАЛО ОБНОВЛЕНИЯ IP ---", "info"); logger.info("IPUpdateWorker: Запуск."); update_count = 0
         try:
             net_info = self._get_local_net_info()
             if not net_info: self.log_message.emit("Не удалось продолжить без информации о подсети.", "error"); return
@@ -166,26 +194,20 @@ class IPUpdateWorker(QObject):
             self.log_message.emit(f"Добавляю информацию о локальном хосте в ARP-таблицу: {net_info['ip']} -> {net_info['mac']}", "debug")
             arp_table[net_info['mac']] = net_info['ip']
             
-            db_data = fetch_all_data_from_db()
-            if not db_data: self.log_message.emit("База данных пуста, нечего обновлять.", "warning"); return
+            if not fetch_page(limit=1): self.log_message.emit("База данных пуста, нечего обновлять.", "warning"); return
 
-            update_count = 0
-            for record in db_data:
-                mac_from_db = record.get("MAC-адрес")
-                if not mac_from_db: continue
-                normalized_mac_db = mac_from_db.upper().replace(':', '-')
-                if normalized_mac_db in arp_table:
-                    current_ip = arp_table[normalized_mac_db]
-                    if current_ip != record.get("Локальный IP"):
-                        update_single_field_in_db(record["Имя файла"], "Локальный IP", current_ip)
-                        self.log_message.emit(f"IP ОБНОВЛЕН для {record['Название ПК']} ({normalized_mac_db}): {record.get('Локальный IP')} -> {current_ip}", "info"); update_count += 1
+            # Записи ищутся по индексу MAC для каждого устройства из ARP-таблицы, вся база в память не читается;
+            # правки уходят в очередь пишущего потока и фиксируются общими транзакциями
+            db_writer, updates = get_db_writer(), []
+            for normalized_mac, current_ip in arp_table.items():
+                for record in fetch_by_mac(normalized_mac):
+                    if current_ip != record.get("Локальный IP"): updates.append((record, normalized_mac, current_ip, db_writer.update_field(record["Имя файла"], "Локальный IP", current_ip)))
+            for record, normalized_mac, current_ip, saved in updates:
+                if saved.result(): self.log_message.emit(f"IP ОБНОВЛЕН для {record['Название ПК']} ({normalized_mac}): {record.get('Локальный IP')} -> {current_ip}", "info"); update_count += 1
             
-            if update_count > 0:
-                self.log_message.emit(f"Обновлено IP-адресов: {update_count}.", "info"); self.log_message.emit("Обновляю Excel-файл...", "info")
-                all_data = fetch_all_data_from_db(); all_data.sort(key=lambda item: natural_sort_key(item.get('Имя файла', '')))
-                write_to_excel(all_data, 'system_analysis.xlsx', self.log_message.emit)
+            if update_count > 0: self.log_message.emit(f"Обновлено IP-адресов: {update_count}.", "info")
             else: self.log_message.emit("Изменений в IP-адресах не найдено.", "info")
         except Exception as e:
             self.log_message.emit(f"КРИТИЧЕСКАЯ ОШИБКА в потоке обновления IP: {e}", "error"); logger.error(f"Критическая ошибка в потоке IPUpdateWorker: {e}", exc_info=True)
         finally:
-            logger.info("IPUpdateWorker: Завершение."); self.log_message.emit("--- КОНЕЦ ОБНОВЛЕНИЯ IP ---", "info"); self.finished.emit()
+            close_db_connection(); logger.info("IPUpdateWorker: Завершение."); self.log_message.emit("--- КОНЕЦ ОБНОВЛЕНИЯ IP ---", "info"); self.finished.emit(update_count)
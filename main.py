@@ -4,6 +4,7 @@ import sys
 import os
 import logging
 import configparser
+import multiprocessing
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
@@ -18,6 +19,9 @@ from utils.logger_setup import setup_global_logging # Наш новый логг
 # Старая функция setup_logging() больше не нужна, удаляем ее
 
 if __name__ == "__main__":
+    # Нужно для пула процессов парсинга в собранном PyInstaller .exe (Windows запускает дочерние процессы через spawn)
+    multiprocessing.freeze_support()
+
     # --- ИЗМЕНЕНИЕ: Настройка логирования теперь - самый первый шаг! ---
     # Это гарантирует, что мы поймаем ошибки даже при инициализации.
     setup_global_logging()
@@ -28,7 +32,16 @@ if __name__ == "__main__":
         config['Settings'] = {
             'reports_directory': 'reports',
             'output_filename': 'system_analysis.xlsx',
-            'log_filename': 'parser.log'
+            'log_filename': 'parser.log',
+            'parse_workers': '0',
+            'parse_timeout_seconds': '60',
+            'max_report_size_mb': '50',
+            'parser_backend': 'lxml',
+            'normalize_reports': 'true',
+            'normalized_cache_dir': 'report_cache',
+            'db_batch_size': '500',
+            'export_quiet_ms': '1500',
+            'export_formats': 'xlsx'
         }
         config['Analysis'] = {
             'bios_age_limit_years': '5', 
@@ -1,7 +1,98 @@
 # tests/conftest.py
 import sys
 import os
+import json
+import time
+import configparser
+
+import pytest
 
 # Добавляем корневую папку проекта в путь,
 # чтобы pytest мог найти модуль 'logic'
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
\ No newline at end of file
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: замеры скорости (запускаются только с AIDA_BENCH=1 или -m benchmark)")
+
+def pytest_collection_modifyitems(config, items):
+    # Замеры по времени зависят от загрузки машины — в обычном прогоне они пропускаются
+    if os.environ.get('AIDA_BENCH') == '1' or os.environ.get('AIDA_BENCH_UPDATE') == '1' or 'benchmark' in (config.getoption('markexpr') or ''): return
+    skip = pytest.mark.skip(reason="замеры скорости запускаются только с AIDA_BENCH=1 или -m benchmark")
+    for item in items:
+        if 'benchmark' in item.keywords: item.add_marker(skip)
+
+CONFIG_TEXT = """
+[Settings]
+parser_backend = {backend}
+normalize_reports = {normalize}
+normalized_cache_dir = {cache_dir}
+
+[SMART]
+hdd_crc_error_warn_count = 5
+ssd_available_spare_warn_percent = 10
+ssd_available_spare_critical_percent = 3
+"""
+
+@pytest.fixture(scope='session')
+def make_config():
+    """Сборщик конфигурации: make_config(backend, normalize=False, cache_dir='') -> ConfigParser с порогами SMART."""
+    def build(backend, normalize=False, cache_dir=''):
+        config = configparser.ConfigParser()
+        config.read_string(CONFIG_TEXT.format(backend=backend, normalize=normalize, cache_dir=cache_dir))
+        return config
+    return build
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Пустая БД во временной папке; соединение потока закрывается после теста."""
+    from logic import database_handler
+    monkeypatch.setattr(database_handler, 'DB_NAME', str(tmp_path / 'test.db'))
+    database_handler.initialize_db()
+    yield database_handler.DB_NAME
+    database_handler.close_db_connection()
+
+# Общие инструменты замеров: время сравнивается в "машинных единицах" — долях калибровочной нагрузки,
+# замеренной на той же машине, — с эталонами из benchmark_baseline.json
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+TOLERANCE = float(os.environ.get('AIDA_BENCH_TOLERANCE', '2.5'))
+UPDATE_BASELINE = os.environ.get('AIDA_BENCH_UPDATE') == '1'
+MIN_BUDGET_SECONDS = 0.005
+
+def _best_of(func, repeat=15):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter(); func(); timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def _calibration_workload():
+    # Та же смесь операций, что и в парсере: строки с кириллицей, замены, разбиение, словари
+    text, counts = 'Имя компьютера&nbsp;  PC-001  ' * 20, {}
+    for i in range(20000):
+        for word in text.replace('&nbsp;', ' ').strip().split()[:4]: counts[word] = counts.get(word, 0) + i % 7
+
+@pytest.fixture(scope='session')
+def best_of():
+    """Лучшее время из нескольких запусков: best_of(func, repeat=15) -> секунды."""
+    return _best_of
+
+@pytest.fixture(scope='session')
+def machine_unit():
+    """Время калибровочной нагрузки на этой машине, в секундах."""
+    return _best_of(_calibration_workload)
+
+@pytest.fixture
+def check_budget(machine_unit):
+    """Проверка замера: check_budget(name, seconds) сравнивает его с эталоном или записывает эталон при AIDA_BENCH_UPDATE=1."""
+    def check(name, seconds):
+        score = seconds / machine_unit
+        baseline = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, encoding='utf-8') as f: baseline = json.load(f)
+        if UPDATE_BASELINE:
+            baseline[name] = round(score, 3)
+            with open(BASELINE_PATH, 'w', encoding='utf-8') as f: json.dump(dict(sorted(baseline.items())), f, indent=2); f.write('\n')
+            return
+        if name not in baseline: pytest.skip(f"Нет эталона для {name}: запустите с AIDA_BENCH_UPDATE=1")
+        assert seconds <= max(baseline[name] * TOLERANCE * machine_unit, MIN_BUDGET_SECONDS), (
+            f"{name}: {seconds:.4f}с = {score:.2f} ед., эталон {baseline[name]:.2f} ед. (допуск x{TOLERANCE:g}, не меньше {MIN_BUDGET_SECONDS}с)")
+    return check
@@ -0,0 +1,134 @@
+# tests/report_factory.py
+# Генератор синтетических отчетов AIDA64 7.x для тестов и замеров парсера.
+import os
+
+DEFAULT_HDD = ('WDC WD10EZEX-08WN4A0 (WD-WCC6Y1234567)', [
+    ('01', 'Raw Read Error Rate', '51', '200', '200', '0'),
+    ('05', 'Reallocated Sector Count', '140', '200', '200', '0'),
+    ('09', 'Power-On Hours', '0', '45', '45', '40211'),
+    ('C5', 'Current Pending Sector', '0', '200', '200', '0'),
+    ('C6', 'Offline Uncorrectable', '0', '200', '200', '0'),
+])
+DEFAULT_SSD = ('Samsung SSD 870 EVO 500GB (S6PXNM0T123456)', [
+    ('3', 'Available Spare', '10', '100', '100', '100'),
+    ('5', 'Percentage Used', '0', '98', '98', '2'),
+    ('48', 'Data Units Written', '0', '0', '0', '12.5 TB'),
+    ('128', 'Power On Hours', '0', '0', '0', '5120'),
+    ('144', 'Unsafe Shutdowns', '0', '0', '0', '37'),
+])
+# Четыре модуля ОЗУ только в секциях SPD (для отчетов без строк DIMM в сводке)
+FOUR_SPD_MODULES = [{'size': '4 ГБ'}, {'size': '8 ГБ', 'manufacturer': 'Samsung', 'speed': '2400 MT/s'},
+                    {'size': '4 ГБ', 'manufacturer': 'Crucial'}, {'size': '8 ГБ', 'manufacturer': 'Hynix', 'speed': '2133 MT/s'}]
+
+# Остальные строки детальной секции модуля ОЗУ: парсеру не нужны, но в реальных отчетах их десятки
+SPD_FILLER_ROWS = [('Тип модуля', 'Unbuffered DIMM'), ('Тип памяти', 'DDR3 SDRAM'), ('Ширина модуля', '64 bit'),
+                   ('Напряжение', '1.5 V'), ('Метод обнаружения ошибок', 'Нет'), ('Частота регенерации', 'Норма (15.625 us)')]
+SPD_FILLER_ROWS += [(f'@ {mhz} МГц', f'{cl}-{cl}-{cl}-{cl * 3}  (CL-RCD-RP-RAS) / {cl * 4}-{cl * 30}  (RC-RFC)')
+                    for mhz, cl in [(800, 11), (761, 10), (685, 9), (609, 8), (533, 7), (457, 6), (380, 5)]]
+SPD_FILLER_ROWS += [(feature, 'Поддерживается') for feature in ('Auto Self Refresh', 'Extended Temperature Range', 'On-Die Thermal Sensor',
+                                                                 'Partial Array Self Refresh', 'DLL-Off Mode', 'RZQ/6', 'RZQ/7')]
+
+def _row(label, value, link=False):
+    value_html = f'<A HREF="#{label}">{value}</A>' if link else value
+    return f'<TR><TD CLASS=cc>&nbsp;&nbsp;<TD CLASS=cc><IMG SRC="icons/{len(label)}.png" WIDTH=16 HEIGHT=16><TD CLASS=cc>{label}&nbsp;<TD CLASS=cc>{value_html}</TR>\n'
+
+def _group(title):
+    return f'<TR><TD CLASS=dt COLSPAN=4>[ {title} ]</TR>\n'
+
+# Разделы-"балласт", которыми реальные отчеты добираются до десятков мегабайт: журнал событий,
+# программы, процессы. Парсер их не читает, но вынужден через них пройти.
+EVENT_SOURCES = ('Service Control Manager', 'Microsoft-Windows-Kernel-Power', 'DCOM', 'Microsoft-Windows-WindowsUpdateClient', 'Disk')
+EVENT_MESSAGES = ('Служба "Фоновая интеллектуальная служба передачи (BITS)" перешла в состояние "Остановлена".',
+                  'Система перезагрузилась, не завершив работу должным образом.',
+                  'Сервер {9BA05972-F6A8-11CF-A442-00A0C90A8F39} не зарегистрировался в DCOM в течение отведенного времени.',
+                  'Установка обновления: Накопительное обновление для Windows 10 Version 22H2 (KB5034441).',
+                  'Драйвер обнаружил ошибку контроллера на \\Device\\Harddisk1\\DR1.')
+
+def _padding_rows(index):
+    """Строки балласта по очереди: событие журнала, установленная программа, процесс."""
+    kind = index % 3
+    if kind == 0:
+        return (f'<TR><TD CLASS=cc>{index % 28 + 1:02d}.{index % 12 + 1:02d}.2024 {index % 24:02d}:{index % 60:02d}:{index % 59:02d}'
+                f'<TD CLASS=cc>{EVENT_SOURCES[index % 5]}<TD CLASS=cc>{7000 + index % 50}<TD CLASS=cc>{EVENT_MESSAGES[index % 5]}</TR>\n')
+    if kind == 1: return _row(f'Программа {index}', f'Microsoft Visual C++ 2015-2022 Redistributable (x64) - 14.{index % 40}.{30000 + index}')
+    return f'<TR><TD CLASS=cc>svchost.exe<TD CLASS=cc>{1000 + index}<TD CLASS=cc>{index % 97 * 1024} КБ<TD CLASS=cc>C:\\Windows\\System32\\svchost.exe -k netsvcs -p</TR>\n'
+
+def build_padding(size_bytes, anchor='events', title='Журнал событий'):
+    """Раздел-балласт примерно на size_bytes байт (в windows-1251 символ = байт)."""
+    parts = [f'<A NAME="{anchor}"></A>\n<TABLE>\n', _group(title)]; length = sum(map(len, parts)); index = 0
+    while length < size_bytes:
+        row = _padding_rows(index); parts.append(row); length += len(row); index += 1
+    parts.append('</TABLE>\n')
+    return ''.join(parts)
+
+def build_report(pc_name='PC-001', os_name='Microsoft Windows 10 Pro', socket='1 LGA1150',
+                 motherboard='Asus H81M-K (2 PCI-E x1, 1 PCI-E x16, 2 DDR3 DIMM, Audio, Video, Gigabit LAN)',
+                 ram_total='8192 МБ  (DDR3-1600 DDR3 SDRAM)', dimms=('Kingston 99U5471-052.A00LF  (4 ГБ DDR3-1600 DDR3 SDRAM)',) * 2,
+                 spd_modules=(), disks=('WDC WD10EZEX-08WN4A0  (1 ТБ, 7200 RPM, SATA-III)', 'Samsung SSD 870 EVO 500GB  (500 ГБ, SATA-III)'),
+                 smart_drives=(DEFAULT_HDD, DEFAULT_SSD), bios_date='04/23/2019', gpu='Intel(R) HD Graphics 4600  (1 ГБ)',
+                 ip='192.168.1.10', mac='AA-BB-CC-DD-EE-01', padding_bytes=0):
+    """
+    Собирает HTML отчета в разметке AIDA64 (незакрытые <TD>, якоря разделов, группы [ ... ]).
+    spd_modules — список словарей с ключами size/manufacturer/speed для детальных секций
+    "[ Устройства памяти / ... ]"; smart_drives=None убирает раздел SMART целиком.
+    padding_bytes — объем разделов-балласта (программы перед SMART, журнал событий после него).
+    """
+    parts = ['<HTML><HEAD><META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=windows-1251">'
+             '<TITLE>AIDA64 Business v7.65.400</TITLE></HEAD><BODY>\n']
+
+    parts.append('<A NAME="summary"></A>\n<TABLE>\n')
+    parts.append(_group('Компьютер'))
+    parts += [_row('Тип компьютера', 'ACPI x64-based PC'), _row('Операционная система', os_name, link=True),
+              _row('Имя компьютера', pc_name), _row('Имя пользователя', 'user')]
+    parts.append(_group('Системная плата'))
+    parts += [_row('Тип ЦП', 'QuadCore Intel Core i5-4460, 3200 MHz (32 x 100)', link=True),
+              _row('Системная плата', motherboard, link=True), _row('Системная память', ram_total)]
+    parts += [_row(f'DIMM{i}: {model.split("  (")[0]}', model.split("  (")[-1].rstrip(')') if '  (' in model else model) for i, model in enumerate(dimms, 1)]
+    parts.append(_group('Отображение'))
+    parts += [_row('Видеоадаптер', gpu, link=True), _row('Монитор', 'Samsung SyncMaster S24D300 [24" LCD]')]
+    parts.append(_group('Хранение данных'))
+    parts += [_row('Дисковый накопитель', disk) for disk in disks]
+    parts.append(_row('SMART-статус жёстких дисков', 'OK'))
+    parts.append(_group('Сеть'))
+    parts += [_row('Первичный адрес IP', ip), _row('Первичный адрес MAC', mac)]
+    parts.append('</TABLE>\n')
+
+    parts.append('<A NAME="motherboard"></A>\n<TABLE>\n' + _group('Свойства системной платы') + _row('Разъёмы для ЦП', socket) + '</TABLE>\n')
+
+    if spd_modules:
+        parts.append('<A NAME="dmi"></A>\n<TABLE>\n')
+        for i, module in enumerate(spd_modules):
+            parts.append(_group(f'Устройства памяти / DIMM{i}'))
+            parts += [_row('Имя модуля', module.get('name', 'Kingston 99U5471-052.A00LF')), _row('Размер', module.get('size', '4 ГБ')),
+                      _row('Производитель', module.get('manufacturer', 'Kingston')), _row('Скорость памяти', module.get('speed', '1600 MT/s'))]
+            parts += [_row(label, value) for label, value in SPD_FILLER_ROWS]
+        parts.append('</TABLE>\n')
+
+    if padding_bytes: parts.append(build_padding(padding_bytes // 3, anchor='programs', title='Установленные программы'))
+
+    if smart_drives is not None:
+        parts.append('<A NAME="smart"></A>\n<TABLE>\n')
+        for drive_name, attributes in smart_drives:
+            parts.append(f'<TR><TD CLASS=dt COLSPAN=7>[ {drive_name} ]</TR>\n')
+            parts.append('<TR><TD>ID<TD>Описание атрибута<TD>Порог<TD>Значение<TD>Наихудшее<TD>Данные<TD>Статус</TR>\n')
+            for attr in attributes:
+                parts.append('<TR>' + ''.join(f'<TD>{cell}' for cell in attr) + '<TD>OK: Значение нормальное</TR>\n')
+        parts.append('</TABLE>\n')
+
+    if padding_bytes: parts.append(build_padding(padding_bytes - padding_bytes // 3))
+
+    parts.append('<A NAME="bios"></A>\n<TABLE>\n' + _group('Свойства BIOS') + _row('Тип BIOS', 'AMI')
+                 + _row('Дата BIOS системы', bios_date) + '</TABLE>\n')
+    parts.append('</BODY></HTML>\n')
+    return ''.join(parts)
+
+def write_report(directory, filename, **options):
+    """Пишет отчет в windows-1251, как это делает AIDA64, и возвращает путь к файлу."""
+    path = os.path.join(directory, filename)
+    with open(path, 'w', encoding='windows-1251') as f: f.write(build_report(**options))
+    return path
+
+def write_report_of_size(directory, filename, size_bytes, **options):
+    """Пишет отчет, добитый балластом примерно до size_bytes байт."""
+    base_size = len(build_report(**options))
+    return write_report(directory, filename, padding_bytes=max(0, size_bytes - base_size), **options)
@@ -0,0 +1,102 @@
+# tests/test_batch_classifier.py
+import time
+import random
+import sqlite3
+
+import pytest
+
+from logic import database_handler
+from logic.analyzer import analysis_fields
+from logic.batch_classifier import reclassify_fleet, RESULT_KEYS
+from logic.derived_fields import compute_derived_fields, compute_smart_fields
+from logic.ingest import analyze_report
+from logic.parser import apply_smart_classification
+from logic.snapshot import decode_snapshot, reanalyze_snapshot, RAW_DATA_KEY
+from tests.report_factory import write_report, DEFAULT_HDD, DEFAULT_SSD
+
+WORN_HDD = ('ST500DM002-1BD142 (Z3T1ABCD)', [('05', 'Reallocated Sector Count', '36', '100', '100', '12'),
+                                              ('C5', 'Current Pending Sector', '0', '100', '100', '0')])
+TIRED_SSD = ('Kingston SNV2S500G (50026B768)', [('3', 'Available Spare', '10', '100', '100', '7')])
+
+COMPARED_KEYS = RESULT_KEYS + ('SMART Статус',)
+
+def stored_results():
+    conn = sqlite3.connect(database_handler.DB_NAME); conn.row_factory = sqlite3.Row
+    key_map = {database_handler.sanitize_col_name(key): key for key in COMPARED_KEYS}
+    rows = conn.execute(f'SELECT "Имя_файла", {", ".join(f"{chr(34)}{c}{chr(34)}" for c in key_map)} FROM computers').fetchall(); conn.close()
+    return {row['Имя_файла']: {key_map[c]: row[c] for c in key_map} for row in rows}
+
+def snapshot_rows():
+    """Текущие значения записей и их снимки отчетов — для построчной переоценки."""
+    conn = database_handler.get_db_connection()
+    blobs = dict(conn.execute(f'SELECT "Имя_файла", "{database_handler.sanitize_col_name(RAW_DATA_KEY)}" FROM computers').fetchall())
+    return [(row, decode_snapshot(blobs[row['Имя файла']])) for row in database_handler.fetch_all_data_from_db()]
+
+def test_batch_matches_scalar_reanalysis_of_snapshots(tmp_path, temp_db, make_config):
+    """Тест: пакетная переоценка по колонкам БД дает то же, что построчная переоценка по снимкам отчетов."""
+    config = make_config('lxml')
+    reports = [write_report(tmp_path, 'ok.htm'),
+               write_report(tmp_path, 'worn.htm', smart_drives=[WORN_HDD, TIRED_SSD], ram_total='4096 МБ', bios_date='01/05/10'),
+               write_report(tmp_path, 'old.htm', socket='1 LGA775', os_name='Microsoft Windows 7 Ultimate', smart_drives=None,
+                            disks=('ST500DM002-1BD142  (500 ГБ, 7200 RPM, SATA-III)',), gpu='Microsoft Basic Display Adapter'),
+               write_report(tmp_path, 'nvme.htm', smart_drives=[DEFAULT_HDD, DEFAULT_SSD, TIRED_SSD], ram_total='2048 МБ')]
+    database_handler.save_data_to_db([analyze_report(path, config, lambda *args: None) for path in reports])
+    database_handler.update_single_field_in_db('ok.htm', 'Объем ОЗУ', '6144 МБ')
+
+    for section, key, value in [('SMART', 'hdd_crc_error_warn_count', '50'), ('SMART', 'ssd_available_spare_warn_percent', '5'),
+                                ('SMART', 'ssd_available_spare_critical_percent', '8'), ('Analysis', 'ram_critical_gb', '1.5')]:
+        config.read_dict({section: {key: value}})
+        reclassify_fleet(config)
+        stored = stored_results()
+        for row, snapshot in snapshot_rows():
+            expected = reanalyze_snapshot(snapshot, config, row)
+            assert stored[row['Имя файла']] == {key: str(expected[key]) if key == 'category' else expected[key] for key in COMPARED_KEYS}, (key, row['Имя файла'])
+    assert reclassify_fleet(config) == (4, 0)
+
+def random_record(rng, i, config):
+    """Случайная запись в том виде, в каком ее сохраняет разбор, и диски SMART для построчной переоценки."""
+    drives = None if rng.random() < 0.2 else [
+        (rng.choice(['WDC WD10EZEX', 'Samsung SSD 860', 'Kingston SNV2S', 'ST1000DM003']),
+         [(rng.choice(['05', 'C5', 'C6', '3', '09']), rng.choice(['0', '1', '7', '12', '40', '100'])) for _ in range(rng.randint(0, 4))])
+        for _ in range(rng.randint(0, 3))]
+    data = {'Имя файла': f'pc-{i:06d}.htm', 'ОС': rng.choice(['Microsoft Windows 7 Professional', 'Microsoft Windows 10 Pro', '']),
+            'Сокет': rng.choice(['1 LGA775', '1 AM4', '', '1 LGA1156', '1 AM2+']), 'Объем ОЗУ': rng.choice(['2048 МБ', '4096 МБ', '6144 МБ', '16 ГБ', '']),
+            'Дисковые накопители': rng.choice(['WDC WD10EZEX', 'Samsung SSD 860', 'Не найдено']), 'Свободно слотов ОЗУ': rng.randint(0, 2),
+            'Видеоадаптер': rng.choice(['Microsoft Basic Display Adapter', 'NVIDIA GeForce GT 710']),
+            'Дата BIOS': rng.choice(['04/23/2019', '01/05/10', '', '12/31/2023']), 'internal_smart_status': 'NOT_FOUND', 'SMART Статус': 'Не найден'}
+    if drives is not None: apply_smart_classification(data, drives, config); data.pop('_smart_drives')
+    data.update(compute_derived_fields(data)); data.update(compute_smart_fields(drives))
+    data.update(analysis_fields(data, config))
+    return data, drives
+
+def test_batch_matches_scalar_on_random_fleet(temp_db, make_config):
+    """Тест: на случайном парке пакетная переоценка совпадает с построчной (SMART заново по дискам + analysis_fields)."""
+    rng, config = random.Random(7), make_config('lxml')
+    fleet = [random_record(rng, i, config) for i in range(600)]
+    database_handler.save_data_to_db([data for data, _ in fleet])
+    config.set('SMART', 'hdd_crc_error_warn_count', '30'); config.set('SMART', 'ssd_available_spare_warn_percent', '20')
+    config.read_dict({'Analysis': {'ram_upgrade_gb': '15.8'}})
+    _, changed = reclassify_fleet(config)
+    assert changed > 0
+
+    stored = stored_results()
+    for data, drives in fleet:
+        expected = dict(data)
+        if drives is not None: apply_smart_classification(expected, drives, config)
+        expected.update(analysis_fields(expected, config))
+        assert stored[data['Имя файла']] == {key: str(expected[key]) if key == 'category' else expected[key] for key in COMPARED_KEYS}, data
+
+@pytest.mark.benchmark
+def test_reclassify_50k_rows_speed(temp_db, check_budget, make_config):
+    """Замер: пакетная переоценка 50 тыс. записей после смены порога ОЗУ, которая переписывает каждую пятую запись."""
+    rng, config = random.Random(1), make_config('lxml')
+    template = [random_record(rng, i, config)[0] for i in range(500)]
+    database_handler.save_data_to_db([dict(template[i % 500], **{'Имя файла': f'pc-{i:06d}.htm'}) for i in range(50000)])
+    assert reclassify_fleet(config) == (50000, 0)
+
+    config.read_dict({'Analysis': {'ram_critical_gb': '5.0'}})
+    started = time.perf_counter(); total, changed = reclassify_fleet(config); seconds = time.perf_counter() - started
+    assert total == 50000 and changed > 10000
+    stats = database_handler.fetch_fleet_stats()
+    assert stats.total == 50000 and sum(stats.categories.values()) == 50000
+    check_budget("reclassify_fleet/50k", seconds)
@@ -0,0 +1,143 @@
+# tests/test_database_handler.py
+import sqlite3
+import threading
+from datetime import date
+
+import pytest
+
+from logic import database_handler
+
+def test_connection_is_reused_per_thread_in_wal_mode(temp_db):
+    """Тест: в одном потоке соединение одно и настроено прагмами, в другом потоке — свое."""
+    conn = database_handler.get_db_connection()
+    assert database_handler.get_db_connection() is conn
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+
+    other = []
+    thread = threading.Thread(target=lambda: (other.append(database_handler.get_db_connection()), database_handler.close_db_connection()))
+    thread.start(); thread.join()
+    assert other[0] is not conn
+
+def test_transaction_rolls_back_and_nests(temp_db):
+    """Тест: исключение откатывает всю транзакцию, включая вложенные вызовы функций модуля."""
+    with pytest.raises(RuntimeError):
+        with database_handler.transaction():
+            database_handler.save_data_to_db([{'Имя файла': 'a.htm', 'ОС': 'Windows 10'}])
+            raise RuntimeError
+    assert database_handler.fetch_all_data_from_db() == []
+
+    with database_handler.transaction():
+        database_handler.save_data_to_db([{'Имя файла': 'a.htm', 'ОС': 'Windows 10'}])
+        assert database_handler.update_single_field_in_db('a.htm', 'ОС', 'Windows 11')
+    conn = sqlite3.connect(temp_db)
+    assert conn.execute('SELECT "ОС" FROM computers').fetchall() == [('Windows 11',)]; conn.close()
+
+def test_batch_writer_flushes_chunks_with_manifest(temp_db):
+    """Тест: записи и их манифест уходят в БД каждые batch_size записей; при выходе дописывается остаток."""
+    database_handler.save_quarantine([('pc-1.htm', 1, 1, 'old', 'Лимит времени')])
+    with pytest.raises(RuntimeError):
+        with database_handler.ReportBatchWriter(batch_size=2) as writer:
+            for i in range(5):
+                writer.add({'Имя файла': f'pc-{i}.htm', 'ОС': 'Windows 10', 'ram_gb': 8.0}, (f'pc-{i}.htm', 100 + i, i, f'hash-{i}'))
+                if i == 1: assert len(database_handler.fetch_all_data_from_db()) == 2  # первая пачка уже в базе
+            raise RuntimeError  # сбой посреди разбора
+    assert writer.written == 5
+    assert sorted(row['Имя файла'] for row in database_handler.fetch_all_data_from_db()) == [f'pc-{i}.htm' for i in range(5)]
+    conn = sqlite3.connect(temp_db)
+    assert conn.execute('SELECT count(*) FROM report_manifest').fetchone()[0] == 5
+    assert conn.execute('SELECT count(*), typeof(ram_gb) FROM computers').fetchone() == (5, 'real')
+    conn.close()
+    assert database_handler.fetch_quarantine() == {}
+
+def test_paged_queries_use_natural_order_and_indexes(temp_db):
+    """Тест: выборки сортируются в естественном порядке самой БД, фильтруются и листаются; поиск по MAC идет по индексу."""
+    database_handler.save_data_to_db([{'Имя файла': f'pc{i}.htm', 'Название ПК': f'PC-{i}', 'category': 1 + i % 3,
+                                       'MAC-адрес': f'aa:bb:cc:dd:ee:{i:02x}'} for i in (10, 2, 1, 33, 3)])
+    assert [row['Имя файла'] for row in database_handler.fetch_all_data_from_db()] == ['pc1.htm', 'pc2.htm', 'pc3.htm', 'pc10.htm', 'pc33.htm']
+    page = database_handler.fetch_page({'category': [2, 3]}, order='-Название ПК', offset=1, limit=2)
+    assert [row['Имя файла'] for row in page] == ['pc10.htm', 'pc1.htm'] and all(isinstance(row['category'], int) for row in page)
+    assert database_handler.fetch_one('pc3.htm')['Название ПК'] == 'PC-3' and database_handler.fetch_one('nope.htm') is None
+    assert [row['Имя файла'] for row in database_handler.fetch_by_mac('AA-BB-CC-DD-EE-21')] == ['pc33.htm']
+    assert 'sort_key' not in page[0] and page[0]['last_updated']
+    with pytest.raises(ValueError): database_handler.fetch_page(order='DROP TABLE computers')
+
+    conn = database_handler.get_db_connection()
+    plan = ' '.join(row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN SELECT 1 FROM computers WHERE {database_handler.MAC_EXPRESSION} = ?', ('X',)))
+    assert 'idx_computers_mac' in plan
+
+def test_legacy_search_index_is_dropped(temp_db):
+    """Тест: полнотекстовый индекс прежних версий и его триггеры удаляются при открытии базы, запись идет без них."""
+    conn = database_handler.get_db_connection()
+    conn.execute('CREATE VIRTUAL TABLE computers_fts USING fts5("Название_ПК", content=\'computers\', content_rowid=\'rowid\')')
+    conn.execute("CREATE TRIGGER computers_fts_ai AFTER INSERT ON computers BEGIN "
+                 "INSERT INTO computers_fts (rowid, \"Название_ПК\") VALUES (new.rowid, new.\"Название_ПК\"); END")
+    conn.commit()
+    database_handler.initialize_db()
+    assert not conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'computers_fts%'").fetchall()
+    database_handler.save_data_to_db([{'Имя файла': 'pc1.htm', 'Название ПК': 'BUH-01'}])
+    assert database_handler.fetch_one('pc1.htm')['Название ПК'] == 'BUH-01'
+
+def test_fleet_stats_follow_every_kind_of_write(temp_db):
+    """Тест: сводка по парку ведется триггерами при вставке, замене, правке и удалении и совпадает с пересчетом с нуля."""
+    database_handler.save_data_to_db([{'Имя файла': f'pc{i}.htm', 'category': 1 + i % 3, 'problem_codes': '3,6' if i % 2 else '6',
+                                       'bios_date': '2015-01-15' if i < 4 else None} for i in range(6)])
+    stats = database_handler.fetch_fleet_stats()
+    assert stats.total == 6 and stats.categories == {1: 2, 2: 2, 3: 2} and stats.problem_counts == {6: 6, 3: 3}
+
+    database_handler.save_data_to_db([{'Имя файла': 'pc0.htm', 'category': 2, 'problem_codes': ''}])  # замена записи
+    assert database_handler.update_single_field_in_db('pc1.htm', 'category', 1)
+    database_handler.update_single_field_in_db('pc2.htm', 'Дата BIOS', '06/01/2020')  # bios_date пересчитывается
+    with database_handler.transaction() as conn: conn.execute('DELETE FROM computers WHERE "Имя_файла" = ?', ('pc5.htm',))
+    stats = database_handler.fetch_fleet_stats(today=date(2025, 1, 15))
+    assert stats.total == 5 and stats.categories == {1: 2, 2: 2, 3: 1} and stats.problem_counts == {6: 4, 3: 2}
+
+    ages = [(date(2025, 1, 15) - date.fromisoformat(row['bios_date'])).days for row in database_handler.fetch_all_data_from_db() if row['bios_date']]
+    assert len(ages) == 3 and stats.average_bios_age_years == round(sum(ages) / len(ages) / 365.25, 1)
+
+    conn = database_handler.get_db_connection()
+    plan = ' '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN SELECT 1 FROM computers WHERE "category" IS NOT NULL ORDER BY "category", "sort_key" LIMIT 5'))
+    assert 'idx_computers_category_rank' in plan and 'TEMP B-TREE' not in plan
+    assert [row['Имя файла'] for row in database_handler.fetch_priority_pcs(3)] == ['pc1.htm', 'pc3.htm', 'pc0.htm']
+    conn.execute('DROP TABLE fleet_problem_counts')
+    assert database_handler.fetch_fleet_stats() is None
+
+def test_problem_findings_table_follows_writes(temp_db):
+    """Тест: таблица находок повторяет problem_findings (или коды без параметров) при вставке, замене, переоценке и удалении; выборки идут по индексу."""
+    database_handler.save_data_to_db([{'Имя файла': 'pc1.htm', 'category': 2, 'problem_codes': '5,6', 'problem_findings': '[[5,6.0],[6,null]]'},
+                                      {'Имя файла': 'pc2.htm', 'category': 2, 'problem_codes': '4,6'},  # запись без находок — по кодам
+                                      {'Имя файла': 'pc3.htm', 'category': 3, 'problem_codes': '', 'problem_findings': '[]'}])
+    conn = database_handler.get_db_connection()
+    assert [tuple(row) for row in conn.execute('SELECT filename, code, value FROM problems ORDER BY filename, code')] == [
+        ('pc1.htm', 5, 6.0), ('pc1.htm', 6, None), ('pc2.htm', 4, None), ('pc2.htm', 6, None)]
+    assert database_handler.filenames_with_problems([6]) == {'pc1.htm', 'pc2.htm'} and database_handler.filenames_with_problems([4, 5]) == {'pc1.htm', 'pc2.htm'}
+
+    database_handler.save_data_to_db([{'Имя файла': 'pc1.htm', 'category': 2, 'problem_codes': '4', 'problem_findings': '[[4,null]]'}])  # замена записи
+    with database_handler.transaction() as conn:
+        conn.execute('UPDATE computers SET "category" = 2, "problem_codes" = \'8\', "problem_findings" = \'[[8,5]]\' WHERE "Имя_файла" = ?', ('pc3.htm',))  # переоценка
+        conn.execute('DELETE FROM computers WHERE "Имя_файла" = ?', ('pc2.htm',))
+    assert [tuple(row) for row in conn.execute('SELECT filename, code, value FROM problems ORDER BY filename')] == [('pc1.htm', 4, None), ('pc3.htm', 8, 5)]
+    assert [row['Имя файла'] for row in database_handler.fetch_page({database_handler.PROBLEM_FILTER_KEY: [4, 8], 'category': 2})] == ['pc1.htm', 'pc3.htm']
+    assert database_handler.filenames_with_problems([6]) == set()
+
+    plan = ' '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN SELECT DISTINCT filename FROM problems WHERE code IN (?, ?)', (4, 8)))
+    assert 'idx_problems_code' in plan
+
+def test_bulk_update_keeps_stats_and_findings(temp_db):
+    """Тест: массовая правка пишет значения и выражения одним UPDATE, сводка и находки сходятся с пересчетом, триггеры возвращаются."""
+    database_handler.save_data_to_db([{'Имя файла': f'pc{i}.htm', 'category': 2, 'problem_codes': '4', 'problem_findings': '[[4,2.0]]',
+                                       'bios_date': '2015-01-15', 'Название ПК': f'PC-{i}'} for i in range(4)])
+    with database_handler.transaction() as conn:
+        updated = database_handler.update_records(conn, ('category', 'problem_codes', 'problem_findings'),
+                                                  [(1, '5', '[[5,3.0]]', 'pc1.htm'), (3, '', '[]', 'pc2.htm')],
+                                                  {'category': 'new."category"', 'problem_codes': 'new."problem_codes"', 'problem_findings': 'new."problem_findings"',
+                                                   'Название ПК': 'computers."Название_ПК" || \'!\''})
+    assert updated == 2 and [row['Название ПК'] for row in database_handler.fetch_all_data_from_db()] == ['PC-0', 'PC-1!', 'PC-2!', 'PC-3']
+    stats = database_handler.fetch_fleet_stats()
+    assert stats.total == 4 and stats.categories == {1: 1, 2: 2, 3: 1} and stats.problem_counts == {4: 2, 5: 1}
+    conn = database_handler.get_db_connection()
+    assert [tuple(row) for row in conn.execute('SELECT filename, code, value FROM problems ORDER BY filename')] == [
+        ('pc0.htm', 4, 2.0), ('pc1.htm', 5, 3.0), ('pc3.htm', 4, 2.0)]
+    assert {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")} >= {'fleet_stats_au', 'problems_au'}
+    database_handler.update_single_field_in_db('pc0.htm', 'problem_codes', '6')  # построчная правка снова ведется триггерами
+    assert database_handler.fetch_fleet_stats().problem_counts == {4: 1, 5: 1, 6: 1}
@@ -0,0 +1,76 @@
+# tests/test_db_writer.py
+import threading
+
+import pytest
+
+from logic import database_handler
+from logic.db_writer import DbWriter, _FieldUpdate, _Call
+
+@pytest.fixture
+def writer(temp_db):
+    database_handler.save_data_to_db([{'Имя файла': f'pc{i}.htm', 'ОС': 'Windows 10', 'Объем ОЗУ': '4096 МБ'} for i in range(20)])
+    writer = DbWriter().start()
+    yield writer
+    writer.stop()
+
+def test_edits_from_many_threads_are_written_by_one_writer(writer):
+    """Тест: правки из нескольких потоков одновременно проходят через очередь без ошибок блокировки, последняя правка побеждает."""
+    def edit(thread_index):
+        for round_index in range(50):
+            for i in range(thread_index, 20, 4): writer.update_field(f'pc{i}.htm', 'Локальный IP', f'10.0.{round_index}.{i}')
+    threads = [threading.Thread(target=edit, args=(index,)) for index in range(4)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert writer.update_field('pc0.htm', 'Объем ОЗУ', '8192 МБ').result(timeout=10) is True
+    assert writer.update_field('missing.htm', 'ОС', 'x').result(timeout=10) is False
+
+    rows = {row['Имя файла']: row for row in database_handler.fetch_all_data_from_db()}
+    assert all(rows[f'pc{i}.htm']['Локальный IP'] == f'10.0.49.{i}' for i in range(20))
+    assert rows['pc0.htm']['ram_gb'] == 8.0  # производные поля пересчитаны и при записи через очередь
+
+def test_consecutive_edits_of_one_row_are_coalesced():
+    """Тест: подряд идущие правки одной записи сливаются, а команда между ними слияние прерывает."""
+    first, second, call, third = _FieldUpdate('a', {'ОС': '7'}), _FieldUpdate('a', {'ОС': '10', 'Сокет': 'AM4'}), _Call(print, (), {}), _FieldUpdate('a', {'ОС': '11'})
+    commands = DbWriter._coalesce([first, _FieldUpdate('b', {'ОС': 'x'}), second, call, third])
+    assert [type(command) for command in commands] == [_FieldUpdate, _FieldUpdate, _Call, _FieldUpdate]
+    assert commands[0].fields == {'ОС': '10', 'Сокет': 'AM4'} and len(commands[0].futures) == 2 and commands[3] is third
+
+def test_failed_command_does_not_lose_the_rest_of_the_group(writer):
+    """Тест: ошибка одной команды откатывает группу, остальные команды группы выполняются по одной."""
+    blocker = threading.Event()
+    writer.call(blocker.wait)  # пока пишущий поток ждет, следующие команды копятся в одну группу
+    before = writer.update_field('pc1.htm', 'ОС', 'Windows 11')
+    broken = writer.call(lambda: database_handler.get_db_connection().execute('INSERT INTO no_such_table VALUES (1)'))
+    after = writer.update_field('pc2.htm', 'ОС', 'Windows 11')
+    blocker.set()
+    assert before.result(timeout=10) is True and after.result(timeout=10) is True
+    with pytest.raises(database_handler.sqlite3.OperationalError): broken.result(timeout=10)
+
+def test_failed_batch_inside_group_leaves_no_partial_rows(writer, monkeypatch):
+    """Тест: пачка, упавшая на середине внутри групповой транзакции, откатывает свои записи (SAVEPOINT), а соседние команды группы сохраняются."""
+    def broken_manifest(conn, entries):
+        if any(entry[0] == 'bad1.htm' for entry in entries): raise database_handler.sqlite3.OperationalError('disk I/O error')
+        original_manifest(conn, entries)
+    original_manifest = database_handler._write_manifest
+    monkeypatch.setattr(database_handler, '_write_manifest', broken_manifest)
+    blocker = threading.Event()
+    writer.call(blocker.wait)
+    good = writer.call(database_handler.write_report_batch, [{'Имя файла': 'good.htm'}], [('good.htm', 1, 1, 'h1')])
+    bad = writer.call(database_handler.write_report_batch, [{'Имя файла': 'bad0.htm'}, {'Имя файла': 'bad1.htm'}], [('bad0.htm', 1, 1, 'h2'), ('bad1.htm', 1, 1, 'h3')])
+    edit = writer.update_field('pc3.htm', 'ОС', 'Windows 11')
+    blocker.set()
+    assert good.result(timeout=10) == 1 and bad.result(timeout=10) == 0 and edit.result(timeout=10) is True
+    filenames = {row['Имя файла'] for row in database_handler.fetch_all_data_from_db()}
+    assert 'good.htm' in filenames and not filenames & {'bad0.htm', 'bad1.htm'}
+    manifest = database_handler.get_db_connection().execute(f'SELECT filename FROM {database_handler.MANIFEST_TABLE_NAME}').fetchall()
+    assert [row[0] for row in manifest] == ['good.htm']
+    assert database_handler.fetch_one('pc3.htm')['ОС'] == 'Windows 11'
+
+def test_nested_transaction_rolls_back_to_its_savepoint(writer):
+    """Тест: исключение во вложенной транзакции откатывает только ее записи."""
+    writer.stop()
+    with database_handler.transaction() as conn:
+        database_handler.update_fields(conn, 'pc0.htm', {'ОС': 'outer'})
+        with pytest.raises(ValueError), database_handler.transaction() as inner:
+            database_handler.update_fields(inner, 'pc1.htm', {'ОС': 'inner'}); raise ValueError
+    assert database_handler.fetch_one('pc0.htm')['ОС'] == 'outer' and database_handler.fetch_one('pc1.htm')['ОС'] == 'Windows 10'
@@ -0,0 +1,32 @@
+# tests/test_derived_fields.py
+import sqlite3
+
+from logic import database_handler
+from logic.ingest import analyze_report
+from tests.report_factory import write_report
+
+def test_typed_columns_are_stored_at_ingest(tmp_path, temp_db, make_config):
+    """Тест: типизированные поля считаются при разборе и лежат в БД своими типами."""
+    parsed = analyze_report(write_report(tmp_path, 'pc.htm', ram_total='4096 МБ'), make_config('lxml'), lambda *args: None)
+    assert parsed['ram_gb'] == 4.0 and parsed['has_ssd'] == 1 and parsed['is_win7'] == 0
+    database_handler.save_data_to_db([parsed])
+
+    conn = sqlite3.connect(database_handler.DB_NAME)
+    row = conn.execute('SELECT typeof(ram_gb), typeof(has_ssd), typeof(free_slots), bios_date FROM computers').fetchone(); conn.close()
+    assert row[:3] == ('real', 'integer', 'integer') and row[3] == parsed['bios_date']
+
+def test_old_rows_are_backfilled_and_edits_recompute(tmp_path, monkeypatch):
+    """Тест: записи из старой БД без типизированных колонок досчитываются, правка ячейки пересчитывает их."""
+    db_path = str(tmp_path / 'old.db')
+    monkeypatch.setattr(database_handler, 'DB_NAME', db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE computers ("Имя_файла" TEXT PRIMARY KEY, "ОС" TEXT, "Объем_ОЗУ" TEXT, "Дата_BIOS" TEXT, "Дисковые_накопители" TEXT, "Свободно_слотов_ОЗУ" TEXT)')
+    conn.execute('INSERT INTO computers VALUES (?, ?, ?, ?, ?, ?)', ('old.htm', 'Microsoft Windows 7 Professional', '2048 МБ', '03/15/09', 'WDC WD5000AAKX', '2'))
+    conn.commit(); conn.close()
+
+    database_handler.initialize_db()
+    [row] = database_handler.fetch_all_data_from_db()
+    assert (row['ram_gb'], row['bios_date'], row['has_ssd'], row['is_win7'], row['free_slots']) == (2.0, '2009-03-15', 0, 1, 2)
+
+    assert database_handler.update_single_field_in_db('old.htm', 'Дисковые накопители', 'Samsung SSD 870 EVO')
+    assert database_handler.fetch_all_data_from_db()[0]['has_ssd'] == 1
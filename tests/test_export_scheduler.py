@@ -0,0 +1,81 @@
+# tests/test_export_scheduler.py
+import os
+import time
+import tracemalloc
+
+import pytest
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+from PySide6.QtCore import QCoreApplication
+
+from logic import database_handler, exporters
+from logic.excel_handler import FINAL_HEADERS, write_to_excel
+from logic.export_scheduler import ExportScheduler
+
+@pytest.fixture
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+@pytest.fixture
+def fleet_db(temp_db):
+    database_handler.save_data_to_db([{'Имя файла': f'pc{i}.htm', 'Название ПК': f'PC-{i}', 'category': 1 + i % 3, 'problems': 'Проблема: Отсутствует SSD'} for i in range(30)])
+    return temp_db
+
+def wait_until(app, condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline: app.processEvents(); time.sleep(0.01)
+    return condition()
+
+def test_write_to_excel_is_atomic_and_cancellable(tmp_path, fleet_db):
+    """Тест: отмененный экспорт не трогает прежний файл, удачный подменяет его без временных файлов рядом."""
+    target = tmp_path / 'out.xlsx'; target.write_bytes(b'old')
+    data, logs = database_handler.fetch_all_data_from_db(), []
+    assert write_to_excel(data, str(target), lambda *args: logs.append(args), lambda: False) is False
+    assert target.read_bytes() == b'old'
+    assert write_to_excel(data, str(target), lambda *args: logs.append(args)) is True
+    assert target.read_bytes()[:2] == b'PK'
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('~export-')]
+
+def test_streamed_export_keeps_memory_flat(tmp_path, fleet_db):
+    """Тест: экспорт прямо с курсора БД дает полную книгу с именованными стилями, а пик памяти не растет с числом записей."""
+    def export_peak(count):
+        database_handler.save_data_to_db([{'Имя файла': f'pc{i}.htm', 'Название ПК': f'PC-{i}', 'category': 1 + i % 3, 'internal_smart_status': 'BAD' if i == 1 else 'OK',
+                                           'problems': 'Проблема: Отсутствует SSD'} for i in range(count)])
+        tracemalloc.start()
+        try: assert write_to_excel(database_handler.StreamedRows(), str(tmp_path / 'out.xlsx'), lambda *args: None) is True; return tracemalloc.get_traced_memory()[1]
+        finally: tracemalloc.stop()
+    small, large = export_peak(1000), export_peak(3000)
+    assert large < small * 1.25  # со списком в памяти пик рос бы втрое
+
+    wb = load_workbook(tmp_path / 'out.xlsx'); ws = wb['Все данные']
+    assert ws.max_row == 3001 and ws['A2'].value == 'PC-0' and ws['A11'].value == 'PC-9' and ws.freeze_panes == 'A2'
+    assert {'header', 'row_cat1', 'row_cat2_smart_bad'} <= set(wb.named_styles)
+    assert ws['A2'].style == 'row_cat1' and ws['A3'].fill.fgColor.rgb == '00FFEB9C'
+    filename_column = get_column_letter(FINAL_HEADERS.index('Имя файла') + 1)
+    assert ws.column_dimensions['A'].width == len('Название ПК') + 2 and ws.column_dimensions[filename_column].width == len('pc2999.htm') + 2
+    assert wb['Дашборд']['B5'].value == 3000 and 'B4:C4' in wb['Дашборд'].merged_cells
+    assert wb['Рекомендации'].max_row == 2 + 1000 + 1 + 2 + 1000
+
+def test_bursts_of_changes_give_one_export_and_supersede_running_one(app, tmp_path, fleet_db, monkeypatch, make_config):
+    """Тест: серия пометок дает один экспорт после паузы; пометка во время экспорта прерывает его и запускает новый."""
+    calls = []
+    def fake_write(filename, log_emitter, should_continue):
+        calls.append('started')
+        if len(calls) == 2:  # второй экспорт ждет, пока его не прервут
+            while should_continue(): time.sleep(0.01)
+            calls.append('cancelled'); return False
+        return True
+    monkeypatch.setitem(exporters.EXPORTERS, 'xlsx', fake_write)
+    config = make_config('lxml'); config.set('Settings', 'output_filename', str(tmp_path / 'out.xlsx'))
+    scheduler, exported = ExportScheduler(config, quiet_ms=50), []
+    scheduler.exported.connect(exported.append)
+
+    for _ in range(10): scheduler.mark_dirty()
+    assert wait_until(app, lambda: exported) and calls == ['started']
+
+    scheduler.mark_dirty()
+    assert wait_until(app, lambda: scheduler.is_exporting)
+    scheduler.mark_dirty()
+    assert wait_until(app, lambda: len(exported) == 2)
+    assert calls == ['started', 'started', 'cancelled', 'started'] and not scheduler.dirty
+    scheduler.shutdown()
@@ -0,0 +1,71 @@
+# tests/test_exporters.py
+import os
+import csv
+import json
+import sqlite3
+
+import pytest
+from openpyxl import load_workbook
+
+from logic import database_handler, exporters
+from logic.excel_handler import _analysis_values
+from logic.workers import ExportWorker
+
+@pytest.fixture
+def fleet_db(temp_db):
+    database_handler.save_data_to_db([{'Имя файла': f'pc{i}.htm', 'Название ПК': f'ПК-{i}', 'category': 1 + i % 3,
+                                       'problems': 'Проблема: Отсутствует SSD\nОЗУ 4 ГБ', 'problem_codes': '5,6'} for i in (10, 2, 1)])
+    return temp_db
+
+def test_streaming_exporters_write_all_rows_in_natural_order(tmp_path, fleet_db):
+    """Тест: CSV (с BOM и ";") и JSON Lines пишутся с курсора в естественном порядке, снимок SQLite — самодостаточный файл."""
+    logs = []
+    assert exporters.export_csv(str(tmp_path / 'out.csv'), lambda *args: logs.append(args), lambda: True)
+    assert (tmp_path / 'out.csv').read_bytes()[:3] == b'\xef\xbb\xbf'
+    with open(tmp_path / 'out.csv', encoding='utf-8-sig', newline='') as f: rows = list(csv.DictReader(f, delimiter=';'))
+    assert [row['Имя файла'] for row in rows] == ['pc1.htm', 'pc2.htm', 'pc10.htm'] and rows[0]['problems'] == 'Проблема: Отсутствует SSD\nОЗУ 4 ГБ'
+    assert 'sort_key' not in rows[0] and database_handler.RAW_DATA_KEY not in rows[0]
+
+    assert exporters.export_jsonl(str(tmp_path / 'out.jsonl'), lambda *args: logs.append(args), lambda: True)
+    with open(tmp_path / 'out.jsonl', encoding='utf-8') as f: records = [json.loads(line) for line in f]
+    assert [record['Название ПК'] for record in records] == ['ПК-1', 'ПК-2', 'ПК-10'] and records[0]['category'] == 2
+
+    assert exporters.export_sqlite(str(tmp_path / 'out.sqlite'), lambda *args: logs.append(args), lambda: True)
+    assert not os.path.exists(tmp_path / 'out.sqlite-wal')
+    conn = sqlite3.connect(f'file:{tmp_path / "out.sqlite"}?mode=ro', uri=True)
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'delete' and conn.execute('SELECT count(*) FROM computers').fetchone()[0] == 3
+    conn.close()
+
+    assert exporters.export_xlsx(str(tmp_path / 'out.xlsx'), lambda *args: logs.append(args), lambda: True)
+    dashboard = load_workbook(tmp_path / 'out.xlsx')['Дашборд']  # показатели — из сводки в БД
+    assert dashboard['B5'].value == 3 and dashboard['E5'].value == 0 and dashboard['H5'].value == 2 and (dashboard['W2'].value, dashboard['X2'].value) == ('Недостаточно ОЗУ', 3)
+    assert [dashboard.cell(row=row, column=2).value for row in (32, 33, 34)] == ['ПК-1', 'ПК-10', 'ПК-2']
+
+def test_cancelled_export_keeps_previous_file(tmp_path, fleet_db, monkeypatch):
+    """Тест: устаревший экспорт не трогает прежний файл и не оставляет временных файлов."""
+    monkeypatch.setattr(exporters, 'CANCEL_CHECK_ROWS', 1)
+    for export in (exporters.export_csv, exporters.export_jsonl, exporters.export_sqlite):
+        target = tmp_path / 'out.dat'; target.write_bytes(b'old')
+        assert export(str(target), lambda *args: None, lambda: False) is False
+        assert target.read_bytes() == b'old'
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('~export-')]
+
+def test_export_formats_are_selected_in_config(tmp_path, fleet_db, make_config):
+    """Тест: форматы берутся из export_formats по порядку, неизвестные пропускаются; файлы лежат рядом с output_filename."""
+    config = make_config('lxml')
+    assert exporters.get_export_formats(config) == ['xlsx']
+    config.set('Settings', 'export_formats', ' CSV, pdf, .jsonl, csv, sqlite')
+    assert exporters.get_export_formats(config) == ['csv', 'jsonl', 'sqlite']
+
+    config.set('Settings', 'output_filename', str(tmp_path / 'fleet.xlsx'))
+    finished = []
+    worker = ExportWorker(config); worker.finished.connect(finished.append); worker.run()
+    assert finished == [str(tmp_path / 'fleet.csv')]
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith('fleet')) == ['fleet.csv', 'fleet.jsonl', 'fleet.sqlite']
+
+def test_recommendations_follow_problem_codes():
+    """Тест: рекомендации листа анализа берутся по кодам проблем — "Недостаточно ОЗУ" больше не читается как "ОС"."""
+    record = {'Имя файла': 'pc1.htm', 'Название ПК': 'ПК-1', 'problems': 'Проблема: Недостаточно ОЗУ (4.0 ГБ)', 'problem_codes': '5'}
+    assert _analysis_values(record, 2)[3] == "Добавить ОЗУ"
+    assert _analysis_values(dict(record, problem_codes='4,6,8'), 2)[3] == "Обновить BIOS (опционально), Обновить ОС, Установить SSD"
+    assert _analysis_values(dict(record, problem_codes=''), 2)[3] == "Частичный апгрейд"
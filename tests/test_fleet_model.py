@@ -0,0 +1,69 @@
+# tests/test_fleet_model.py
+import pytest
+from PySide6.QtCore import QCoreApplication, Qt
+
+from ui.fleet_model import FleetTableModel, ColumnProjectionModel, RowFilter, FLAG_CRITICAL, FLAG_WIN7, FLAG_SSD
+from utils.constants import HEADERS_MAIN, HEADERS_NETWORK
+
+@pytest.fixture
+def model():
+    QCoreApplication.instance() or QCoreApplication([])
+    model = FleetTableModel()
+    model.load(({'Имя файла': f'pc{i}.htm', 'Название ПК': f'PC-{i}', 'ОС': 'Windows 10', 'Локальный IP': f'10.0.0.{i}', 'category': 3 - i % 3, 'has_ssd': i % 2, 'is_win7': int(i == 4),
+                 '_RAW_DATA': b'x' * 100} for i in range(6)))
+    return model
+
+def test_tabs_project_one_shared_store(model):
+    """Тест: вкладки — проекции одной модели: свои колонки, сортировка по категории, правка видна на обеих вкладках."""
+    main, network = ColumnProjectionModel(model, HEADERS_MAIN), ColumnProjectionModel(model, HEADERS_NETWORK)
+    assert network.column_keys == [None, 'Название ПК', 'Имя файла', 'Локальный IP', 'MAC-адрес', None]
+    assert '_RAW_DATA' not in main.column_keys and main.column_of('Локальный IP') == -1
+    main.sort(main.columnCount() - 1, Qt.AscendingOrder)
+    assert [main.filename_at(row) for row in range(main.rowCount())] == ['pc2.htm', 'pc5.htm', 'pc1.htm', 'pc4.htm', 'pc0.htm', 'pc3.htm']
+    assert main.index(0, main.column_of('MAC-адрес')).data() is None and network.index(0, network.column_of('MAC-адрес')).data() == ''
+    assert model.record('pc1.htm') == {**dict.fromkeys(model._store), 'Имя файла': 'pc1.htm', 'Название ПК': 'PC-1', 'ОС': 'Windows 10', 'Локальный IP': '10.0.0.1', 'category': 2, 'has_ssd': 1, 'is_win7': 0}
+
+    edits = []; model.cell_edited.connect(lambda *args: edits.append(args))
+    assert main.setData(main.index(0, main.column_of('Название ПК')), 'PC-one')
+    assert not main.setData(main.index(0, main.column_of('Имя файла')), 'other.htm')
+    assert not main.index(0, main.column_of('Имя файла')).flags() & Qt.ItemIsEditable
+    assert edits == [('pc2.htm', 'Название ПК', 'PC-one')]
+    row = next(row for row in range(network.rowCount()) if network.filename_at(row) == 'pc2.htm')
+    assert network.index(row, network.column_of('Название ПК')).data() == 'PC-one'
+
+    # Кисти строк одной категории — один и тот же объект, а не новый на каждую ячейку
+    assert model.data(model.index(2, 1), Qt.BackgroundRole) is model.data(model.index(5, 2), Qt.BackgroundRole) is not None
+    model.add_or_update({'Имя файла': 'pc1.htm', 'Название ПК': 'PC-1', 'category': 1}); model.add_or_update({'Имя файла': 'pc9.htm', 'category': 3})
+    assert model.rowCount() == 7 and model.record('pc1.htm')['ОС'] is None
+    assert {main.filename_at(row) for row in range(3)} == {'pc1.htm', 'pc2.htm', 'pc5.htm'}  # сортировка следует за обновлением
+
+def test_filter_uses_precomputed_search_text_and_flags(model):
+    """Тест: фильтр отбирает строки по маске признаков и строке поиска обеих вкладок сразу и пересчитывается после правки."""
+    main, network = ColumnProjectionModel(model, HEADERS_MAIN), ColumnProjectionModel(model, HEADERS_NETWORK)
+    main.sort(main.column_of('Название ПК'), Qt.DescendingOrder)
+    shown = lambda proxy: [proxy.filename_at(row) for row in range(proxy.rowCount())]
+
+    model.set_filter(RowFilter(required=FLAG_CRITICAL, forbidden=FLAG_SSD))
+    assert shown(main) == ['pc2.htm'] and shown(network) == ['pc2.htm']
+    model.set_filter(RowFilter(required=FLAG_WIN7, text='10.0.0.'))
+    assert shown(main) == ['pc4.htm']
+    model.set_filter(RowFilter(text='pc-1'))  # подстрока не склеивает соседние поля: в имени файла "pc1.htm" ее нет
+    assert shown(main) == ['pc1.htm']
+    model.set_filter(RowFilter(text='.htm', key='Название ПК'))
+    assert shown(main) == []
+    # Поиск по всем полям вкладки: IP есть только в колонках сетевой вкладки
+    model.set_filter(RowFilter(text='10.0.0.3', scope=main.search_scope))
+    assert shown(main) == []
+    model.set_filter(RowFilter(text='10.0.0.3', scope=network.search_scope))
+    assert shown(main) == ['pc3.htm'] and shown(network) == ['pc3.htm']
+    model.set_filter(RowFilter(text='c-'))  # подстрока внутри слова, а не только начало слова
+    assert shown(main) == ['pc5.htm', 'pc4.htm', 'pc3.htm', 'pc2.htm', 'pc1.htm', 'pc0.htm']
+
+    model.set_filter(RowFilter(text='windows'))
+    assert shown(main) == ['pc5.htm', 'pc4.htm', 'pc3.htm', 'pc2.htm', 'pc1.htm', 'pc0.htm']
+    main.setData(main.index(1, main.column_of('ОС')), 'Linux')
+    main.setData(main.index(0, main.column_of('Название ПК')), 'PC-0a')
+    assert shown(main) == ['pc3.htm', 'pc2.htm', 'pc1.htm', 'pc5.htm', 'pc0.htm'] and network.rowCount() == 5
+    model.add_or_update({'Имя файла': 'pc9.htm', 'Название ПК': 'PC-9', 'ОС': 'Windows 7', 'is_win7': 1})
+    model.set_filter(RowFilter()); model.update_values('pc9.htm', {'Название ПК': 'PC-00'})
+    assert shown(main) == ['pc4.htm', 'pc3.htm', 'pc2.htm', 'pc1.htm', 'pc5.htm', 'pc9.htm', 'pc0.htm']
@@ -0,0 +1,91 @@
+# tests/test_ingest.py
+import os
+import json
+from datetime import datetime
+
+import pytest
+
+from logic import database_handler
+from logic.ingest import plan_incremental_scan, config_to_dict, analyze_report, get_parse_workers
+from logic.parse_pool import ReportParsePool
+from logic.rules import ProblemCode
+from tests.report_factory import write_report, DEFAULT_SSD
+
+def test_quarantined_report_is_held_until_it_changes(tmp_path):
+    """Тест: отчет из карантина пропускается, пока не изменится, а слишком большой не хешируется и не разбирается."""
+    bad, good = write_report(tmp_path, 'bad.htm'), write_report(tmp_path, 'good.htm')
+    stat = os.stat(bad); quarantine = {'bad.htm': (stat.st_size, stat.st_mtime_ns, None, 'Превышен лимит времени')}
+
+    plan = plan_incremental_scan([bad, good], {}, quarantine=quarantine)
+    assert list(plan.to_parse) == [good] and plan.held == 1
+
+    with open(bad, 'a', encoding='windows-1251') as f: f.write('<!-- исправленный отчет -->')
+    plan = plan_incremental_scan([bad, good], {}, quarantine=quarantine)
+    assert set(plan.to_parse) == {bad, good} and plan.held == 0
+
+    plan = plan_incremental_scan([bad, good], {}, max_size_bytes=os.path.getsize(good) - 1)
+    assert not plan.to_parse and [entry[0] for entry in plan.oversized] == ['bad.htm', 'good.htm'] and plan.oversized[0][3] is None
+
+@pytest.mark.skipif(not hasattr(os, 'mkfifo'), reason="нужен именованный канал (POSIX)")
+def test_parse_pool_kills_report_over_time_budget(tmp_path, make_config):
+    """Тест: зависший отчет (чтение из канала без писателя) прерывается по лимиту, остальные разбираются."""
+    hanging = str(tmp_path / 'hanging.htm'); os.mkfifo(hanging)
+    good = write_report(tmp_path, 'good.htm', pc_name='PC-OK')
+    config = make_config('lxml')
+
+    pool = ReportParsePool(2, config_to_dict(config), timeout_seconds=3)
+    results = {os.path.basename(path): (data, failure) for path, data, _, failure in pool.imap([hanging, good], lambda: True)}
+    assert results['good.htm'][0]['Название ПК'] == 'PC-OK' and results['good.htm'][1] is None
+    assert results['hanging.htm'][0] is None and 'лимит времени' in results['hanging.htm'][1]
+
+def test_parse_pool_reports_unparseable_file(tmp_path, make_config):
+    """Тест: отчет без сводной таблицы возвращается с причиной для карантина, а не молча теряется."""
+    broken = tmp_path / 'broken.htm'; broken.write_text('<html><body>обрезано', encoding='windows-1251')
+    pool = ReportParsePool(1, config_to_dict(make_config('bs4')), timeout_seconds=30)
+    [(path, data, _, failure)] = list(pool.imap([str(broken)], lambda: True))
+    assert data is None and failure
+
+def test_single_worker_parses_in_thread(tmp_path, make_config, monkeypatch):
+    """Тест: parse_workers = 1 — разбор последовательно в вызывающем потоке, без дочерних процессов, с теми же причинами сбоя."""
+    from logic import parse_pool
+    monkeypatch.setattr(parse_pool, '_Slot', None)  # попытка запустить процесс упадет
+    good = write_report(tmp_path, 'good.htm', pc_name='PC-OK')
+    broken = tmp_path / 'broken.htm'; broken.write_text('<html><body>обрезано', encoding='windows-1251')
+    pool = ReportParsePool(1, config_to_dict(make_config('lxml')), timeout_seconds=30)
+    [(_, data, _, failure), (_, broken_data, _, broken_failure)] = list(pool.imap([good, str(broken)], lambda: True))
+    assert data['Название ПК'] == 'PC-OK' and failure is None and broken_data is None and 'не удалось разобрать' in broken_failure
+    assert list(pool.imap([good], lambda: False)) == []
+
+def test_in_thread_parsing_only_when_configured(make_config, monkeypatch):
+    """Тест: parse_workers = 0 на одноядерной машине оставляет пул процессов; в поток анализа разбор уходит только при явной 1."""
+    config = make_config('lxml'); monkeypatch.setattr(os, 'cpu_count', lambda: 1)
+    assert get_parse_workers(config) == 2
+    config.set('Settings', 'parse_workers', '1')
+    assert get_parse_workers(config) == 1
+
+def test_smart_history_keeps_every_report(tmp_path, temp_db, make_config):
+    """Тест: каждый разобранный отчет дописывает показания SMART в историю; по ней одним запросом считается рост по диску."""
+    config = make_config('lxml')
+    worn_hdd = lambda sectors: ('ST500DM002-1BD142 (Z3T1ABCD)', [('05', 'Reallocated Sector Count', '36', '100', '100', str(sectors)),
+                                                                  ('C5', 'Current Pending Sector', '0', '100', '100', '0')])
+    for day, sectors in ((1, 4), (11, 24)):
+        path = write_report(tmp_path, 'pc1.htm', smart_drives=[worn_hdd(sectors), DEFAULT_SSD])
+        report_time = datetime(2025, 3, day, 9, 30).timestamp(); os.utime(path, (report_time, report_time))
+        database_handler.save_data_to_db([analyze_report(path, config, lambda *args: None)])
+    database_handler.save_data_to_db([analyze_report(path, config, lambda *args: None)])  # тот же отчет еще раз — без дублей
+
+    conn = database_handler.get_db_connection()
+    assert conn.execute('SELECT count(*) FROM smart_attributes').fetchone()[0] == 2 * (2 + len(DEFAULT_SSD[1]))
+    assert [tuple(growth) for growth in database_handler.fetch_smart_growth()] == [
+        ('pc1.htm', 'ST500DM002-1BD142 (Z3T1ABCD)', '05', '2025-03-01T09:30:00', '2025-03-11T09:30:00', 4, 24, 2.0)]
+    assert [(reading.raw_value, reading.report_date) for reading in database_handler.fetch_smart_readings_above('05', 0, is_ssd=False)] == [(24, '2025-03-11T09:30:00')]
+    assert [reading.raw_value for reading in database_handler.fetch_smart_readings_above('48', 10, is_ssd=True)] == [12.5]
+    assert database_handler.fetch_smart_readings_above('05', 0, is_ssd=True) == []
+
+    # Находка SMART хранится кодом правила с диском и значением — "ПК с переназначенными секторами" выбираются по индексу кода
+    assert database_handler.filenames_with_problems([ProblemCode.HDD_REALLOCATED_SECTORS]) == {'pc1.htm'}
+    assert [json.loads(row[0]) for row in conn.execute('SELECT value FROM problems WHERE code = ?', (ProblemCode.HDD_REALLOCATED_SECTORS,))] == [
+        {'drive': 'ST500DM002-1BD142 (Z3T1ABCD)', 'value': 24}]
+
+    plan = ' '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN SELECT filename FROM smart_attributes WHERE attr_id = ? AND raw_value > ?', ('05', 0)))
+    assert 'idx_smart_attributes_value' in plan
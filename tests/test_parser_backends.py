@@ -0,0 +1,81 @@
+# tests/test_parser_backends.py
+import pytest
+
+from logic.parser import parse_aida_report
+from tests.report_factory import write_report, DEFAULT_HDD, DEFAULT_SSD, FOUR_SPD_MODULES
+
+REPORT_VARIANTS = {
+    'desktop.htm': {},
+    'no_dimm_rows.htm': {'dimms': (), 'motherboard': 'Gigabyte B75M-D3H', 'ram_total': '',
+                         'spd_modules': [{'size': '4 ГБ'}, {'size': '8 ГБ', 'manufacturer': 'Samsung', 'speed': '2400 MT/s'}]},
+    'bad_hdd.htm': {'smart_drives': [('ST500DM002-1BD142 (Z3T1ABCD)', [('05', 'Reallocated Sector Count', '36', '100', '100', '12'),
+                                                                       ('C5', 'Current Pending Sector', '0', '100', '100', '3')])],
+                    'disks': ('ST500DM002-1BD142  (500 ГБ, 7200 RPM, SATA-III)',)},
+    'worn_ssd.htm': {'smart_drives': [DEFAULT_HDD, ('Kingston SNV2S500G (50026B76)', [('3', 'Available Spare', '10', '5', '5', '5')])]},
+    'adata_and_empty_slots.htm': {'dimms': ('Kingston 99U5471  (4 ГБ DDR3-1600)', 'Пусто'),
+                                  'disks': ('ADATA SC750  (1 ТБ)', 'WDC WD10EZEX  (1 ТБ)'),
+                                  'smart_drives': [('ADATA SC750 (123)', [('05', 'Reallocated', '0', '1', '1', '99')]), DEFAULT_SSD]},
+    'no_smart.htm': {'smart_drives': None, 'os_name': 'Microsoft Windows 7 Professional'},
+}
+
+@pytest.fixture
+def report_paths(tmp_path):
+    return [write_report(tmp_path, filename, pc_name=f'PC-{i}', **options) for i, (filename, options) in enumerate(REPORT_VARIANTS.items())]
+
+def test_backends_return_identical_dicts(report_paths, make_config):
+    """Тест: lxml-бэкенд должен возвращать ровно тот же словарь, что и BeautifulSoup."""
+    bs4_config, lxml_config = make_config('bs4'), make_config('lxml')
+    for path in report_paths:
+        expected = parse_aida_report(path, bs4_config, lambda *args: None)
+        assert expected is not None, path
+        assert parse_aida_report(path, lxml_config, lambda *args: None) == expected, path
+
+def test_backends_agree_on_missing_summary(tmp_path, make_config):
+    """Тест: отчет без сводной таблицы оба бэкенда отбрасывают."""
+    path = tmp_path / 'broken.htm'
+    path.write_text('<html><body><p>Обрезанный отчет</p></body></html>', encoding='windows-1251')
+    for backend in ('bs4', 'lxml'):
+        assert parse_aida_report(str(path), make_config(backend), lambda *args: None) is None
+
+def test_normalized_reports_parse_like_full_reports(report_paths, tmp_path, make_config):
+    """Тест: разбор нормализованного (вырезанного и закэшированного) отчета дает тот же словарь, что и полного."""
+    cache_dir = tmp_path / 'cache'
+    for backend in ('bs4', 'lxml'):
+        full_config, normalized_config = make_config(backend), make_config(backend, normalize=True, cache_dir=cache_dir)
+        for path in report_paths:
+            expected = parse_aida_report(path, full_config, lambda *args: None)
+            assert parse_aida_report(path, normalized_config, lambda *args: None) == expected, (backend, path)
+            # Второй проход читает уже из кэша
+            assert parse_aida_report(path, normalized_config, lambda *args: None) == expected, (backend, path)
+    assert len(list(cache_dir.iterdir())) == len(report_paths)
+
+def test_ram_fallback_parses_spd_sections_from_the_same_soup(tmp_path, monkeypatch, make_config):
+    """
+    Тест: запасной разбор модулей ОЗУ по секциям SPD (в сводке нет строк DIMM) читает уже разобранный документ.
+    Прежняя реализация сериализовала строки и строила новый BeautifulSoup на каждый модуль.
+    """
+    from logic import parser
+    built = []
+    class CountingSoup(parser.BeautifulSoup):
+        def __init__(self, *args, **kwargs): built.append(1); super().__init__(*args, **kwargs)
+    monkeypatch.setattr(parser, 'BeautifulSoup', CountingSoup)
+    data = parse_aida_report(write_report(tmp_path, 'spd_only.htm', spd_modules=FOUR_SPD_MODULES, dimms=()), make_config('bs4'), lambda *args: None)
+    assert data['Кол-во плашек ОЗУ'] == 4 and '8 ГБ Samsung DDR3 2400 MHz' in data['Модели плашек ОЗУ']
+    assert len(built) == 1
+
+def test_label_index_keeps_last_match_semantics():
+    """Тест: при дублях метки побеждает последняя ячейка, метка ищется как подстрока, ссылка в значении разворачивается."""
+    from bs4 import BeautifulSoup
+    from lxml import html as lxml_html
+    from logic import parser, lxml_parser
+    table_html = ('<table><tr><td>Видеоадаптер</td><td>Intel HD</td></tr>'
+                  '<tr><td>Видеоадаптер</td><td><a href="#gpu">NVIDIA GeForce GT 710</a> (2 ГБ)</td></tr>'
+                  '<tr><td>Монитор&nbsp;</td><td>Samsung</td></tr><tr><td>Последняя метка</td></tr>'
+                  '<tr><td>Хвост</td></tr></table>')
+    bs4_index = parser.build_label_index(BeautifulSoup(table_html, 'lxml').find('table'))
+    lxml_index = lxml_parser.build_label_index(lxml_html.document_fromstring(table_html).find('.//table'))
+    for index, find in [(bs4_index, parser.find_value_by_label), (lxml_index, lxml_parser.find_value_by_label)]:
+        assert find(index, 'Видеоадаптер') == 'NVIDIA GeForce GT 710'
+        assert find(index, 'Монит') == 'Samsung'
+        assert find(index, 'Последняя') == 'Хвост'
+        assert find(index, 'Нет такой метки') is None
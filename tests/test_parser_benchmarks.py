@@ -0,0 +1,63 @@
+# tests/test_parser_benchmarks.py
+# Регрессионные замеры парсера. Время никогда не сравнивается в абсолютных секундах: либо с близким
+# по объему эталонным отчетом, либо в "машинных единицах" с эталонами из benchmark_baseline.json
+# (фикстуры best_of, machine_unit и check_budget — в conftest.py).
+#
+# В обычном прогоне pytest замеры пропускаются (см. conftest.py). Переменные окружения:
+#   AIDA_BENCH=1             — запустить замеры (или pytest -m benchmark);
+#   AIDA_BENCH_LARGE=1       — добавить отчеты 5 и 20 МБ (по умолчанию только 100 КБ и 1 МБ);
+#   AIDA_BENCH_TOLERANCE=2.5 — во сколько раз можно превысить эталон, прежде чем тест упадет;
+#   AIDA_BENCH_UPDATE=1      — не проверять, а перезаписать эталоны текущими замерами.
+# Замеры короче MIN_BUDGET_SECONDS (conftest.py) не проваливаются: на таких временах эталон меньше шума таймера и планировщика.
+import os
+import pytest
+from bs4 import BeautifulSoup
+
+from logic.parser import parse_aida_report, find_value_by_label, parse_smart_data_full
+from tests.report_factory import write_report_of_size, DEFAULT_HDD, DEFAULT_SSD, FOUR_SPD_MODULES
+
+pytestmark = pytest.mark.benchmark
+
+RUN_LARGE = os.environ.get('AIDA_BENCH_LARGE') == '1'
+REPORT_SIZES = {'100kb': 100 * 1024, '1mb': 1024 * 1024, '5mb': 5 * 1024 * 1024, '20mb': 20 * 1024 * 1024}
+LARGE_SIZES = {'5mb', '20mb'}
+
+@pytest.fixture(scope='module', params=list(REPORT_SIZES))
+def sized_report(request, tmp_path_factory):
+    """Отчет заданного размера с полным набором разделов: сводка, плата, SPD, SMART (HDD и SSD), BIOS."""
+    if request.param in LARGE_SIZES and not RUN_LARGE: pytest.skip("большие отчеты замеряются только при AIDA_BENCH_LARGE=1")
+    path = write_report_of_size(str(tmp_path_factory.mktemp('bench')), f'report_{request.param}.htm', REPORT_SIZES[request.param],
+                                dimms=(), spd_modules=FOUR_SPD_MODULES, smart_drives=[DEFAULT_HDD, DEFAULT_SSD, DEFAULT_HDD, DEFAULT_SSD])
+    return request.param, path
+
+def _repeat_for(size_name):
+    return 3 if size_name in LARGE_SIZES else 15
+
+@pytest.mark.parametrize('backend, normalize', [('bs4', False), ('lxml', False), ('lxml', True)], ids=['bs4', 'lxml', 'lxml-normalized'])
+def test_parse_aida_report_speed(sized_report, backend, normalize, best_of, check_budget, make_config, tmp_path):
+    """Замер: полный разбор отчета каждым бэкендом (с нормализацией — из прогретого кэша)."""
+    size_name, path = sized_report
+    config = make_config(backend, normalize=normalize, cache_dir=tmp_path)
+    assert parse_aida_report(path, config, lambda *args: None)['Кол-во плашек ОЗУ'] == 4
+    seconds = best_of(lambda: parse_aida_report(path, config, lambda *args: None), repeat=_repeat_for(size_name))
+    check_budget(f"parse_aida_report[{backend}{'-normalized' if normalize else ''}]/{size_name}", seconds)
+
+@pytest.fixture(scope='module')
+def sized_soup(sized_report):
+    size_name, path = sized_report
+    with open(path, encoding='windows-1251') as f: return size_name, BeautifulSoup(f.read(), 'lxml')
+
+def test_find_value_by_label_speed(sized_soup, best_of, check_budget):
+    """Замер: поиск метки из последнего раздела по всему документу (худший случай — обход всех ячеек)."""
+    size_name, soup = sized_soup
+    assert find_value_by_label(soup.body, 'Дата BIOS системы') == '04/23/2019'
+    seconds = best_of(lambda: find_value_by_label(soup.body, 'Дата BIOS системы'), repeat=_repeat_for(size_name))
+    check_budget(f"find_value_by_label/{size_name}", seconds)
+
+def test_parse_smart_data_full_speed(sized_soup, best_of, check_budget, make_config):
+    """Замер: разбор и оценка таблицы SMART с четырьмя дисками."""
+    size_name, soup = sized_soup
+    smart_section, config = soup.find('a', attrs={'name': 'smart'}), make_config('bs4')
+    assert parse_smart_data_full(smart_section, config)[0] == 'GOOD'
+    seconds = best_of(lambda: parse_smart_data_full(smart_section, config), repeat=15)
+    check_budget(f"parse_smart_data_full/{size_name}", seconds)
@@ -0,0 +1,77 @@
+# tests/test_rules.py
+import configparser
+from datetime import datetime
+
+import pytest
+
+from logic.analyzer import analyze_system, format_problem_findings, problems_text
+from logic.parser import classify_smart_drives
+from logic.rules import get_rule_set, evaluate, ProblemCode, CATEGORY_CRITICAL
+
+CONFIG_TEXT = """
+[Analysis]
+bios_age_limit_years = 5
+ram_critical_gb = 3.8
+ram_upgrade_gb = 7.8
+
+[SMART]
+hdd_crc_error_warn_count = 10
+ssd_available_spare_warn_percent = 10
+ssd_available_spare_critical_percent = 3
+"""
+
+def make_config(text=CONFIG_TEXT):
+    config = configparser.ConfigParser()
+    config.read_string(text)
+    return config
+
+OLD_OFFICE_PC = {
+    'ОС': 'Windows 7 Professional', 'Сокет': '1 LGA775', 'Объем ОЗУ': '2048 МБ', 'Дисковые накопители': 'WDC WD5000AAKX',
+    'Видеоадаптер': 'Microsoft Basic Display Adapter', 'Дата BIOS': '03/15/09', 'internal_smart_status': 'OK',
+    'SMART Проблемы': [(ProblemCode.HDD_REALLOCATED_SECTORS, {'drive': 'WDC WD5000AAKX', 'value': 4})],
+}
+
+def test_problem_texts_and_codes():
+    category, problems = analyze_system(OLD_OFFICE_PC, make_config(), now=datetime(2024, 1, 1))
+    assert category == 1
+    assert problems.split("\n") == [
+        "  - HDD 'WDC WD5000AAKX': Переназначенные сектора: 4",
+        "Критично: Мало ОЗУ (2.0 ГБ)",
+        "Критично: Очень старая платформа",
+        "Предупреждение: BIOS старше 5 лет",
+        "Проблема: Не установлен видеодрайвер",
+        "Проблема: Отсутствует SSD",
+        "Проблема: Устаревшая ОС Windows 7",
+        "Проблемы с дисками:",
+    ]
+    category, findings = evaluate(OLD_OFFICE_PC, get_rule_set(make_config()), datetime(2024, 1, 1))
+    assert category == CATEGORY_CRITICAL
+    assert {code for code, _ in findings} == {ProblemCode.HDD_REALLOCATED_SECTORS, ProblemCode.OLD_PLATFORM, ProblemCode.RAM_CRITICAL, ProblemCode.OUTDATED_OS,
+                                              ProblemCode.NO_SSD, ProblemCode.NO_VIDEO_DRIVER, ProblemCode.OLD_BIOS}
+    # Находки — коды с параметрами, текст собирается из них при показе
+    assert (ProblemCode.RAM_CRITICAL, 2.0) in findings and (ProblemCode.OLD_BIOS, 5) in findings and (ProblemCode.NO_SSD, None) in findings
+    assert problems_text({'problem_findings': format_problem_findings(findings), 'problems': 'устаревший текст'}) == problems
+
+def test_categories_of_single_records():
+    records = [OLD_OFFICE_PC, {'ОС': 'Windows 11', 'Объем ОЗУ': '6 ГБ', 'Дисковые накопители': 'Samsung SSD 870', 'internal_smart_status': 'GOOD'},
+               {'ОС': 'Windows 10', 'Объем ОЗУ': '16 ГБ', 'Дисковые накопители': 'Kingston SNV2S', 'internal_smart_status': 'GOOD'}]
+    config = make_config()
+    assert [analyze_system(record, config)[0] for record in records] == [1, 2, 3]
+
+def test_smart_rules_use_thresholds():
+    drives = [('WDC WD10EZEX', [('05', '12'), ('C5', '0')]), ('Samsung SSD 860', [('3', '5')])]
+    status, _, problems = classify_smart_drives(drives, make_config())
+    assert status == 'BAD'
+    assert problems == [(ProblemCode.HDD_REALLOCATED_SECTORS, {'drive': 'WDC WD10EZEX', 'value': 12}), (ProblemCode.SSD_LOW_SPARE, {'drive': 'Samsung SSD 860', 'value': 5})]
+
+    relaxed = make_config(CONFIG_TEXT.replace('hdd_crc_error_warn_count = 10', 'hdd_crc_error_warn_count = 50')
+                                     .replace('ssd_available_spare_warn_percent = 10', 'ssd_available_spare_warn_percent = 4'))
+    status, _, problems = classify_smart_drives(drives, relaxed)
+    assert status == 'OK' and problems == [(ProblemCode.HDD_REALLOCATED_SECTORS, {'drive': 'WDC WD10EZEX', 'value': 12})]
+
+def test_rule_set_is_cached_until_thresholds_change():
+    rule_set = get_rule_set(make_config())
+    assert get_rule_set(make_config()) is rule_set
+    changed = make_config(CONFIG_TEXT.replace('ram_upgrade_gb = 7.8', 'ram_upgrade_gb = 15.8'))
+    assert get_rule_set(changed) is not rule_set
+    with pytest.raises(AttributeError): rule_set.rules = ()
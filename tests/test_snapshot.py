@@ -0,0 +1,45 @@
+# tests/test_snapshot.py
+from logic import database_handler
+from logic.analyzer import problems_text
+from logic.batch_classifier import reclassify_fleet
+from logic.ingest import analyze_report
+from logic.snapshot import decode_snapshot, reanalyze_snapshot, RAW_DATA_KEY
+from tests.report_factory import write_report, DEFAULT_SSD
+
+WORN_HDD = ('ST500DM002-1BD142 (Z3T1ABCD)', [('05', 'Reallocated Sector Count', '36', '100', '100', '12'),
+                                              ('C5', 'Current Pending Sector', '0', '100', '100', '0')])
+
+def test_reanalysis_from_snapshot_matches_parse_and_follows_new_thresholds(tmp_path, make_config):
+    """Тест: переоценка по снимку дает тот же результат, что и разбор HTML, и учитывает новые пороги."""
+    path = write_report(tmp_path, 'worn.htm', smart_drives=[WORN_HDD, DEFAULT_SSD], ram_total='4096 МБ')
+    config = make_config('lxml')
+    parsed = analyze_report(path, config, lambda *args: None)
+    assert parsed['category'] == 1 and '_smart_drives' not in parsed
+
+    snapshot = decode_snapshot(parsed[RAW_DATA_KEY])
+    same = reanalyze_snapshot(snapshot, config)
+    for key in ('category', 'problem_findings', 'internal_smart_status', 'SMART Статус'): assert same[key] == parsed[key], key
+
+    config.set('SMART', 'hdd_crc_error_warn_count', '50'); config['Analysis'] = {'ram_critical_gb': '2', 'ram_upgrade_gb': '3'}
+    relaxed = reanalyze_snapshot(snapshot, config)
+    assert relaxed['internal_smart_status'] == 'OK' and relaxed['category'] == 2
+    text = problems_text(relaxed)
+    assert 'Мало ОЗУ' not in text and 'Переназначенные сектора: 12' in text
+
+def test_snapshot_survives_database_round_trip(tmp_path, temp_db, make_config):
+    """Тест: снимок сохраняется в BLOB-колонку, не попадает в обычную выборку и переоценка пишется обратно."""
+    config = make_config('bs4')
+    parsed = analyze_report(write_report(tmp_path, 'pc.htm', smart_drives=[WORN_HDD]), config, lambda *args: None)
+    database_handler.save_data_to_db([parsed])
+
+    assert RAW_DATA_KEY not in database_handler.fetch_all_data_from_db()[0]
+    conn = database_handler.get_db_connection()
+    [blob] = conn.execute(f'SELECT "{database_handler.sanitize_col_name(RAW_DATA_KEY)}" FROM computers').fetchone()
+    config.set('SMART', 'hdd_crc_error_warn_count', '50')
+    relaxed = reanalyze_snapshot(decode_snapshot(blob), config)
+    assert reclassify_fleet(config) == (1, 1)
+    stored = database_handler.fetch_all_data_from_db()[0]
+    assert stored['internal_smart_status'] == relaxed['internal_smart_status'] == 'OK' and stored['category'] == relaxed['category'] == 2
+
+def test_corrupted_snapshot_is_ignored():
+    assert decode_snapshot(b'not zlib') is None and decode_snapshot(None) is None
@@ -4,6 +4,8 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QFormLayout, QGroupBox, QLa
                                QLineEdit, QSizePolicy, QFrame, QScrollArea)
 from PySide6.QtCore import Qt
 
+from logic.analyzer import problems_text
+
 def create_multiline_label(text):
     """Создает QLabel, который выглядит как поле ввода и правильно обрабатывает многострочный текст."""
     label = QLabel(str(text) if text is not None else "")
@@ -86,7 +88,7 @@ class DetailsWindow(QWidget):
         category_color = {1: "#e57373", 2: "#fff176", 3: "#81c784"}
         category_label.setStyleSheet(f"color: {category_color.get(self.data.get('category', 3), 'white')}; font-weight: bold; background: none; border: none;")
         issues_layout.addRow("Категория:", category_label)
-        issues_layout.addRow("Ключевые проблемы:", create_multiline_label(self.data.get('problems')))
+        issues_layout.addRow("Ключевые проблемы:", create_multiline_label(problems_text(self.data)))
         content_layout.addWidget(issues_group)
 
         content_layout.addStretch()
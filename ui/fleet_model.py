@@ -0,0 +1,318 @@
+# ui/fleet_model.py
+# Общая модель таблиц главного окна. Записи парка хранятся по колонкам (список значений на ключ), а текст,
+# цвета и значки ячеек отдаются по запросу представления только для видимых строк: кисти создаются
+# один раз на категорию, значки кэширует ui.icons. Каждая вкладка — проекция модели на свой набор колонок.
+# Для фильтров у каждой записи при загрузке считаются строки поиска (поля каждой вкладки в нижнем регистре) и
+# битовая маска признаков, поэтому отбор строк — проход по готовым спискам без обращения к ячейкам.
+from bisect import bisect_left
+from collections import namedtuple
+from itertools import compress
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QAbstractProxyModel, QModelIndex, Signal
+from PySide6.QtGui import QBrush, QColor
+
+from ui.icons import get_icon
+from utils.constants import HEADERS_MAIN, HEADERS_NETWORK
+
+RAW_DATA_HEADER = '_RAW_DATA'
+STATUS_HEADER, CATEGORY_HEADER = "Ст", ""
+# Колонки всех вкладок в порядке первого появления
+TABLE_KEYS = tuple(dict.fromkeys(h for h in HEADERS_MAIN + HEADERS_NETWORK if h != RAW_DATA_HEADER))
+# Поля записи, которые нужны окну помимо колонок таблиц (категория — для цвета и сортировки, признаки — для фильтров)
+EXTRA_KEYS = ('category', 'is_win7', 'has_ssd')
+# Колонки, которые не правятся из таблицы: имя файла — ключ записи в БД
+READ_ONLY_KEYS = frozenset({'Имя файла'})
+DEFAULT_CATEGORY = 3
+# Цвета строк по категории: (фон или None, текст)
+CATEGORY_COLORS = {1: ("#5c2c2c", "#f0c0c0"), 2: ("#5c532c", "#f0e8c0"), 3: (None, "#dcdcdc")}
+CATEGORY_ICONS = {1: "critical", 2: "warning", 3: "ok"}
+# Биты маски признаков записи для фильтров главного окна
+FLAG_CRITICAL, FLAG_UPGRADE, FLAG_WIN7, FLAG_SSD = 1, 2, 4, 8
+# Разделитель полей в строке поиска: подстрока не совпадет через границу двух полей
+SEARCH_SEPARATOR = '\x1f'
+
+def row_flags(data_row):
+    """Битовая маска признаков записи: категория 1 или 2, Windows 7, наличие SSD."""
+    category = data_row.get('category')
+    return ((FLAG_CRITICAL if category == 1 else FLAG_UPGRADE if category == 2 else 0)
+            | (FLAG_WIN7 if data_row.get('is_win7') else 0) | (FLAG_SSD if data_row.get('has_ssd') else 0))
+
+def search_text(data_row, keys=TABLE_KEYS):
+    """Строка поиска записи: значения колонок keys в нижнем регистре."""
+    return SEARCH_SEPARATOR.join(str(value).lower() for key in keys if (value := data_row.get(key)) is not None)
+
+class RowFilter(namedtuple('RowFilter', 'required forbidden text key scope', defaults=(0, 0, '', None, None))):
+    """
+    Условия отбора строк: все биты required и ни одного из forbidden (см. row_flags) и подстрока text
+    (в нижнем регистре) в поле key или, если key не задан, в любом поле вкладки: scope — ее набор колонок
+    (ColumnProjectionModel.search_scope), None — колонки всех вкладок.
+    """
+    __slots__ = ()
+
+    @property
+    def is_empty(self): return not (self.required or self.forbidden or self.text)
+
+class FleetTableModel(QAbstractTableModel):
+    """
+    Записи парка для всех вкладок: колонка значка категории, колонки TABLE_KEYS и скрытая колонка категории
+    (по ней таблицы сортируются по умолчанию). Правка ячейки сообщается сигналом cell_edited(имя файла, ключ, значение).
+    Фильтр строк общий для всех вкладок: set_filter() отбирает строки один раз, проекции только читают результат.
+    Строка поиска считается на каждый набор колонок, зарегистрированный add_search_scope() (по одному на вкладку).
+    """
+    cell_edited = Signal(str, str, str); filter_changed = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.keys = TABLE_KEYS; self.headers = (STATUS_HEADER, *TABLE_KEYS, CATEGORY_HEADER)
+        self.category_column = len(self.headers) - 1
+        self._store = {key: [] for key in dict.fromkeys(TABLE_KEYS + EXTRA_KEYS)}; self._row_of = {}
+        self._filenames = self._store['Имя файла']; self._categories = self._store['category']
+        self._scopes = {None: TABLE_KEYS}; self._search = {None: []}
+        self._flags, self._visible = [], bytearray(); self._filter = RowFilter()
+        self._brushes = {}
+
+    # --- Хранилище ---
+    def load(self, rows):
+        """Заменяет все записи; rows — итерируемое словарей записей (например, курсор БД), в список не собирается."""
+        self.beginResetModel()
+        try:
+            for values in self._store.values(): values.clear()
+            self._row_of.clear(); self._flags.clear(); self._visible.clear()
+            for texts in self._search.values(): texts.clear()
+            for data_row in rows:
+                if data_row.get('Имя файла'): self._append(data_row)
+        finally: self.endResetModel()
+
+    def add_or_update(self, data_row):
+        """Добавляет запись в конец или обновляет уже показанную с тем же именем файла."""
+        filename = data_row.get('Имя файла')
+        if not filename: return
+        if (row := self._row_of.get(filename)) is not None:
+            for key, values in self._store.items(): values[row] = data_row.get(key)
+            self._refresh_row(row); self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1)); return
+        row = len(self._filenames)
+        self.beginInsertRows(QModelIndex(), row, row); self._append(data_row); self.endInsertRows()
+
+    def clear(self): self.load(())
+
+    def _append(self, data_row):
+        row = self._row_of[data_row['Имя файла']] = len(self._filenames)
+        for key, values in self._store.items(): values.append(data_row.get(key))
+        for scope, keys in self._scopes.items(): self._search[scope].append(search_text(data_row, keys))
+        self._flags.append(row_flags(data_row)); self._visible.append(self._accepts(row))
+
+    def _refresh_row(self, row):
+        # Поля записи изменились: пересчитываются строка поиска, маска и видимость по текущему фильтру
+        data_row = {key: values[row] for key, values in self._store.items()}
+        for scope, keys in self._scopes.items(): self._search[scope][row] = search_text(data_row, keys)
+        self._flags[row] = row_flags(data_row); self._visible[row] = self._accepts(row)
+
+    def contains(self, filename): return filename in self._row_of
+
+    def filename_at(self, row): return self._filenames[row]
+
+    def record(self, filename):
+        """Хранимые поля записи словарем (колонки таблиц и EXTRA_KEYS) или None."""
+        row = self._row_of.get(filename)
+        return None if row is None else {key: values[row] for key, values in self._store.items()}
+
+    def update_values(self, filename, values):
+        """Обновляет хранимые поля записи (лишние ключи пропускаются), не сообщая о правке."""
+        if (row := self._row_of.get(filename)) is None: return
+        for key, value in values.items():
+            if key in self._store: self._store[key][row] = value
+        self._refresh_row(row); self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    # --- Фильтр ---
+    def add_search_scope(self, keys):
+        """Регистрирует набор колонок для поиска по всем полям вкладки и возвращает его ключ для RowFilter.scope."""
+        scope = tuple(key for key in TABLE_KEYS if key in keys)
+        if scope not in self._scopes:
+            self._scopes[scope] = scope
+            self._search[scope] = [search_text({key: self._store[key][row] for key in scope}, scope) for row in range(len(self._filenames))]
+        return scope
+
+    def set_filter(self, row_filter):
+        """Задает RowFilter для всех вкладок: видимость строк считается здесь один раз и сообщается сигналом filter_changed."""
+        self._filter = row_filter
+        self._visible = bytearray(b'\x01') * len(self._filenames) if row_filter.is_empty else bytearray(map(self._accepts, range(len(self._filenames))))
+        self.filter_changed.emit()
+
+    def _accepts(self, row):
+        row_filter, flags = self._filter, self._flags[row]
+        if flags & row_filter.required != row_filter.required or flags & row_filter.forbidden: return False
+        if not row_filter.text: return True
+        if row_filter.key is None: return row_filter.text in self._search[row_filter.scope][row]
+        value = self._store[row_filter.key][row]; return value is not None and row_filter.text in str(value).lower()
+
+    def is_visible(self, row): return bool(self._visible[row])
+
+    def visible_rows(self): return compress(range(len(self._visible)), self._visible)
+
+    def sort_key(self, column):
+        """Функция строка -> значение для сортировки по колонке: категория (для нее и значка) или текст ячейки."""
+        if (key := self.key_for_column(column)) is None:
+            categories = self._categories; return lambda row: DEFAULT_CATEGORY if categories[row] is None else categories[row]
+        values = self._store[key]; return lambda row: '' if values[row] is None else str(values[row])
+
+    def key_for_column(self, column):
+        """Ключ записи для колонки TABLE_KEYS или None (значок, категория)."""
+        return self.headers[column] if 0 < column < self.category_column else None
+
+    # --- Модель Qt ---
+    def rowCount(self, parent=QModelIndex()): return 0 if parent.isValid() else len(self._filenames)
+
+    def columnCount(self, parent=QModelIndex()): return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and 0 <= section < len(self.headers): return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def _category(self, row):
+        return self._categories[row] if self._categories[row] in CATEGORY_COLORS else DEFAULT_CATEGORY
+
+    def _brush(self, category, part):
+        if (key := (category, part)) not in self._brushes:
+            color = CATEGORY_COLORS[category][part]; self._brushes[key] = QBrush(QColor(color)) if color else None
+        return self._brushes[key]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid(): return None
+        row, column = index.row(), index.column()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            if column == self.category_column: return self._categories[row] if self._categories[row] is not None else DEFAULT_CATEGORY
+            if (key := self.key_for_column(column)) is None: return None
+            value = self._store[key][row]; return '' if value is None else str(value)
+        if role == Qt.BackgroundRole: return self._brush(self._category(row), 0)
+        if role == Qt.ForegroundRole: return self._brush(self._category(row), 1)
+        if column == 0 and role == Qt.DecorationRole: return get_icon(CATEGORY_ICONS[self._category(row)])
+        if column == 0 and role == Qt.TextAlignmentRole: return int(Qt.AlignCenter)
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if (key := self.key_for_column(index.column())) is not None and key not in READ_ONLY_KEYS: flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or (key := self.key_for_column(index.column())) is None or key in READ_ONLY_KEYS: return False
+        row, value = index.row(), str(value)
+        if str(self._store[key][row] if self._store[key][row] is not None else '') == value: return False
+        self._store[key][row] = value; self._refresh_row(row); self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        self.cell_edited.emit(self._filenames[row], key, value)
+        return True
+
+class ColumnProjectionModel(QAbstractProxyModel):
+    """
+    Вкладка: колонки keys общей модели (плюс значок и скрытая колонка категории) и строки, отобранные фильтром
+    модели (FleetTableModel.set_filter), с сортировкой по любой колонке. Порядок строк — список номеров строк
+    модели, отсортированный по ее спискам значений: QSortFilterProxyModel сравнивал бы строки через data(),
+    вызывая Python на каждое сравнение. Строка, у которой после правки сменились видимость или место,
+    переставляется точечно; равные значения идут в естественном порядке записей.
+    """
+    def __init__(self, source, keys, parent=None):
+        super().__init__(parent); self._keys = frozenset(keys)
+        # Ключи колонок вкладки по порядку (None — значок и категория); набор колонок модели не меняется
+        self._columns = [column for column in range(source.columnCount()) if (key := source.key_for_column(column)) is None or key in self._keys]
+        self.column_keys = [source.key_for_column(column) for column in self._columns]
+        # Поиск по всем полям на этой вкладке идет только по ее колонкам
+        self.search_scope = source.add_search_scope(self._keys)
+        self._proxy_column = {column: proxy_column for proxy_column, column in enumerate(self._columns)}
+        # _rows — видимые строки модели по возрастанию ключа сортировки (при сортировке по убыванию читаются с конца)
+        self._rows, self._position = [], None; self._sort_column, self._sort_order = -1, Qt.AscendingOrder
+        self.setSourceModel(source)
+        source.modelAboutToBeReset.connect(self.beginResetModel); source.modelReset.connect(self._source_reset)
+        source.rowsInserted.connect(self._source_rows_inserted); source.dataChanged.connect(self._source_data_changed)
+        source.filter_changed.connect(self._source_reset_filtered)
+        self._rebuild()
+
+    # --- Порядок строк ---
+    def _sort_key(self):
+        # (значение, номер строки) уникальны, поэтому место строки однозначно; для убывания номер берется с минусом,
+        # чтобы после чтения с конца равные значения остались в естественном порядке
+        value = self.sourceModel().sort_key(self._columns[self._sort_column]) if self._sort_column >= 0 else None
+        sign = -1 if self._sort_order == Qt.DescendingOrder else 1
+        return (lambda row: (value(row), sign * row)) if value else (lambda row: (0, sign * row))
+
+    def _rebuild(self):
+        self._rows = sorted(self.sourceModel().visible_rows(), key=self._sort_key()); self._position = None
+
+    def _proxy_row(self, position): return position if self._sort_order == Qt.AscendingOrder else len(self._rows) - 1 - position
+
+    def _source_row(self, proxy_row): return self._rows[proxy_row if self._sort_order == Qt.AscendingOrder else len(self._rows) - 1 - proxy_row]
+
+    def _position_of(self, source_row):
+        if self._position is None: self._position = {row: position for position, row in enumerate(self._rows)}
+        return self._position.get(source_row)
+
+    def _insert(self, source_row, key):
+        position = bisect_left(self._rows, key(source_row), key=key); proxy_row = position if self._sort_order == Qt.AscendingOrder else len(self._rows) - position
+        self.beginInsertRows(QModelIndex(), proxy_row, proxy_row); self._rows.insert(position, source_row); self._position = None; self.endInsertRows()
+
+    def _remove(self, position):
+        proxy_row = self._proxy_row(position)
+        self.beginRemoveRows(QModelIndex(), proxy_row, proxy_row); del self._rows[position]; self._position = None; self.endRemoveRows()
+
+    def _source_reset(self): self._rebuild(); self.endResetModel()
+
+    def _source_reset_filtered(self): self.beginResetModel(); self._source_reset()
+
+    def _source_rows_inserted(self, parent, first, last):
+        source, key = self.sourceModel(), self._sort_key()
+        for source_row in range(first, last + 1):
+            if source.is_visible(source_row): self._insert(source_row, key)
+
+    def _source_data_changed(self, top_left, bottom_right, roles=()):
+        source, key = self.sourceModel(), self._sort_key()
+        for source_row in range(top_left.row(), bottom_right.row() + 1):
+            position, visible = self._position_of(source_row), source.is_visible(source_row)
+            if position is not None:
+                row_key = key(source_row)
+                in_place = (position == 0 or key(self._rows[position - 1]) < row_key) and (position == len(self._rows) - 1 or row_key < key(self._rows[position + 1]))
+                if visible and in_place:
+                    proxy_row = self._proxy_row(position)
+                    self.dataChanged.emit(self.index(proxy_row, 0), self.index(proxy_row, len(self._columns) - 1), roles); continue
+                self._remove(position)
+            if visible: self._insert(source_row, key)
+
+    # --- Модель Qt ---
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < len(self._rows) and 0 <= column < len(self._columns)): return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):
+        return super().parent() if index is None else QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()): return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()): return 0 if parent.isValid() else len(self._columns)
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid(): return QModelIndex()
+        return self.sourceModel().index(self._source_row(proxy_index.row()), self._columns[proxy_index.column()])
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid() or (column := self._proxy_column.get(source_index.column())) is None: return QModelIndex()
+        position = self._position_of(source_index.row())
+        return QModelIndex() if position is None else self.createIndex(self._proxy_row(position), column)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and 0 <= section < len(self._columns): return self.sourceModel().headerData(self._columns[section], orientation, role)
+        return super().headerData(section, orientation, role)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList(); sources = [self.mapToSource(index) for index in persistent]
+        self._sort_column, self._sort_order = (column if 0 <= column < len(self._columns) else -1), order
+        self._rows.sort(key=self._sort_key()); self._position = None
+        self.changePersistentIndexList(persistent, [self.mapFromSource(index) for index in sources])
+        self.layoutChanged.emit()
+
+    # --- Вкладка ---
+    def filename_at(self, row):
+        """Имя файла записи в строке row этой вкладки (с учетом сортировки и фильтра)."""
+        return self.sourceModel().filename_at(self._source_row(row))
+
+    def column_of(self, key):
+        """Номер колонки с ключом key на этой вкладке или -1."""
+        return self.column_keys.index(key) if key in self._keys else -1
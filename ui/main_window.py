@@ -3,20 +3,27 @@ import logging
 import configparser
 from functools import partial
 
-from PySide6.QtCore import QThread, Signal, QUrl, Qt, QSettings, QPoint, QRect
+from PySide6.QtCore import QThread, Signal, QUrl, Qt, QSettings, QPoint, QRect, QTimer
 from PySide6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLineEdit, QFileDialog,
-                             QLabel, QProgressBar, QTableWidget, QTableWidgetItem,
+                             QLabel, QProgressBar, QTableView, QAbstractItemView,
                              QMainWindow, QSizePolicy, QMessageBox, QTabWidget,
                              QMenu, QFrame, QComboBox, QCheckBox, QStatusBar)
-from PySide6.QtGui import QIcon, QColor, QAction, QDesktopServices
+from PySide6.QtGui import QIcon, QAction, QDesktopServices
 
 from ui.icons import get_icon
 from ui.log_window import LogWindow
-from logic.workers import AidaWorker, DatabaseUpdateWorker, IPUpdateWorker
-from logic.database_handler import fetch_all_data_from_db
+from logic.workers import AidaWorker, IPUpdateWorker, ReanalyzeWorker
+from logic.export_scheduler import ExportScheduler
+from logic.db_writer import get_db_writer, shutdown_db_writer
+from logic.database_handler import iter_page, fetch_one, fetch_fleet_stats
+from logic.derived_fields import DERIVED_SOURCE_KEYS, compute_derived_fields
 from utils.constants import HEADERS_MAIN, HEADERS_NETWORK
 from ui.details_window import DetailsWindow
+from ui.fleet_model import FleetTableModel, ColumnProjectionModel, RowFilter, FLAG_CRITICAL, FLAG_UPGRADE, FLAG_WIN7, FLAG_SSD
+
+# Пауза после последнего нажатия клавиши в поле поиска, после которой применяется фильтр
+FILTER_DEBOUNCE_MS = 250
 
 class MainWindow(QMainWindow):
     # ... (весь код до create_new_table без изменений) ...
@@ -36,8 +43,11 @@ class MainWindow(QMainWindow):
         
         self.config = configparser.ConfigParser(); self.config.read('config.ini', encoding='utf-8')
         self.thread = None; self.worker = None
+        self.db_writer = get_db_writer(); self.export_scheduler = ExportScheduler(self.config, parent=self)
         self.log_window = LogWindow(QApplication.instance().styleSheet())
-        self.last_file_path = ""; self.all_data = {}; self.details_windows = {}
+        self.last_file_path = ""; self.details_windows = {}
+        # Записи обеих вкладок — в одной модели, вкладки показывают ее колонки через проекции
+        self.fleet_model = FleetTableModel(self)
         
         self.central_widget = QWidget()
         self.central_widget.setMouseTracking(True)
@@ -64,7 +74,7 @@ class MainWindow(QMainWindow):
         content_layout.addLayout(top_layout); content_layout.addWidget(self.filter_panel)
         content_layout.addWidget(self.tabs); content_layout.addWidget(self.progress_bar)
         self.main_layout.addWidget(content_widget)
-        self.status_bar = QStatusBar()
+        self.status_bar = QStatusBar(); self.fleet_stats_label = QLabel(); self.status_bar.addPermanentWidget(self.fleet_stats_label)
         self.main_layout.addWidget(self.status_bar)
 
     def _create_title_bar(self):
@@ -86,8 +96,8 @@ class MainWindow(QMainWindow):
     def _create_toolbar(self):
         toolbar = QWidget(); toolbar.setMouseTracking(True)
         toolbar_layout = QHBoxLayout(toolbar); toolbar_layout.setContentsMargins(5, 5, 5, 5)
-        toolbar_layout.addWidget(self.start_btn); toolbar_layout.addWidget(self.stop_btn); toolbar_layout.addSpacing(20)
-        toolbar_layout.addWidget(self.update_ip_btn); toolbar_layout.addSpacing(20); toolbar_layout.addWidget(self.show_log_btn)
+        toolbar_layout.addWidget(self.start_btn); toolbar_layout.addWidget(self.stop_btn); toolbar_layout.addWidget(self.full_rescan_check); toolbar_layout.addSpacing(20)
+        toolbar_layout.addWidget(self.update_ip_btn); toolbar_layout.addWidget(self.reanalyze_btn); toolbar_layout.addSpacing(20); toolbar_layout.addWidget(self.show_log_btn)
         spacer = QWidget(); spacer.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
         toolbar_layout.addWidget(spacer); toolbar_layout.addWidget(self.open_file_btn)
         return toolbar
@@ -97,11 +107,14 @@ class MainWindow(QMainWindow):
         self.select_folder_btn = QPushButton("Выбрать папку..."); self.select_folder_btn.setIcon(get_icon("folder"))
         self.start_btn = QPushButton("Начать анализ"); self.start_btn.setIcon(get_icon("start")); self.start_btn.setObjectName("startBtn")
         self.stop_btn = QPushButton("Остановить"); self.stop_btn.setIcon(get_icon("stop")); self.stop_btn.setEnabled(False)
+        self.full_rescan_check = QCheckBox("Полный перескан"); self.full_rescan_check.setToolTip("Разобрать заново все отчеты, даже если они не менялись с прошлого анализа")
         self.update_ip_btn = QPushButton("Обновить IP"); self.update_ip_btn.setIcon(get_icon("network"))
+        self.reanalyze_btn = QPushButton("Переоценить"); self.reanalyze_btn.setIcon(get_icon("refresh")); self.reanalyze_btn.setToolTip("Пересчитать категории и проблемы по сохраненным данным с текущими порогами из config.ini, без повторного парсинга")
         self.filter_panel = QFrame(); self.filter_panel.setObjectName("filterPanel"); self.filter_panel.setMouseTracking(True)
         filter_layout = QHBoxLayout(self.filter_panel); filter_layout.setContentsMargins(10, 5, 10, 5)
         self.filter_column_combo = QComboBox(); self.filter_column_combo.addItem("Поиск по всем полям")
         self.filter_edit = QLineEdit(); self.filter_edit.setPlaceholderText("Введите текст для поиска...")
+        self.filter_timer = QTimer(self); self.filter_timer.setSingleShot(True); self.filter_timer.setInterval(FILTER_DEBOUNCE_MS)
         self.check_critical = QCheckBox("Крит. проблемы"); self.check_upgrade = QCheckBox("Нужен апгрейд")
         self.check_no_ssd = QCheckBox("Без SSD"); self.check_win7 = QCheckBox("Windows 7")
         self.reset_filters_btn = QPushButton("Сбросить фильтры")
@@ -117,30 +130,22 @@ class MainWindow(QMainWindow):
         self.show_log_btn = QPushButton("Показать лог"); self.show_log_btn.setIcon(get_icon("log"))
 
     def create_new_table(self, headers):
-        table = QTableWidget()
+        table = QTableView()
         table.setMouseTracking(True)
-        visible_headers = [h for h in headers if h != '_RAW_DATA']
-        table.setColumnCount(1 + len(visible_headers) + 1)
-        table.setHorizontalHeaderItem(0, QTableWidgetItem("Ст"))
-        for i, header_text in enumerate(visible_headers, 1):
-            table.setHorizontalHeaderItem(i, QTableWidgetItem(header_text))
-        
-        table.setHorizontalHeaderItem(table.columnCount() - 1, QTableWidgetItem(""))
-        table.setColumnHidden(table.columnCount() - 1, True)
+        table.setModel(ColumnProjectionModel(self.fleet_model, headers, table))
+        category_column = table.model().columnCount() - 1
+        table.setColumnHidden(category_column, True)
         
         table.setSortingEnabled(True)
-        table.sortByColumn(table.columnCount() - 1, Qt.AscendingOrder)
+        table.sortByColumn(category_column, Qt.AscendingOrder)
         table.setColumnWidth(0, 30)
         
         # --- ИСПРАВЛЕНИЕ: Задаем ширину для колонки с моделями ОЗУ ---
-        try:
-            ram_col_index = visible_headers.index('Модели плашек ОЗУ') + 1
-            table.setColumnWidth(ram_col_index, 250)
-        except ValueError:
-            pass # Если колонки нет, ничего страшного
+        ram_col_index = table.model().column_of('Модели плашек ОЗУ')
+        if ram_col_index != -1: table.setColumnWidth(ram_col_index, 250)
 
-        table.setEditTriggers(QTableWidget.NoEditTriggers)
-        table.setSelectionBehavior(QTableWidget.SelectRows)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
         table.setAlternatingRowColors(False)
         table.setContextMenuPolicy(Qt.CustomContextMenu)
         return table
@@ -151,16 +156,18 @@ class MainWindow(QMainWindow):
         self.maximize_btn.clicked.connect(self.toggle_fullscreen)
         self.close_btn.clicked.connect(self.close)
         self.select_folder_btn.clicked.connect(self.select_folder); self.start_btn.clicked.connect(self.start_analysis)
-        self.stop_btn.clicked.connect(self.stop_analysis); self.update_ip_btn.clicked.connect(self.start_ip_update)
+        self.stop_btn.clicked.connect(self.stop_analysis); self.update_ip_btn.clicked.connect(self.start_ip_update); self.reanalyze_btn.clicked.connect(self.start_reanalysis)
         self.open_file_btn.clicked.connect(self.open_excel_file); self.show_log_btn.clicked.connect(self.log_window.show)
-        self.tabs.currentChanged.connect(self.on_tab_changed); self.filter_edit.textChanged.connect(self.filter_table)
+        self.tabs.currentChanged.connect(self.on_tab_changed); self.filter_edit.textChanged.connect(self.filter_timer.start); self.filter_timer.timeout.connect(self.filter_table)
         self.filter_column_combo.currentIndexChanged.connect(self.filter_table)
         self.check_critical.stateChanged.connect(self.filter_table); self.check_upgrade.stateChanged.connect(self.filter_table)
         self.check_no_ssd.stateChanged.connect(self.filter_table); self.check_win7.stateChanged.connect(self.filter_table)
         self.reset_filters_btn.clicked.connect(self.reset_filters)
+        self.db_writer.fields_updated.connect(self.on_cells_saved); self.db_writer.log_message.connect(self.log_window.add_log)
+        self.export_scheduler.log_message.connect(self.log_window.add_log); self.export_scheduler.exported.connect(self.excel_exported)
+        self.fleet_model.cell_edited.connect(self.handle_cell_edited)
         for table in [self.main_table, self.network_table]:
-            table.cellDoubleClicked.connect(self.show_details_by_click)
-            table.customContextMenuRequested.connect(self.show_table_context_menu); table.itemChanged.connect(self.handle_item_changed)
+            table.doubleClicked.connect(self.show_details_by_click); table.customContextMenuRequested.connect(self.show_table_context_menu)
     
     def toggle_fullscreen(self):
         if self.isMaximized(): self.showNormal()
@@ -252,89 +259,77 @@ class MainWindow(QMainWindow):
         self.worker.finished.connect(self.ip_update_finished); self.worker.finished.connect(self.thread.quit)
         self.thread.finished.connect(self.worker.deleteLater); self.thread.finished.connect(self.thread.deleteLater); self.thread.start()
         self.statusBar().showMessage("Запущено сканирование сети для обновления IP...")
-    def ip_update_finished(self):
+    def ip_update_finished(self, updated_count):
         logging.info("Процесс обновления IP-адресов завершен."); self.statusBar().showMessage("Обновление IP-адресов завершено. Обновляю таблицу...", 5000)
+        if updated_count: self.export_scheduler.mark_dirty()
         self.auto_load_data(); self.start_btn.setEnabled(True); self.update_ip_btn.setEnabled(True)
+    def start_reanalysis(self):
+        # Пороги могли поменяться в config.ini, пока программа открыта — перечитываем его
+        self.config.read('config.ini', encoding='utf-8')
+        for w in [self.start_btn, self.update_ip_btn, self.reanalyze_btn]: w.setEnabled(False)
+        self.thread = QThread(); self.worker = ReanalyzeWorker(self.config); self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.run); self.worker.log_message.connect(self.log_window.add_log)
+        self.worker.finished.connect(self.reanalysis_finished); self.worker.finished.connect(self.thread.quit)
+        self.thread.finished.connect(self.worker.deleteLater); self.thread.finished.connect(self.thread.deleteLater); self.thread.start()
+        self.statusBar().showMessage("Переоценка по сохраненным данным...")
+    def reanalysis_finished(self, output_filepath):
+        for w in list(self.details_windows.values()): w.close()
+        self.auto_load_data(); self.statusBar().showMessage("Переоценка завершена." if output_filepath else "Переоценка завершилась с ошибкой, подробности в логе.", 5000)
+        if output_filepath: self.export_scheduler.mark_dirty()
+        for w in [self.start_btn, self.update_ip_btn, self.reanalyze_btn]: w.setEnabled(True)
     def auto_load_data(self):
         self.statusBar().showMessage("Загрузка данных из базы...")
-        valid_data = [row for row in fetch_all_data_from_db() if row.get("Имя файла")]
-        self.all_data.clear()
-        for row_data in valid_data: self.all_data[row_data["Имя файла"]] = row_data
-        for table in [self.main_table, self.network_table]:
-            table.blockSignals(True); table.setSortingEnabled(False); table.setRowCount(len(valid_data))
-        try:
-            sorted_data = sorted(valid_data, key=lambda x: str(x.get('Имя файла', '')))
-            for row_idx, data_row in enumerate(sorted_data): self._populate_table_row(self.main_table, row_idx, data_row); self._populate_table_row(self.network_table, row_idx, data_row)
-        finally:
-            for table in [self.main_table, self.network_table]:
-                table.setSortingEnabled(True); table.blockSignals(False); table.sortItems(table.columnCount() - 1, Qt.AscendingOrder)
+        # Записи идут в модель прямо с курсора БД; ячейки таблиц не создаются — представления спрашивают модель
+        self.fleet_model.load(iter_page()); loaded = self.fleet_model.rowCount()
         self.update_filter_combo(); self.filter_table()
-        if valid_data: self.statusBar().showMessage(f"Загружено {len(valid_data)} записей из базы.", 5000)
+        if loaded: self.statusBar().showMessage(f"Загружено {loaded} записей из базы.", 5000)
         else: self.statusBar().showMessage("База данных пуста или не содержит валидных записей.", 5000)
         output_file = self.config.get('Settings', 'output_filename', fallback='system_analysis.xlsx')
         if os.path.exists(output_file): self.open_file_btn.setEnabled(True); self.last_file_path = output_file
-    def _populate_table_row(self, table, row_idx, data_row):
-        category = data_row.get('category', 3)
-        colors = {1: (QColor("#5c2c2c"), QColor("#f0c0c0")), 2: (QColor("#5c532c"), QColor("#f0e8c0")), 3: (None, QColor("#dcdcdc"))}
-        row_color, text_color = colors.get(category, (None, QColor("#dcdcdc")))
-        icons = {1: get_icon("critical"), 2: get_icon("warning"), 3: get_icon("ok")}; status_icon = icons.get(category)
-        for col_idx in range(table.columnCount()):
-            item = QTableWidgetItem()
-            if row_color: item.setBackground(row_color)
-            item.setForeground(text_color)
-            if col_idx == 0:
-                if status_icon: item.setIcon(status_icon); item.setTextAlignment(Qt.AlignCenter)
-            elif col_idx == table.columnCount() - 1: item.setData(Qt.DisplayRole, category)
-            else: item.setText(str(data_row.get(table.horizontalHeaderItem(col_idx).text(), '')))
-            table.setItem(row_idx, col_idx, item)
-    def show_details_by_click(self, row, column):
-        table = self.sender(); filename = self.get_filename_from_row(table, row)
-        if filename in self.all_data: self.show_details_window(filename)
+        self.update_fleet_stats()
+    def update_fleet_stats(self):
+        """Сводка по парку в строке состояния — из таблицы сводки в БД, без прохода по записям."""
+        stats = fetch_fleet_stats()
+        if stats is None or not stats.total: self.fleet_stats_label.clear(); return
+        bios_age = f" | BIOS в среднем: {stats.average_bios_age_years} г." if stats.average_bios_age_years != 'N/A' else ""
+        self.fleet_stats_label.setText(f"ПК: {stats.total} | Замена: {stats.categories[1]} | Апгрейд: {stats.categories[2]} | В порядке: {stats.categories[3]}{bios_age}")
+    def show_details_by_click(self, index):
+        filename = self.get_filename_from_row(self.sender(), index.row())
+        if self.fleet_model.contains(filename): self.show_details_window(filename)
     def get_filename_from_row(self, table, row):
-        for i in range(table.columnCount()):
-            if table.horizontalHeaderItem(i) and table.horizontalHeaderItem(i).text() == "Имя файла":
-                item = table.item(row, i); return item.text() if item else None
-        return None
+        return table.model().filename_at(row) if 0 <= row < table.model().rowCount() else None
     def show_details_window(self, filename):
         if filename in self.details_windows: self.details_windows[filename].activateWindow(); self.details_windows[filename].raise_(); return
-        if filename in self.all_data:
-            details_win = DetailsWindow(self.all_data[filename], self.on_details_window_close, QApplication.instance().styleSheet(), self)
+        if self.fleet_model.contains(filename):
+            # Полная запись — из БД; поля таблиц — из модели, в ней уже есть правки, которые еще в очереди записи
+            data = {**(fetch_one(filename) or {}), **self.fleet_model.record(filename)}
+            details_win = DetailsWindow(data, self.on_details_window_close, QApplication.instance().styleSheet(), self)
             self.details_windows[filename] = details_win; details_win.show()
     def on_details_window_close(self, filename):
         if filename in self.details_windows: del self.details_windows[filename]
-    def add_table_row(self, data_row):
-        filename = data_row.get("Имя файла");
-        if not filename: return
-        self.all_data[filename] = data_row
-        for table in [self.main_table, self.network_table]:
-            table.blockSignals(True)
-            try: row_pos = table.rowCount(); table.insertRow(row_pos); self._populate_table_row(table, row_pos, data_row)
-            finally: table.blockSignals(False)
-    def handle_item_changed(self, item):
-        active_table = item.tableWidget(); row, column = item.row(), item.column()
-        filename = self.get_filename_from_row(active_table, row);
-        if not filename: return
-        header_item = active_table.horizontalHeaderItem(column)
-        if not header_item: return
-        header_to_update, new_value = header_item.text(), item.text()
-        if str(self.all_data.get(filename, {}).get(header_to_update, '')) == new_value: return
-        self.thread = QThread(); self.worker = DatabaseUpdateWorker(self.config, filename, header_to_update, new_value)
-        self.worker.moveToThread(self.thread)
-        self.worker.finished.connect(self.thread.quit); self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater); self.worker.log_message.connect(self.log_window.add_log)
-        self.thread.started.connect(self.worker.run); self.thread.start()
-        if filename in self.all_data: self.all_data[filename][header_to_update] = new_value
+    def add_table_row(self, data_row): self.fleet_model.add_or_update(data_row)
+    def handle_cell_edited(self, filename, header_to_update, new_value):
+        # Правка уходит в очередь общего пишущего потока, результат придет сигналом fields_updated
+        self.db_writer.update_field(filename, header_to_update, new_value)
+        if header_to_update in DERIVED_SOURCE_KEYS: self.fleet_model.update_values(filename, compute_derived_fields(self.fleet_model.record(filename)))
+    def on_cells_saved(self, updates):
+        for filename, header, _, ok in updates:
+            if ok: self.log_window.add_log(f"Ячейка '{header}' для '{filename}' обновлена в БД.", "info")
+            else: self.log_window.add_log(f"Не удалось обновить ячейку '{header}' для '{filename}'.", "error")
+        if any(ok for *_, ok in updates): self.export_scheduler.mark_dirty(); self.update_fleet_stats()
+    def excel_exported(self, output_filepath):
+        self.last_file_path = output_filepath; self.open_file_btn.setEnabled(True); self.log_window.add_log("Файл Excel обновлен.", "info")
     def start_analysis(self):
         reports_dir = self.reports_path_edit.text()
         if not os.path.isdir(reports_dir): QMessageBox.warning(self, "Ошибка", f"Папка '{reports_dir}' не найдена!"); return
-        for w in [self.tabs, self.filter_panel, self.start_btn, self.open_file_btn, self.update_ip_btn]: w.setEnabled(False)
-        self.stop_btn.setEnabled(True); self.all_data.clear()
+        for w in [self.tabs, self.filter_panel, self.start_btn, self.full_rescan_check, self.open_file_btn, self.update_ip_btn, self.reanalyze_btn]: w.setEnabled(False)
+        self.stop_btn.setEnabled(True)
         for w in list(self.details_windows.values()): w.close()
-        for table in [self.main_table, self.network_table]: table.setRowCount(0)
-        self.log_window.log_area.clear(); self.progress_bar.setValue(0); self.progress_bar.setVisible(True)
-        self.thread = QThread(); self.worker = AidaWorker(reports_dir, self.config); self.worker.moveToThread(self.thread)
+        self.fleet_model.clear()
+        self.log_window.log_area.clear(); self.progress_bar.setValue(0); self.progress_bar.setFormat("%p%"); self.progress_bar.setVisible(True)
+        self.thread = QThread(); self.worker = AidaWorker(reports_dir, self.config, self.full_rescan_check.isChecked()); self.worker.moveToThread(self.thread)
         self.thread.started.connect(self.worker.run); self.worker.log_message.connect(self.log_window.add_log)
-        self.worker.progress_update.connect(self.update_progress); self.worker.result_ready.connect(self.add_table_row)
+        self.worker.progress_update.connect(self.update_progress); self.worker.scan_counts.connect(self.update_scan_counts); self.worker.result_ready.connect(self.add_table_row)
         self.worker.status_update.connect(self.update_status_bar); self.worker.finished.connect(self.analysis_finished)
         self.worker.finished.connect(self.thread.quit); self.worker.finished.connect(self.worker.deleteLater)
         self.thread.finished.connect(self.thread.deleteLater); self.thread.start()
@@ -343,74 +338,57 @@ class MainWindow(QMainWindow):
         if self.worker and hasattr(self.worker, 'is_running'): self.worker.is_running = False; self.stop_btn.setEnabled(False); self.statusBar().showMessage("Остановка анализа...")
     def analysis_finished(self, output_filepath):
         self.progress_bar.setVisible(False)
-        for w in [self.tabs, self.filter_panel, self.start_btn, self.update_ip_btn]: w.setEnabled(True)
+        for w in [self.tabs, self.filter_panel, self.start_btn, self.full_rescan_check, self.update_ip_btn, self.reanalyze_btn]: w.setEnabled(True)
         self.stop_btn.setEnabled(False)
-        for table in [self.main_table, self.network_table]: table.sortItems(table.columnCount() - 1, Qt.AscendingOrder)
-        self.update_filter_combo(); self.filter_table()
+        # Неизмененные отчеты не разбирались и не пришли через result_ready — перечитываем таблицы из БД
+        self.auto_load_data()
         status_message = "Анализ успешно завершен!" if output_filepath else "Анализ завершен с ошибкой или был прерван."
         self.statusBar().showMessage(status_message, 5000)
-        if output_filepath and os.path.exists(output_filepath): self.last_file_path = output_filepath; self.open_file_btn.setEnabled(True)
+        # Разобранное сохранено в БД и при остановке — книгу Excel пересоберет планировщик экспорта
+        self.export_scheduler.mark_dirty()
         if self.thread is not None: self.thread.quit(); self.thread.wait()
     def update_status_bar(self, message, set_indeterminate): self.statusBar().showMessage(message); self.progress_bar.setRange(0, 0 if set_indeterminate else 100)
     def update_progress(self, current, total): self.progress_bar.setMaximum(total); self.progress_bar.setValue(current); self.statusBar().showMessage(f"Обработка файла {current} из {total}...")
+    def update_scan_counts(self, parsed, skipped): self.progress_bar.setFormat(f"%p% (разобрано: {parsed}, без изменений: {skipped})")
     def show_table_context_menu(self, position):
         active_table = self.tabs.currentWidget()
-        if not isinstance(active_table, QTableWidget): return
+        if not isinstance(active_table, QTableView): return
         row_index = active_table.rowAt(position.y());
         if row_index < 0: return
-        filename = self.get_filename_from_row(active_table, row_index)
+        filename = self.get_filename_from_row(active_table, row_index); model = active_table.model()
         menu = QMenu()
         if filename: details_action = menu.addAction("Показать детали..."); details_action.triggered.connect(lambda: self.show_details_window(filename)); menu.addSeparator()
         edit_action = menu.addAction("Изменить ячейку")
-        clicked_item = active_table.itemAt(position)
-        if clicked_item:
-            original_flags = clicked_item.flags(); clicked_item.setFlags(original_flags | Qt.ItemIsEditable)
-            edit_action.triggered.connect(lambda ch, item=clicked_item: active_table.editItem(item)); menu.addSeparator()
+        clicked_index = active_table.indexAt(position)
+        if clicked_index.isValid() and clicked_index.flags() & Qt.ItemIsEditable:
+            edit_action.triggered.connect(lambda ch, index=clicked_index: active_table.edit(index)); menu.addSeparator()
+        else: edit_action.setEnabled(False)
         copy_menu = menu.addMenu("Копировать")
-        for idx in range(1, active_table.columnCount() - 1):
-            header_item = active_table.horizontalHeaderItem(idx); cell_item = active_table.item(row_index, idx)
-            if header_item and cell_item and cell_item.text():
-                action_text = f"{header_item.text()}: {cell_item.text()[:30]}{'...' if len(cell_item.text()) > 30 else ''}"
-                copy_action = QAction(action_text, self); copy_action.triggered.connect(partial(QApplication.clipboard().setText, cell_item.text())); copy_menu.addAction(copy_action)
+        for idx in range(1, model.columnCount() - 1):
+            header_text, cell_text = model.headerData(idx, Qt.Horizontal), model.index(row_index, idx).data()
+            if cell_text:
+                action_text = f"{header_text}: {cell_text[:30]}{'...' if len(cell_text) > 30 else ''}"
+                copy_action = QAction(action_text, self); copy_action.triggered.connect(partial(QApplication.clipboard().setText, cell_text)); copy_menu.addAction(copy_action)
         if filename:
             menu.addSeparator(); open_report_action = menu.addAction(f"Открыть отчет {filename}"); open_report_action.triggered.connect(partial(self.open_and_select_report, filename))
         menu.exec(active_table.viewport().mapToGlobal(position))
-        if clicked_item: clicked_item.setFlags(original_flags)
     def filter_table(self):
-        active_table = self.tabs.currentWidget()
-        if not isinstance(active_table, QTableWidget): return
+        # Отбор строк делает модель по строкам поиска и маскам признаков, посчитанным при загрузке; фильтр общий для вкладок,
+        # а "Поиск по всем полям" идет только по колонкам активной вкладки — как видит их пользователь
+        self.filter_timer.stop(); active_table = self.tabs.currentWidget()
+        if not isinstance(active_table, QTableView): return
         search_text, search_column_name = self.filter_edit.text().lower(), self.filter_column_combo.currentText()
-        search_column_index = -1
-        if search_column_name != "Поиск по всем полям":
-            for i in range(active_table.columnCount()):
-                if active_table.horizontalHeaderItem(i).text() == search_column_name: search_column_index = i; break
-        for row in range(active_table.rowCount()):
-            filename = self.get_filename_from_row(active_table, row)
-            if not filename or filename not in self.all_data: active_table.setRowHidden(row, True); continue
-            data, is_visible = self.all_data[filename], True
-            if self.check_critical.isChecked() and data.get('category') != 1: is_visible = False
-            if is_visible and self.check_upgrade.isChecked() and data.get('category') != 2: is_visible = False
-            if is_visible and self.check_win7.isChecked() and "windows 7" not in str(data.get('ОС', '')).lower(): is_visible = False
-            if is_visible and self.check_no_ssd.isChecked() and any(k in str(data.get('Дисковые накопители', '')).lower() for k in ['ssd', 'nvme', 'snv']): is_visible = False
-            if is_visible and search_text:
-                text_match = False
-                if search_column_index != -1:
-                    item = active_table.item(row, search_column_index)
-                    if item and search_text in item.text().lower(): text_match = True
-                else:
-                    for col in range(active_table.columnCount()):
-                        if active_table.isColumnHidden(col): continue
-                        item = active_table.item(row, col)
-                        if item and search_text in item.text().lower(): text_match = True; break
-                if not text_match: is_visible = False
-            active_table.setRowHidden(row, not is_visible)
+        search_key = search_column_name if active_table.model().column_of(search_column_name) != -1 else None
+        required = (FLAG_CRITICAL if self.check_critical.isChecked() else 0) | (FLAG_UPGRADE if self.check_upgrade.isChecked() else 0) | (FLAG_WIN7 if self.check_win7.isChecked() else 0)
+        # Ищем только по данным модели (подстрокой), а не по индексу БД: правки из очереди DbWriter могут еще не дойти до базы
+        self.fleet_model.set_filter(RowFilter(required, FLAG_SSD if self.check_no_ssd.isChecked() else 0, search_text, search_key, active_table.model().search_scope))
     def on_tab_changed(self, index): self.update_filter_combo(); self.filter_table()
     def update_filter_combo(self):
         self.filter_column_combo.blockSignals(True); current_text = self.filter_column_combo.currentText()
         self.filter_column_combo.clear(); self.filter_column_combo.addItem("Поиск по всем полям")
         active_table = self.tabs.currentWidget()
-        if isinstance(active_table, QTableWidget):
-            visible_headers = [active_table.horizontalHeaderItem(i).text() for i in range(1, active_table.columnCount() - 1) if active_table.horizontalHeaderItem(i) and not active_table.isColumnHidden(i)]
+        if isinstance(active_table, QTableView):
+            visible_headers = [key for i, key in enumerate(active_table.model().column_keys) if key and not active_table.isColumnHidden(i)]
             self.filter_column_combo.addItems(sorted(visible_headers))
         index = self.filter_column_combo.findText(current_text)
         if index != -1: self.filter_column_combo.setCurrentIndex(index)
@@ -447,5 +425,7 @@ class MainWindow(QMainWindow):
         self.stop_analysis()
         if self.thread and self.thread.isRunning():
             logging.info("Ожидание завершения рабочего потока..."); self.thread.quit(); self.thread.wait()
+        # Последние правки из очереди записи должны успеть пометить книгу устаревшей до финального экспорта
+        shutdown_db_writer(); QApplication.processEvents(); self.export_scheduler.shutdown()
         for window in list(self.details_windows.values()): window.close()
         self.log_window.close(); event.accept()
\ No newline at end of file
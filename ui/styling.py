@@ -8,8 +8,8 @@ def get_graphite_theme():
     QTabBar::tab { background: #3c3f41; color: #dcdcdc; padding: 8px 12px; border-top-left-radius: 4px; border-top-right-radius: 4px; border: 1px solid #4a4a4a; border-bottom: none; margin-right: 2px; }
     QTabBar::tab:selected { background: #007acc; color: white; }
     QTabBar::tab:hover { background: #4d4d4d; }
-    QTableWidget { background-color: #3c3f41; border: 1px solid #4a4a4a; gridline-color: #4a4a4a; }
-    QTableWidget::item:selected { background-color: #007acc; color: white; }
+    QTableView { background-color: #3c3f41; border: 1px solid #4a4a4a; gridline-color: #4a4a4a; }
+    QTableView::item:selected { background-color: #007acc; color: white; }
     QHeaderView::section { background-color: #2b2b2b; padding: 5px; border: 1px solid #4a4a4a; font-weight: bold; }
     QTableCornerButton::section { background-color: #2b2b2b; border: 1px solid #4a4a4a; }
     
@@ -8,4 +8,11 @@ def natural_sort_key(s):
     """
     if s is None:
         return [] # Возвращаем пустой список для None, он будет в начале сортировки
-    return [int(text) if text.isdigit() else text.lower() for text in re.split('([0-9]+)', s)]
\ No newline at end of file
+    return [int(text) if text.isdigit() else text.lower() for text in re.split('([0-9]+)', s)]
+def natural_sort_text(s):
+    """
+    Тот же "естественный" порядок, что у natural_sort_key, но строкой: числа дополняются нулями
+    до одной длины, поэтому строки можно хранить в БД и сравнивать обычным ORDER BY.
+    """
+    if s is None: return ''
+    return re.sub(r'[0-9]+', lambda match: match.group().zfill(12), s.lower())